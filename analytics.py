@@ -0,0 +1,248 @@
+# encoding:utf-8
+
+import json
+import math
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# 小于该值（分钟）的耗时视为0，即1秒内回复
+MIN_INDEXABLE_VALUE = 1 / 60
+
+# 零值桶在read_latency_bins表中的桶号，对数桶的桶号不会小于它
+ZERO_BIN = -(2 ** 31)
+
+
+class QuantileSketch:
+    """对数分桶的分位数草图
+    
+    每个桶覆盖相对宽度固定的区间，分位数结果的相对误差不超过 relative_accuracy；
+    桶计数可以直接相加，因此不同群组、不同周的草图可以合并。
+    """
+    
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+    
+    def _index(self, value):
+        return math.ceil(math.log(value) / self._log_gamma)
+    
+    def bin_of(self, value):
+        """取值所在的桶号，小于MIN_INDEXABLE_VALUE的取值在零值桶ZERO_BIN中"""
+        return ZERO_BIN if value < MIN_INDEXABLE_VALUE else self._index(value)
+    
+    def add(self, value, weight=1):
+        """加入一个取值，weight为负数时表示移除"""
+        self.add_to_bin(self.bin_of(value), weight)
+    
+    def add_to_bin(self, index, weight):
+        """按桶号增减计数，计数不会小于0"""
+        if index == ZERO_BIN:
+            new_count = max(self.zero_count + weight, 0)
+            self.count += new_count - self.zero_count
+            self.zero_count = new_count
+            return
+        old_count = self.bins.get(index, 0)
+        new_count = max(old_count + weight, 0)
+        self.count += new_count - old_count
+        if new_count:
+            self.bins[index] = new_count
+        else:
+            self.bins.pop(index, None)
+    
+    def remove(self, value):
+        """移除一个之前加入的取值"""
+        self.add(value, -1)
+    
+    def merge(self, other):
+        """将另一个草图合并到当前草图"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("只能合并精度相同的草图")
+        for index, bin_count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + bin_count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+    
+    def copy(self):
+        sketch = QuantileSketch(self.relative_accuracy)
+        sketch.bins = dict(self.bins)
+        sketch.zero_count = self.zero_count
+        sketch.count = self.count
+        return sketch
+    
+    def quantile(self, q):
+        """返回q分位数的估计值，草图为空时返回None"""
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        running = self.zero_count
+        for index in sorted(self.bins):
+            running += self.bins[index]
+            if running > rank:
+                # 取桶区间 (gamma^(i-1), gamma^i] 的中点，保证相对误差
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+    
+    def to_json(self):
+        return json.dumps({
+            "relative_accuracy": self.relative_accuracy,
+            "zero_count": self.zero_count,
+            "bins": {str(index): bin_count for index, bin_count in self.bins.items()},
+        })
+    
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        sketch = cls(data.get("relative_accuracy", 0.01))
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.bins = {int(index): bin_count for index, bin_count in data.get("bins", {}).items()}
+        sketch.count = sketch.zero_count + sum(sketch.bins.values())
+        return sketch
+    
+    def to_bins(self):
+        """返回 [(桶号, 计数)]，零值桶的桶号为ZERO_BIN"""
+        bins = list(self.bins.items())
+        if self.zero_count:
+            bins.append((ZERO_BIN, self.zero_count))
+        return bins
+
+
+def bin_deltas(samples, weight=1, relative_accuracy=0.01):
+    """把 (群ID, 周, 耗时分钟) 样本汇总为 {(群ID, 周, 桶号): 计数变化}"""
+    sketch = QuantileSketch(relative_accuracy)
+    deltas = {}
+    for group_id, week, minutes in samples:
+        key = (group_id, week, sketch.bin_of(minutes))
+        deltas[key] = deltas.get(key, 0) + weight
+    return deltas
+
+
+def apply_bin_deltas(cursor, deltas):
+    """在当前事务中把桶计数变化累加到read_latency_bins表，计数不会小于0
+    
+    每个桶一行并按增量更新，不读取已保存的草图，多个线程或进程同时写入同一个草图时不会互相覆盖。
+    """
+    cursor.executemany('''
+        INSERT INTO read_latency_bins (group_id, week, bin, count)
+        VALUES (?, ?, ?, MAX(?, 0))
+        ON CONFLICT (group_id, week, bin) DO UPDATE SET count = MAX(count + ?, 0)
+    ''', [(group_id, week, index, delta, delta) for (group_id, week, index), delta in deltas.items()])
+    if any(delta < 0 for delta in deltas.values()):
+        cursor.execute("DELETE FROM read_latency_bins WHERE count <= 0")
+
+
+def load_sketches(cursor, group_id=None, relative_accuracy=0.01):
+    """从read_latency_bins表读取草图，返回 {(群ID, 周): QuantileSketch}，group_id为None时读取所有群"""
+    if group_id is None:
+        cursor.execute("SELECT group_id, week, bin, count FROM read_latency_bins WHERE count > 0")
+    else:
+        cursor.execute('''
+            SELECT group_id, week, bin, count FROM read_latency_bins
+            WHERE group_id = ? AND count > 0
+        ''', (group_id,))
+    sketches = {}
+    for row_group_id, week, index, bin_count in cursor.fetchall():
+        key = (row_group_id, week)
+        if key not in sketches:
+            sketches[key] = QuantileSketch(relative_accuracy)
+        sketches[key].add_to_bin(index, bin_count)
+    return sketches
+
+
+def week_key(time_str):
+    """将 '%Y-%m-%d %H:%M:%S' 格式的时间转换为ISO周，如 '2025-W15'"""
+    year, week, _ = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S').isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def minutes_between(start_str, end_str):
+    """计算两个 '%Y-%m-%d %H:%M:%S' 格式时间之间的分钟数"""
+    start = datetime.strptime(start_str, '%Y-%m-%d %H:%M:%S')
+    end = datetime.strptime(end_str, '%Y-%m-%d %H:%M:%S')
+    return max((end - start).total_seconds() / 60, 0.0)
+
+
+class ReadMatrix:
+    """学生 × 日期 的已读矩阵，每个单元格占一个字节
+    
+    安装了NumPy时使用uint8二维数组，否则使用按行存储的bytearray，
+    行列合计都通过切片整体求和，不逐个单元格循环。
+    """
+    
+    def __init__(self, student_names, dates):
+        self.student_names = list(student_names)
+        self.dates = list(dates)
+        self._rows = {name: i for i, name in enumerate(self.student_names)}
+        self._cols = {date: j for j, date in enumerate(self.dates)}
+        if np is not None:
+            self.cells = np.zeros((len(self.student_names), len(self.dates)), dtype=np.uint8)
+        else:
+            self.cells = bytearray(len(self.student_names) * len(self.dates))
+    
+    @classmethod
+    def build(cls, student_names, dates, reads):
+        """根据 (学生姓名, 日期) 列表一次性构建矩阵，名单外的学生和范围外的日期被忽略"""
+        matrix = cls(student_names, dates)
+        cells = [(matrix._rows[name], matrix._cols[date]) for name, date in reads
+                 if name in matrix._rows and date in matrix._cols]
+        if not cells:
+            return matrix
+        if np is not None:
+            rows, cols = zip(*cells)
+            matrix.cells[np.array(rows), np.array(cols)] = 1
+        else:
+            width = len(matrix.dates)
+            for row, col in cells:
+                matrix.cells[row * width + col] = 1
+        return matrix
+    
+    def row_totals(self):
+        """每名学生的已读天数"""
+        if np is not None:
+            return self.cells.sum(axis=1).tolist()
+        width = len(self.dates)
+        return [sum(self.cells[i * width:(i + 1) * width]) for i in range(len(self.student_names))]
+    
+    def col_totals(self):
+        """每天的已读人数"""
+        if np is not None:
+            return self.cells.sum(axis=0).tolist()
+        width = len(self.dates)
+        return [sum(self.cells[j::width]) for j in range(width)] if width else []
+    
+    def rate_distribution(self, active_days):
+        """按已读率区间统计人数，active_days为有已读记录的天数"""
+        buckets = {"100%": 0, "80%-99%": 0, "60%-79%": 0, "1%-59%": 0, "0%": 0}
+        if not active_days:
+            return buckets
+        if np is not None:
+            rates = self.cells.sum(axis=1) / active_days
+            buckets["100%"] = int((rates >= 1).sum())
+            buckets["80%-99%"] = int(((rates >= 0.8) & (rates < 1)).sum())
+            buckets["60%-79%"] = int(((rates >= 0.6) & (rates < 0.8)).sum())
+            buckets["1%-59%"] = int(((rates > 0) & (rates < 0.6)).sum())
+            buckets["0%"] = int((rates == 0).sum())
+            return buckets
+        for total in self.row_totals():
+            rate = total / active_days
+            if rate >= 1:
+                buckets["100%"] += 1
+            elif rate >= 0.8:
+                buckets["80%-99%"] += 1
+            elif rate >= 0.6:
+                buckets["60%-79%"] += 1
+            elif rate > 0:
+                buckets["1%-59%"] += 1
+            else:
+                buckets["0%"] += 1
+        return buckets
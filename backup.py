@@ -0,0 +1,91 @@
+# encoding:utf-8
+
+import glob
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from datetime import datetime
+from pathlib import Path
+
+# 一次备份的结果，duration为秒，size为字节
+BackupResult = namedtuple("BackupResult", ["path", "backup_time", "duration", "size", "pages"])
+
+
+class BackupError(Exception):
+    """备份失败或备份文件未通过完整性检查"""
+
+
+def readonly_uri(path):
+    """以只读方式打开path的URI，路径中的?、#、%等字符会被转义"""
+    return Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+
+
+def check_integrity(path):
+    """对数据库文件执行完整性检查，通过时返回None，否则返回错误信息"""
+    conn = sqlite3.connect(readonly_uri(path), uri=True)
+    try:
+        rows = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    if rows == [("ok",)]:
+        return None
+    return "；".join(row[0] for row in rows[:5])
+
+
+def backup_database(db_path, backup_dir, prefix, keep):
+    """使用SQLite备份API复制数据库，检查通过后保存为带时间戳的快照并只保留最近keep份
+    
+    一步复制全部页面：WAL模式下读取不阻塞写入，整个复制过程读取同一个一致的快照。分步复制时其他连接的
+    每次写入都会让备份从头开始，写入频繁的数据库可能一直无法完成。
+    先写入临时文件，完整性检查通过后再改名，目录中不会出现不完整的快照。
+    """
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+    backup_time = datetime.now()
+    path = os.path.join(backup_dir, f"{prefix}-{backup_time.strftime('%Y%m%d-%H%M%S')}.db")
+    temp_path = path + ".tmp"
+    
+    try:
+        source = sqlite3.connect(readonly_uri(db_path), uri=True)
+        try:
+            target = sqlite3.connect(temp_path)
+            try:
+                source.backup(target, pages=-1)
+                # 复制的页头沿用源数据库的WAL模式，快照改回单文件的回滚日志模式，避免留下-wal/-shm文件
+                target.execute("PRAGMA journal_mode = DELETE")
+                pages = target.execute("PRAGMA page_count").fetchone()[0]
+            finally:
+                target.close()
+        finally:
+            source.close()
+        
+        error = check_integrity(temp_path)
+        if error:
+            raise BackupError(f"备份文件未通过完整性检查：{error}")
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    
+    rotate_backups(backup_dir, prefix, keep)
+    return BackupResult(
+        path=path,
+        backup_time=backup_time.strftime('%Y-%m-%d %H:%M:%S'),
+        duration=time.perf_counter() - started,
+        size=os.path.getsize(path),
+        pages=pages,
+    )
+
+
+def list_backups(backup_dir, prefix):
+    """按时间从旧到新返回已有的快照路径"""
+    return sorted(glob.glob(os.path.join(glob.escape(backup_dir), f"{prefix}-*.db")))
+
+
+def rotate_backups(backup_dir, prefix, keep):
+    """删除最早的快照，只保留最近keep份"""
+    snapshots = list_backups(backup_dir, prefix)
+    for path in snapshots[:max(len(snapshots) - max(keep, 1), 0)]:
+        os.remove(path)
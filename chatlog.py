@@ -0,0 +1,78 @@
+# encoding:utf-8
+
+import json
+from collections import namedtuple
+from datetime import datetime
+
+# 一条聊天记录，time为 '%Y-%m-%d %H:%M:%S' 格式，msg_type与微信消息类型一致（1为文本）
+ChatLogEntry = namedtuple("ChatLogEntry", ["time", "group_id", "group_name", "sender", "sender_id", "content", "msg_type"])
+
+# 文本格式导出中非文本消息的占位内容
+TEXT_MARKERS = {"[视频]": 43, "[图片]": 3, "[表情]": 47, "[链接]": 49}
+
+
+def _parse_time(value):
+    """支持 '%Y-%m-%d %H:%M:%S' 字符串和秒级时间戳"""
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value).strftime('%Y-%m-%d %H:%M:%S')
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d %H:%M:%S').strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ChatLogReader:
+    """逐行读取导出的群聊记录，无法解析的行计入invalid后跳过
+    
+    支持两种格式，按扩展名区分：
+    - .jsonl：每行一个对象，包含 time、group_id、sender、content，可选 group_name、sender_id、msg_type
+    - 其他：每行「时间<TAB>群ID<TAB>发送者<TAB>内容」，内容为[图片]、[视频]等时视为对应的非文本消息
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lines = 0
+        self.invalid = 0
+    
+    def __iter__(self):
+        is_jsonl = self.path.lower().endswith(".jsonl")
+        with open(self.path, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                line = line.rstrip("\r\n")
+                if not line.strip():
+                    continue
+                self.lines += 1
+                try:
+                    entry = self._parse_jsonl(line) if is_jsonl else self._parse_text(line)
+                except (ValueError, KeyError, TypeError):
+                    entry = None
+                if entry is None or not entry.group_id or not entry.sender:
+                    self.invalid += 1
+                    continue
+                yield entry
+    
+    @staticmethod
+    def _parse_jsonl(line):
+        data = json.loads(line)
+        return ChatLogEntry(
+            time=_parse_time(data["time"]),
+            group_id=str(data["group_id"]),
+            group_name=data.get("group_name"),
+            sender=data["sender"],
+            sender_id=data.get("sender_id"),
+            content=(data.get("content") or "").strip(),
+            msg_type=int(data.get("msg_type", 1)),
+        )
+    
+    @staticmethod
+    def _parse_text(line):
+        parts = line.split("\t", 3)
+        if len(parts) != 4:
+            return None
+        time_str, group_id, sender, content = (part.strip() for part in parts)
+        return ChatLogEntry(
+            time=_parse_time(time_str),
+            group_id=group_id,
+            group_name=None,
+            sender=sender,
+            sender_id=None,
+            content=content,
+            msg_type=TEXT_MARKERS.get(content, 1),
+        )
@@ -2,8 +2,19 @@
 
 import os
 import json
+import atexit
+import heapq
+import cProfile
+import pstats
+import marshal
+import tempfile
 import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
 import plugins
 from bridge.context import ContextType
 from bridge.reply import Reply, ReplyType
@@ -12,6 +23,88 @@ from common.log import logger
 from plugins import *
 from config import conf
 import re
+from .roster import Roster, normalize_name, build_name_index, resolve_name
+from .analytics import QuantileSketch, ReadMatrix, week_key, minutes_between, bin_deltas, apply_bin_deltas, load_sketches
+from .settings import DEFAULT_CONFIG, build_settings, invalid_options, with_whitelist
+from .roster_import import RosterImport, RosterImportError, iter_rows
+from .exporter import EXPORT_COLUMNS, EXPORT_WRITERS, MESSAGE_COLUMNS, iter_messages, iter_read_records
+from .chatlog import ChatLogReader
+from .message_store import content_hash, encode_content
+from .backup import backup_database, list_backups
+from .maintenance import (enable_incremental_vacuum, freelist_count, incremental_vacuum, optimize,
+                          delete_expired_records, delete_unreferenced_contents)
+from .tracing import StatementTracer, TracedConnection
+from .http_api import StatsApi, start_server
+from .locking import LeaderLock, is_busy_error, retry_on_busy
+from .spill import QUARANTINE_NAME, ReadEvent, SpillJournal
+from .sharding import move_groups, shard_index, shard_paths
+
+# 插件命令前缀，老师发送这些命令时不会被当作通知
+COMMAND_PREFIXES = (
+    "查询已读", "查询未读", "重置记录", "确认重置", "查看学生名单", "更新学生名单",
+    "显示白名单", "添加白名单", "删除白名单", "清空白名单", "白名单帮助",
+    "添加本群到白名单", "从白名单删除本群", "绑定别名", "删除别名", "查看别名",
+    "发布通知", "结束通知", "查看通知", "阅读速度统计", "查询同学",
+    "阅读排行", "本周统计", "新增已读", "导入学生名单", "导出已读记录",
+    "导出群消息", "补录聊天记录", "备份数据库", "插件状态", "慢语句统计", "开启性能分析",
+    "关闭性能分析",
+)
+
+# _classify_message 识别出老师通知时的返回值
+NOTICE = object()
+
+# 非文本消息类型对应的记录内容（43:视频, 3:图片, 47:表情, 49:链接）
+NON_TEXT_LABELS = {43: "[视频消息]", 3: "[图片消息]", 47: "[表情消息]", 49: "[链接消息]"}
+
+# 编译后的学生名单缓存文件，格式变化时递增版本号使旧缓存失效
+ROSTER_CACHE_FILE = ".students.cache"
+ROSTER_CACHE_VERSION = 1
+
+# 定时备份检查间隔（秒），备份文件名前缀
+BACKUP_CHECK_INTERVAL = 60
+BACKUP_PREFIX = "read_records"
+
+# 性能分析：可按命令名指定的处理方法、结果保存目录、回复中列出的函数数和单次最多分析次数
+PROFILE_COMMANDS = {
+    "查询已读同学": "_handle_query_read",
+    "查询未读同学": "_handle_query_unread",
+    "查看学生名单": "_handle_show_students",
+    "显示白名单": "_handle_show_whitelist",
+    "添加白名单": "_handle_add_whitelist",
+    "删除白名单": "_handle_remove_whitelist",
+    "查看通知": "_handle_list_notices",
+    "阅读速度统计": "_handle_read_speed_stats",
+    "查询同学": "_handle_query_student",
+    "阅读排行": "_handle_read_ranking",
+    "本周统计": "_handle_weekly_stats",
+    "新增已读": "_handle_query_new_reads",
+    "导出已读记录": "_handle_export_records",
+}
+PROFILE_DIR = "profiles"
+PROFILE_TOP = 10
+PROFILE_MAX_RUNS = 20
+
+# 存储维护检查间隔（秒），空闲时段内每次回收一部分空闲页；统计信息每天最多更新一次
+MAINTENANCE_INTERVAL = 300
+OPTIMIZE_INTERVAL = 24 * 3600
+
+# 多个进程共用数据库时，非主进程尝试接替主进程的间隔（秒）；过期记录清理的最小间隔（秒）
+LEADER_CHECK_INTERVAL = 30
+RETENTION_INTERVAL = 60
+
+# 溢出日志目录和重放检查间隔（秒）
+SPILL_DIR = "spill"
+SPILL_REPLAY_INTERVAL = 5
+
+# 按群消息配额清理的最小间隔（秒），配额检查需要扫描整张消息表
+MESSAGE_QUOTA_INTERVAL = 600
+
+# 分片数据库目录，db_shards大于1时各群的已读记录和消息记录按群ID分散保存在这里
+SHARD_DIR = "shards"
+
+# 启用分片时学生统计事件的检查间隔（秒）和每个主数据库事务最多应用的事件数
+STATS_OUTBOX_INTERVAL = 5
+STATS_OUTBOX_BATCH = 1000
 
 
 @plugins.register(
@@ -28,6 +121,9 @@ class DoNotLazy(Plugin):
         super().__init__()
         try:
             logger.info(f"[donotlazy] 开始初始化插件")
+            # 各启动阶段的耗时，用于定位启动慢的原因
+            self.startup_timings = []
+            phase_start = time.perf_counter()
             self.curdir = os.path.dirname(__file__)
             logger.info(f"[donotlazy] 插件目录: {self.curdir}")
             
@@ -37,32 +133,107 @@ class DoNotLazy(Plugin):
             
             if not self.config:
                 logger.warning("[donotlazy] 未找到配置文件，使用默认配置")
-                self.config = {
-                    "max_record_days": 7,
-                    "read_keyword": "已读",
-                    "class_name": "3班",
-                    "student_file": "students.json",
-                    "white_group_list": []
-                }
-            
-            self.max_record_days = self.config.get("max_record_days", 7)
-            self.read_keyword = self.config.get("read_keyword", "已读")
-            self.class_name = self.config.get("class_name", "3班")
-            self.student_file = self.config.get("student_file", "students.json")
-            self.white_group_list = self.config.get("white_group_list", [])
-            
-            logger.info(f"[donotlazy] 配置: max_record_days={self.max_record_days}, read_keyword={self.read_keyword}, class_name={self.class_name}, student_file={self.student_file}")
-            logger.info(f"[donotlazy] 白名单群组: {self.white_group_list}")
+                self.config = dict(DEFAULT_CONFIG)
+            
+            # 配置快照：消息处理时只读取self.settings这一个引用，配置变化时整体替换
+            # 老师名单(teacher_list)为老师的昵称或微信用户ID，老师在群里发的通知会自动开启通知跟踪
+            self.settings = self._build_settings(self.config)
+            self.config_lock = threading.Lock()
+            self.config_save_timer = None
+            atexit.register(self._flush_pending_config)
+            
+            logger.info(f"[donotlazy] 配置: max_record_days={self.settings.max_record_days}, read_keyword={self.settings.read_keyword}, class_name={self.settings.class_name}, student_file={self.settings.student_file}")
+            logger.info(f"[donotlazy] 白名单群组: {self.settings.white_group_list}")
+            phase_start = self._record_phase("加载配置", phase_start)
             
             # 加载学生名单
-            self.students = self.load_students()
+            self.students = Roster(self.load_students())
+            # 名单导入进度（已处理行数），没有导入任务时为None
+            self.import_progress = None
+            # 聊天记录补录进度（已处理行数），没有补录任务时为None
+            self.backfill_progress = None
+            # 上次按群消息配额清理的时间
+            self.last_quota_check = 0
+            phase_start = self._record_phase("加载学生名单", phase_start)
+            
+            # 性能分析：处理方法名 -> 剩余分析次数，同一时间只运行一个分析器
+            self.profiling = {}
+            self.profile_lock = threading.Lock()
+            
+            # 慢语句跟踪，slow_query_ms大于0时才创建
+            self.statement_tracer = None
+            self.tracer_lock = threading.Lock()
+            
+            # 报表缓存，数据版本号在名单变化和本进程写入后递增；其他进程的写入通过各数据库文件的
+            # PRAGMA data_version发现，为此每个文件保留一个只用于读取版本号的连接
+            self.data_version = 0
+            self.report_cache = {}
+            self.version_connections = {}
+            self.version_lock = threading.Lock()
+            
+            # 后台报表：已生成的报表、正在生成的报表和并行处理群组的线程池
+            self.async_reports = {}
+            self.building_reports = set()
+            self.report_lock = threading.Lock()
+            self.report_executor = ThreadPoolExecutor(max_workers=self.settings.report_workers, thread_name_prefix="donotlazy-group")
             
             # 初始化数据库
             self.db_path = os.path.join(self.curdir, "read_records.db")
             logger.info(f"[donotlazy] 数据库路径: {self.db_path}")
+            # 分片数在启动时确定，未启用分片时所有数据都在主数据库中
+            self.shard_count = max(int(self.settings.db_shards or 1), 1)
+            self.shard_files = self._layout_files(self.shard_count)
+            if self.shard_count > 1:
+                logger.info(f"[donotlazy] 已启用分片：{self.shard_count} 个分片，目录 {os.path.join(self.curdir, SHARD_DIR)}")
+            # 多个进程共用数据库时只有主进程执行清理、维护和定时备份
+            self.leader_lock = LeaderLock(self.db_path + ".leader")
+            self.last_leader_check = 0
+            # 数据库暂时无法写入时已读先写入溢出日志，由后台线程重放
+            self.spill_journal = SpillJournal(os.path.join(self.curdir, SPILL_DIR))
+            # 启用分片时有新的学生统计事件提交后唤醒应用事件的后台线程
+            self.stats_pending = threading.Event()
             self.init_database()
+            phase_start = self._record_phase("创建数据表", phase_start)
+            
+            # 构建昵称归一化索引（包含别名表）
+            self._rebuild_name_index()
+            
+            # 加载用户映射
+            self._load_user_map()
+            phase_start = self._record_phase("加载内存索引", phase_start)
+            
+            # 监视配置文件，修改后无需重启即可生效
+            self._start_config_watcher()
+            
+            # 定时备份数据库，最近一次备份的结果用于插件状态显示
+            self.backup_lock = threading.Lock()
+            self.last_backup = None
+            self.last_backup_error = None
+            threading.Thread(target=self._schedule_backups, name="donotlazy-backup", daemon=True).start()
+            
+            # 空闲时段回收空闲页、更新统计信息，最近一次维护的结果用于插件状态显示
+            self.last_maintenance = None
+            self.last_optimize = 0
+            threading.Thread(target=self._schedule_maintenance, name="donotlazy-maintenance", daemon=True).start()
             
-            logger.info(f"[donotlazy] 插件初始化成功，已加载 {len(self.students)} 名学生")
+            threading.Thread(target=self._replay_spilled_reads, name="donotlazy-spill", daemon=True).start()
+            
+            # 启用分片时学生统计由后台线程从各分片的事件表写入主数据库
+            if self.shard_count > 1:
+                threading.Thread(target=self._apply_stats_outboxes, name="donotlazy-stats", daemon=True).start()
+            
+            # 过期记录由主进程在后台定期清理，不占用消息处理线程
+            threading.Thread(target=self._schedule_retention, name="donotlazy-retention", daemon=True).start()
+            
+            # 可选的本机只读HTTP统计接口
+            self.http_server = None
+            self._start_http_server()
+            
+            # 建索引、回填学号等不影响消息处理的工作放到后台完成
+            threading.Thread(target=self._warm_up_database, name="donotlazy-warmup", daemon=True).start()
+            
+            timings = "，".join(f"{phase} {elapsed:.0f}ms" for phase, elapsed in self.startup_timings)
+            logger.info(f"[donotlazy] 插件初始化成功，已加载 {len(self.students)} 名学生，启动耗时：{timings}")
             self.handlers[Event.ON_HANDLE_CONTEXT] = self.on_handle_context
             self.handlers[Event.ON_RECEIVE_MESSAGE] = self.on_receive_message
             
@@ -71,90 +242,988 @@ class DoNotLazy(Plugin):
             raise f"[donotlazy] 初始化失败，忽略插件: {e}"
     
     def load_students(self):
-        """加载学生名单"""
-        students = {}
+        """加载学生名单，学生名单文件未变化时直接读取编译缓存"""
         try:
-            # 尝试从插件目录加载JSON格式的学生名单
-            student_file = os.path.join(self.curdir, self.student_file)
-            logger.info(f"[donotlazy] 尝试加载学生名单: {student_file}")
-            
-            if not os.path.exists(student_file):
-                logger.warning(f"[donotlazy] 找不到学生名单文件: {student_file}")
-                # 尝试直接加载students.json
-                default_file = os.path.join(self.curdir, "students.json")
-                if os.path.exists(default_file):
-                    student_file = default_file
-                    logger.info(f"[donotlazy] 尝试使用默认名单文件: {default_file}")
-                else:
-                    logger.error(f"[donotlazy] 默认名单文件也不存在: {default_file}")
-                    return {}
-            
-            # 检查文件大小
-            file_size = os.path.getsize(student_file)
-            logger.info(f"[donotlazy] 学生名单文件大小: {file_size} 字节")
+            student_file = self._find_student_file()
+            if not student_file:
+                return {}
             
-            # 读取JSON文件
-            with open(student_file, "r", encoding="utf-8") as f:
-                file_content = f.read()
-                logger.info(f"[donotlazy] 文件内容前100个字符: {file_content[:100]}")
-                
-                # 解析JSON
-                data = json.loads(file_content)
-                logger.info(f"[donotlazy] 成功解析JSON，数据结构: {list(data.keys()) if isinstance(data, dict) else '非字典'}")
-                
-            # 解析学生数据
-            if "students" in data and isinstance(data["students"], list):
-                student_list = data["students"]
-                for student in student_list:
-                    if "name" in student and "id" in student:
-                        students[student["name"]] = student["id"]
-                        
-            # 记录加载结果
-            count = len(students)
-            logger.info(f"[donotlazy] 成功从文件加载了 {count} 名学生")
-            if count > 0:
-                logger.info(f"[donotlazy] 部分学生名单: {list(students.keys())[:5]}...")
-            else:
-                logger.warning(f"[donotlazy] 从文件加载的学生名单为空")
+            # 缓存以文件路径、修改时间和大小为键，任一变化都会重新解析
+            stat = os.stat(student_file)
+            cache_key = (os.path.abspath(student_file), stat.st_mtime_ns, stat.st_size)
+            students = self._read_roster_cache(cache_key)
+            if students is not None:
+                logger.info(f"[donotlazy] 从名单缓存加载了 {len(students)} 名学生")
+                return students
             
+            students = self._parse_student_file(student_file)
+            if students:
+                self._write_roster_cache(cache_key, students)
             return students
         except Exception as e:
             logger.error(f"[donotlazy] 加载学生名单异常: {e}")
             logger.exception(e)  # 打印完整堆栈
             return {}
     
+    def _find_student_file(self):
+        """返回学生名单文件路径，配置的文件不存在时尝试默认的students.json"""
+        student_file = os.path.join(self.curdir, self.settings.student_file)
+        logger.info(f"[donotlazy] 尝试加载学生名单: {student_file}")
+        if os.path.exists(student_file):
+            return student_file
+        
+        logger.warning(f"[donotlazy] 找不到学生名单文件: {student_file}")
+        # 尝试直接加载students.json
+        default_file = os.path.join(self.curdir, "students.json")
+        if os.path.exists(default_file):
+            logger.info(f"[donotlazy] 尝试使用默认名单文件: {default_file}")
+            return default_file
+        logger.error(f"[donotlazy] 默认名单文件也不存在: {default_file}")
+        return None
+    
+    def _parse_student_file(self, student_file):
+        """解析JSON格式的学生名单文件"""
+        students = {}
+        
+        # 检查文件大小
+        file_size = os.path.getsize(student_file)
+        logger.info(f"[donotlazy] 学生名单文件大小: {file_size} 字节")
+        
+        # 读取JSON文件
+        with open(student_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        logger.debug(f"[donotlazy] 成功解析JSON，数据结构: {list(data.keys()) if isinstance(data, dict) else '非字典'}")
+        
+        # 解析学生数据
+        if "students" in data and isinstance(data["students"], list):
+            student_list = data["students"]
+            for student in student_list:
+                if "name" in student and "id" in student:
+                    students[student["name"]] = student["id"]
+        
+        # 记录加载结果
+        count = len(students)
+        logger.info(f"[donotlazy] 成功从文件加载了 {count} 名学生")
+        if count > 0:
+            logger.debug(f"[donotlazy] 部分学生名单: {list(students.keys())[:5]}...")
+        else:
+            logger.warning(f"[donotlazy] 从文件加载的学生名单为空")
+        
+        return students
+    
+    def _read_roster_cache(self, cache_key):
+        """读取名单缓存，缓存不存在、格式不符或键不匹配时返回None"""
+        cache_path = os.path.join(self.curdir, ROSTER_CACHE_FILE)
+        try:
+            with open(cache_path, "rb") as f:
+                version, key, pairs = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != ROSTER_CACHE_VERSION or key != cache_key:
+            return None
+        return dict(pairs)
+    
+    def _write_roster_cache(self, cache_key, students):
+        """将解析后的名单写入缓存，先写临时文件再原子替换"""
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.curdir, prefix=".students.", suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                marshal.dump((ROSTER_CACHE_VERSION, cache_key, list(students.items())), f)
+            os.replace(tmp_path, os.path.join(self.curdir, ROSTER_CACHE_FILE))
+            tmp_path = None
+        except Exception as e:
+            logger.warning(f"[donotlazy] 写入名单缓存失败：{e}")
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
     def init_database(self):
         """初始化数据库"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                # 创建已读记录表
+                # 新建的数据库直接使用增量清理模式，已有数据库在空闲时段的维护中转换
+                cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                # WAL模式下读写互不阻塞，多个进程共用数据库时只有写入之间需要等待
+                cursor.execute("PRAGMA journal_mode = WAL")
+                self._create_group_tables(cursor)
+                # 创建学生别名表，alias保存归一化后的别名
                 cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS read_records (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        group_id TEXT,
+                    CREATE TABLE IF NOT EXISTS student_aliases (
+                        alias TEXT PRIMARY KEY,
                         student_name TEXT,
-                        read_time TEXT,
-                        create_date TEXT,
-                        UNIQUE(group_id, student_name, create_date)
+                        create_time TEXT
+                    )
+                ''')
+                # 创建用户ID到学生的映射表，昵称变化后仍能识别同一学生
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS user_student_map (
+                        user_id TEXT PRIMARY KEY,
+                        student_name TEXT,
+                        student_id TEXT,
+                        nickname TEXT,
+                        update_time TEXT
                     )
                 ''')
-                # 创建消息记录表
+                
+                # 创建通知表，每个群同一时间最多有一条开启中的通知
                 cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS message_records (
+                    CREATE TABLE IF NOT EXISTS notices (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         group_id TEXT,
-                        message_content TEXT,
+                        content TEXT,
+                        publisher TEXT,
                         create_time TEXT,
                         create_date TEXT,
-                        other_user_nickname TEXT
+                        status TEXT DEFAULT 'open',
+                        close_time TEXT
+                    )
+                ''')
+                self._create_student_stats_tables(cursor)
+                self._migrate_student_stats(cursor)
+                # 创建有效日期表，记录有已读记录的日期，连续天数按有效日期计算
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS read_days (
+                        create_date TEXT PRIMARY KEY
+                    )
+                ''')
+                self._migrate_latency_sketches(cursor)
+                # 创建存储元数据表，记录当前的分片数，分片数变化时据此迁移数据
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS db_meta (
+                        key TEXT PRIMARY KEY,
+                        value TEXT
                     )
                 ''')
                 conn.commit()
-                logger.info("[donotlazy] 数据库初始化成功")
+            
+            if self.shard_count > 1:
+                os.makedirs(os.path.join(self.curdir, SHARD_DIR), exist_ok=True)
+                for path in self.shard_files:
+                    with self._open_connection(path) as conn:
+                        cursor = conn.cursor()
+                        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                        cursor.execute("PRAGMA journal_mode = WAL")
+                        self._create_group_tables(cursor)
+                        conn.commit()
+            self._rebalance_shards()
+            logger.info("[donotlazy] 数据库初始化成功")
         except Exception as e:
             logger.error(f"[donotlazy] 数据库初始化异常：{e}")
     
+    def _create_student_stats_tables(self, cursor):
+        """创建学生统计表，学生按学号标识，名单中改名后统计不会分开"""
+        # 创建学生统计表，保存连续已读天数及更新前的状态（用于重置时撤销）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS student_stats (
+                student_id TEXT PRIMARY KEY,
+                current_streak INTEGER DEFAULT 0,
+                last_read_date TEXT,
+                prev_streak INTEGER DEFAULT 0,
+                prev_read_date TEXT
+            )
+        ''')
+        # 创建学生月度统计表，(month, read_days)索引用于直接读取排行
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS student_monthly_stats (
+                student_id TEXT,
+                month TEXT,
+                read_days INTEGER DEFAULT 0,
+                PRIMARY KEY (student_id, month)
+            )
+        ''')
+        # 创建学生已读群组表，记录名单学生每天在哪些群有已读记录：同一天在多个群已读只计入一次统计，
+        # 重置某个群的记录后该学生当天在其他群都没有记录时才撤销
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS student_read_groups (
+                student_id TEXT,
+                create_date TEXT,
+                group_id TEXT,
+                PRIMARY KEY (student_id, create_date, group_id)
+            ) WITHOUT ROWID
+        ''')
+    
+    def _migrate_student_stats(self, cursor):
+        """把旧版本按姓名保存的学生统计转换为按学号保存，转换后删除旧表
+        
+        姓名通过旧统计表中记录的学号对应；改名后分开的两份月度统计合并，连续天数保留最近已读的一份。
+        """
+        cursor.execute("PRAGMA table_info(student_stats)")
+        if "student_name" not in [info[1] for info in cursor.fetchall()]:
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'student_read_groups'")
+        has_groups = cursor.fetchone() is not None
+        legacy_tables = ["student_stats", "student_monthly_stats"] + (["student_read_groups"] if has_groups else [])
+        for table in legacy_tables:
+            cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_by_name")
+        self._create_student_stats_tables(cursor)
+        
+        cursor.execute('''
+            INSERT OR IGNORE INTO student_stats
+            (student_id, current_streak, last_read_date, prev_streak, prev_read_date)
+            SELECT student_id, current_streak, last_read_date, prev_streak, prev_read_date
+            FROM student_stats_by_name
+            WHERE student_id IS NOT NULL
+            ORDER BY last_read_date DESC
+        ''')
+        cursor.execute('''
+            INSERT INTO student_monthly_stats (student_id, month, read_days)
+            SELECT s.student_id, m.month, SUM(m.read_days)
+            FROM student_monthly_stats_by_name m
+            JOIN student_stats_by_name s ON s.student_name = m.student_name
+            WHERE s.student_id IS NOT NULL
+            GROUP BY s.student_id, m.month
+        ''')
+        if has_groups:
+            cursor.execute('''
+                INSERT OR IGNORE INTO student_read_groups (student_id, create_date, group_id)
+                SELECT s.student_id, g.create_date, g.group_id
+                FROM student_read_groups_by_name g
+                JOIN student_stats_by_name s ON s.student_name = g.student_name
+                WHERE s.student_id IS NOT NULL
+            ''')
+        for table in legacy_tables:
+            cursor.execute(f"DROP TABLE {table}_by_name")
+        logger.info("[donotlazy] 已将学生统计转换为按学号保存")
+    
+    def _create_group_tables(self, cursor):
+        """创建按群保存的表：已读记录、消息记录、消息内容、查看水位线、通知已读、阅读耗时草图和统计事件
+        
+        启用分片时这些表在每个分片中各有一份，收到已读时只写入群所在的分片；其余的表只在主数据库中。
+        """
+        # 创建已读记录表
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS read_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id TEXT,
+                student_name TEXT,
+                read_time TEXT,
+                create_date TEXT,
+                UNIQUE(group_id, student_name, create_date)
+            )
+        ''')
+        # 创建消息记录表
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS message_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id TEXT,
+                message_content TEXT,
+                create_time TEXT,
+                create_date TEXT,
+                other_user_nickname TEXT,
+                content_hash TEXT,
+                content_size INTEGER
+            )
+        ''')
+        # 创建消息内容表，message_storage为dedup时相同内容只保存一份
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS message_contents (
+                hash TEXT PRIMARY KEY,
+                content
+            ) WITHOUT ROWID
+        ''')
+        # 创建查看水位线表，记录每个查询人在各群各日期已看到的最大记录ID
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS read_watermarks (
+                requester TEXT,
+                group_id TEXT,
+                create_date TEXT,
+                last_id INTEGER,
+                check_time TEXT,
+                PRIMARY KEY (requester, group_id, create_date)
+            )
+        ''')
+        # 创建通知已读表，主键(notice_id, student_name)即按通知查询的索引
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS notice_reads (
+                notice_id INTEGER,
+                student_name TEXT,
+                student_id TEXT,
+                group_id TEXT,
+                nickname TEXT,
+                read_time TEXT,
+                PRIMARY KEY (notice_id, student_name)
+            ) WITHOUT ROWID
+        ''')
+        # 创建阅读耗时草图表，每个群每周的分位数草图按桶保存，每个桶一行
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS read_latency_bins (
+                group_id TEXT,
+                week TEXT,
+                bin INTEGER,
+                count INTEGER,
+                PRIMARY KEY (group_id, week, bin)
+            ) WITHOUT ROWID
+        ''')
+        # 创建学生统计事件表，启用分片时已读和重置在分片事务中记录事件，由后台线程按ID顺序应用到主数据库；
+        # 使用AUTOINCREMENT，已应用的事件删除后ID也不会重复使用
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS stats_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                action TEXT,
+                student_name TEXT,
+                student_id TEXT,
+                group_id TEXT,
+                create_date TEXT
+            )
+        ''')
+        
+        # 已读记录按学号标识学生，昵称仅用于展示
+        cursor.execute("PRAGMA table_info(read_records)")
+        columns = [info[1] for info in cursor.fetchall()]
+        if "student_id" not in columns:
+            cursor.execute("ALTER TABLE read_records ADD COLUMN student_id TEXT")
+            logger.info("[donotlazy] 已为read_records表添加student_id列")
+        if "nickname" not in columns:
+            cursor.execute("ALTER TABLE read_records ADD COLUMN nickname TEXT")
+            logger.info("[donotlazy] 已为read_records表添加nickname列")
+        
+        # 旧版本的消息记录表缺少群名称和内容哈希等列
+        cursor.execute("PRAGMA table_info(message_records)")
+        columns = [info[1] for info in cursor.fetchall()]
+        for column, column_type in (("other_user_nickname", "TEXT"), ("content_hash", "TEXT"), ("content_size", "INTEGER")):
+            if column not in columns:
+                cursor.execute(f"ALTER TABLE message_records ADD COLUMN {column} {column_type}")
+                logger.info(f"[donotlazy] 已为message_records表添加{column}列")
+    
+    def _layout_files(self, count):
+        """分片数为count时保存群组数据的数据库文件，count为1时只有主数据库"""
+        if count <= 1:
+            return [self.db_path]
+        return shard_paths(os.path.join(self.curdir, SHARD_DIR), count)
+    
+    def _rebalance_shards(self):
+        """分片数与上次启动不同时，把群组数据按新的分片数重新分布
+        
+        每个 (原文件, 新分片) 在一个事务中移动，中途退出后下次启动会继续迁移剩下的部分；WAL模式下
+        跨文件的提交不是原子的，恰好在提交时退出时新分片已提交、原文件未提交，重新迁移时按新分片中记录的
+        shard_moves跳过复制，不会产生重复数据，见move_groups。调整分片数时应先停止其他共用数据库的进程。
+        迁移后的已读记录使用新的ID，原文件中的查看水位线随之清除，"新增已读"会从当天的全部记录重新开始。
+        原分片中尚未应用的学生统计事件在迁移前先应用到主数据库。
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM db_meta WHERE key = 'shard_count'").fetchone()
+            # 旧版本启用分片时通知已读和阅读耗时草图保存在主数据库中
+            leftover = conn.execute('''
+                SELECT EXISTS (SELECT 1 FROM notice_reads) OR EXISTS (SELECT 1 FROM read_latency_bins)
+            ''').fetchone()[0]
+        previous = int(row[0]) if row else 1
+        if previous != self.shard_count:
+            sources = self._layout_files(previous)
+            logger.info(f"[donotlazy] 分片数从 {previous} 调整为 {self.shard_count}，开始迁移群组数据")
+        elif self.shard_count > 1 and leftover:
+            sources = [self.db_path]
+            logger.info("[donotlazy] 开始把主数据库中的通知已读和阅读耗时草图移到各分片")
+        else:
+            return
+        
+        started = time.perf_counter()
+        moved = 0
+        for source in sources:
+            if not os.path.exists(source):
+                continue
+            if source != self.db_path:
+                # 旧版本创建的分片缺少后来加入的按群保存的表
+                with self._open_connection(source) as conn:
+                    self._create_group_tables(conn.cursor())
+                conn.close()
+                self._drain_stats_outbox(source)
+            for index, target in enumerate(self.shard_files):
+                if target != source:
+                    moved += retry_on_busy(self._move_shard_groups, source, target, index)
+            with self._open_connection(source) as conn:
+                conn.execute("DELETE FROM read_watermarks")
+            conn.close()
+            if source != self.db_path:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(source + suffix):
+                        os.remove(source + suffix)
+        
+        # 全部迁移完成后清除迁移记录，以后再调整分片数时同名的原文件可以重新迁移
+        for path in self.shard_files:
+            with self._open_connection(path) as conn:
+                conn.execute("DROP TABLE IF EXISTS shard_moves")
+            conn.close()
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES ('shard_count', ?)", (str(self.shard_count),))
+            # 同名的分片以后重新创建时事件ID从头开始，删除的分片的已应用位置一并清除
+            conn.executemany("DELETE FROM db_meta WHERE key = ?",
+                             [(self._outbox_key(source),) for source in sources if source not in self.shard_files])
+        logger.info(f"[donotlazy] 分片迁移完成，移动了 {moved} 条已读记录，耗时 {time.perf_counter() - started:.2f} 秒")
+    
+    def _move_shard_groups(self, source, target, index):
+        """在单独的事务中把source中属于第index个分片的群组数据移到target
+        
+        以target为主数据库打开、附加source，提交时先写入target，中途退出不会丢失数据。
+        """
+        with self._open_connection(target) as conn:
+            conn.execute("ATTACH DATABASE ? AS source", (source,))
+            moved = move_groups(conn, "source", "main", index, self.shard_count, os.path.basename(source))
+            conn.commit()
+        conn.close()
+        return moved
+    
+    def _record_phase(self, phase, phase_start):
+        """记录启动阶段耗时，返回下一阶段的开始时间"""
+        now = time.perf_counter()
+        self.startup_timings.append((phase, (now - phase_start) * 1000))
+        return now
+    
+    def _ensure_indexes(self):
+        """创建查询所需的索引，已存在的索引会被跳过"""
+        try:
+            for path in self.shard_files:
+                with self._connect_shard(path) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_read_records_student_id
+                        ON read_records (group_id, student_id, create_date)
+                    ''')
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_read_records_create_date
+                        ON read_records (create_date)
+                    ''')
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_read_records_group_date
+                        ON read_records (group_id, create_date)
+                    ''')
+                    # 按学生查询历史记录的覆盖索引，查询无需回表
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_read_records_student_history
+                        ON read_records (student_name, create_date, group_id, read_time)
+                    ''')
+                    # 按日期导出群消息和清理过期消息
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_message_records_create_date
+                        ON message_records (create_date)
+                    ''')
+                    # 按群查找最近的群名称，补录聊天记录时用于判断消息是否已存在
+                    cursor.execute('''
+                        CREATE INDEX IF NOT EXISTS idx_message_records_group_time
+                        ON message_records (group_id, create_time)
+                    ''')
+                    conn.commit()
+            
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_notices_group_status
+                    ON notices (group_id, status)
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_student_monthly_stats_rank
+                    ON student_monthly_stats (month, read_days)
+                ''')
+                conn.commit()
+        except Exception as e:
+            logger.error(f"[donotlazy] 创建索引异常：{e}")
+    
+    def _warm_up_database(self):
+        """后台预热：检查索引、为历史记录回填学号、首次启用时重建学生统计"""
+        phase_start = time.perf_counter()
+        self._ensure_indexes()
+        phase_start = self._record_phase("检查索引", phase_start)
+        self._backfill_student_ids()
+        phase_start = self._record_phase("回填学号", phase_start)
+        self._rebuild_student_stats()
+        self._record_phase("重建学生统计", phase_start)
+        
+        timings = "，".join(f"{phase} {elapsed:.0f}ms" for phase, elapsed in self.startup_timings[-3:])
+        logger.info(f"[donotlazy] 后台预热完成，耗时：{timings}")
+    
+    def _load_aliases(self):
+        """从数据库加载别名表"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT alias, student_name FROM student_aliases")
+                return dict(cursor.fetchall())
+        except Exception as e:
+            logger.error(f"[donotlazy] 加载别名表异常：{e}")
+            return {}
+    
+    def _rebuild_name_index(self):
+        """根据学生名单和别名表重建昵称索引"""
+        self.aliases = self._load_aliases()
+        self.name_index, conflicts = build_name_index(self.students.keys(), self.aliases)
+        if conflicts:
+            logger.warning(f"[donotlazy] 以下归一化昵称对应多名学生，已从索引中排除: {sorted(conflicts)}")
+        self._invalidate_reports()
+        logger.info(f"[donotlazy] 昵称索引构建完成，共 {len(self.name_index)} 个键，别名 {len(self.aliases)} 个")
+    
+    def _resolve_student_name(self, nickname):
+        """将昵称解析为学生姓名，无法解析时原样返回"""
+        name = resolve_name(nickname, self.students, self.name_index)
+        if name and name != nickname:
+            logger.info(f"[donotlazy] 昵称 {nickname} 解析为学生 {name}")
+        return name or nickname
+    
+    def _load_user_map(self):
+        """从数据库加载用户ID到学生姓名的映射缓存"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT user_id, student_name, nickname FROM user_student_map")
+                rows = cursor.fetchall()
+            self.user_map = {user_id: student_name for user_id, student_name, _ in rows}
+            self.user_nicknames = {nickname: student_name for _, student_name, nickname in rows if nickname}
+            logger.info(f"[donotlazy] 已加载 {len(self.user_map)} 条用户映射")
+        except Exception as e:
+            logger.error(f"[donotlazy] 加载用户映射异常：{e}")
+            self.user_map = {}
+            self.user_nicknames = {}
+    
+    def _resolve_sender(self, msg, batch=False, deadline=None):
+        """解析消息发送者对应的学生姓名
+        
+        昵称能解析到名单中的学生时，以昵称为准并更新用户映射；否则使用用户ID映射，昵称改成无法识别的内容也不影响。
+        batch为True时用于批量补录：不更新用户映射，识别过程只记录DEBUG日志。
+        deadline为更新用户映射的截止时间（time.monotonic()），不指定时按db_busy_timeout等待。
+        """
+        nickname = getattr(msg, "actual_user_nickname", None)
+        user_id = getattr(msg, "actual_user_id", None)
+        name = resolve_name(nickname, self.students, self.name_index)
+        
+        if name:
+            if not batch and user_id and self.user_map.get(user_id) != name:
+                timeout = None if deadline is None else self._remaining(deadline)
+                self._save_user_mapping(user_id, name, nickname, timeout)
+            return name
+        
+        if user_id:
+            mapped_name = self.user_map.get(user_id)
+            if mapped_name in self.students:
+                log = logger.debug if batch else logger.info
+                log(f"[donotlazy] 用户 {user_id}（{nickname}）通过映射识别为学生 {mapped_name}")
+                return mapped_name
+        return nickname
+    
+    def _save_user_mapping(self, user_id, student_name, nickname, timeout=None):
+        """保存用户ID到学生的映射
+        
+        数据库被占用时不重试：内存中的映射保持不变，这名用户下次发消息时会再次保存。
+        """
+        try:
+            with self._connect(timeout) as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR REPLACE INTO user_student_map
+                    (user_id, student_name, student_id, nickname, update_time)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (
+                    user_id,
+                    student_name,
+                    self.students.get(student_name),
+                    nickname,
+                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                ))
+                conn.commit()
+            
+            self.user_map[user_id] = student_name
+            if nickname:
+                self.user_nicknames[nickname] = student_name
+            logger.info(f"[donotlazy] 已保存用户映射: {user_id}（{nickname}） -> {student_name}")
+        except Exception as e:
+            if is_busy_error(e):
+                logger.warning(f"[donotlazy] 数据库忙，暂不保存用户映射 {user_id} -> {student_name}：{e}")
+            else:
+                logger.error(f"[donotlazy] 保存用户映射异常：{e}")
+    
+    def _backfill_student_ids(self):
+        """为尚未关联学号的已读记录回填学号
+        
+        记录中的名字能通过名单、别名或用户映射识别时，改写为名单中的姓名并填入学号；
+        同一天该群已存在该学生记录时合并为一条，保留较早的已读时间。回填的记录计入学生统计。
+        """
+        try:
+            for path in self.shard_files:
+                with self._connect_shard(path) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT DISTINCT student_name
+                        FROM read_records
+                        WHERE student_id IS NULL
+                    ''')
+                    
+                    updates = []
+                    for (name,) in cursor.fetchall():
+                        student_name = resolve_name(name, self.students, self.name_index) or self.user_nicknames.get(name)
+                        if student_name in self.students:
+                            updates.append((name, student_name, self.students[student_name]))
+                    if not updates:
+                        continue
+                    
+                    events = []
+                    merged = 0
+                    for name, student_name, student_id in updates:
+                        cursor.execute('''
+                            SELECT DISTINCT group_id, create_date
+                            FROM read_records
+                            WHERE student_name = ? AND student_id IS NULL
+                        ''', (name,))
+                        events.extend(("read", student_name, student_id, group_id, create_date)
+                                      for group_id, create_date in cursor.fetchall())
+                        merged += self._merge_legacy_reads(cursor, name, student_name)
+                        cursor.execute('''
+                            UPDATE read_records
+                            SET student_name = ?, student_id = ?, nickname = COALESCE(nickname, student_name)
+                            WHERE student_name = ? AND student_id IS NULL
+                        ''', (student_name, student_id, name))
+                    # 统计事件按日期顺序应用，连续天数才能正确累计
+                    events.sort(key=lambda event: event[4])
+                    self._queue_stats_events(cursor, path, events)
+                    conn.commit()
+                    self.stats_pending.set()
+                    logger.info(f"[donotlazy] 已为 {len(updates)} 个名字回填学号，合并 {merged} 条重复记录")
+        except Exception as e:
+            logger.error(f"[donotlazy] 回填学号异常：{e}")
+    
+    @staticmethod
+    def _merge_legacy_reads(cursor, name, student_name):
+        """把name下未关联学号、且同一天该群已有student_name记录的旧记录合并到已有记录，返回合并的条数
+        
+        已有记录保留较早的已读时间，没有群昵称时使用旧记录的名字；旧记录随后删除，不会再以原名字出现在名单外。
+        """
+        cursor.execute('''
+            SELECT kept.id, legacy.id, MIN(kept.read_time, legacy.read_time)
+            FROM read_records AS legacy
+            JOIN read_records AS kept
+                ON kept.group_id = legacy.group_id
+                AND kept.create_date = legacy.create_date
+                AND kept.student_name = ?
+                AND kept.id != legacy.id
+            WHERE legacy.student_name = ? AND legacy.student_id IS NULL
+        ''', (student_name, name))
+        conflicts = cursor.fetchall()
+        if not conflicts:
+            return 0
+        cursor.executemany('''
+            UPDATE read_records
+            SET read_time = COALESCE(?, read_time), nickname = COALESCE(nickname, ?)
+            WHERE id = ?
+        ''', [(read_time, name, kept_id) for kept_id, _, read_time in conflicts])
+        cursor.executemany("DELETE FROM read_records WHERE id = ?", [(legacy_id,) for _, legacy_id, _ in conflicts])
+        return len(conflicts)
+    
+    def _find_open_notice(self, group_id, timeout=None):
+        """群内开启中的通知编号，没有时返回None
+        
+        每次都从notices表按(group_id, status)索引查询，其他进程发布或结束的通知也能立即看到。
+        """
+        with self._open_connection(self._readonly_uri(self.db_path), uri=True, timeout=timeout) as conn:
+            row = conn.execute('''
+                SELECT id FROM notices
+                WHERE group_id = ? AND status = 'open'
+                ORDER BY id DESC
+                LIMIT 1
+            ''', (group_id,)).fetchone()
+        return row[0] if row else None
+    
+    def _is_group_allowed(self, group_id):
+        """白名单为空时允许所有群组，否则只允许白名单中的群组"""
+        white_group_set = self.settings.white_group_set
+        return not white_group_set or group_id in white_group_set
+    
+    def _is_teacher(self, msg):
+        """判断发送者是否为配置中的老师"""
+        teacher_set = self.settings.teacher_set
+        return (getattr(msg, "actual_user_id", None) in teacher_set
+                or getattr(msg, "actual_user_nickname", None) in teacher_set)
+    
+    def _is_notice_message(self, msg, content):
+        """判断是否为老师在群里发布的通知"""
+        settings = self.settings
+        if not settings.teacher_set or not self._is_teacher(msg):
+            return False
+        # 较短的消息可能是老师代学生回复"某某已读"，不作为通知
+        if len(content) < settings.notice_min_length:
+            return False
+        return not content.startswith(COMMAND_PREFIXES)
+    
+    def _open_notice(self, group_id, content, publisher, timeout=None):
+        """在群内开启新通知，同时结束该群之前的通知，timeout为等待其他进程写入的秒数"""
+        with self._connect(timeout) as conn:
+            cursor = conn.cursor()
+            now = datetime.now()
+            time_str = now.strftime('%Y-%m-%d %H:%M:%S')
+            
+            cursor.execute('''
+                UPDATE notices
+                SET status = 'closed', close_time = ?
+                WHERE group_id = ? AND status = 'open'
+            ''', (time_str, group_id))
+            cursor.execute('''
+                INSERT INTO notices (group_id, content, publisher, create_time, create_date, status)
+                VALUES (?, ?, ?, ?, ?, 'open')
+            ''', (group_id, content, publisher, time_str, now.strftime('%Y-%m-%d')))
+            notice_id = cursor.lastrowid
+            conn.commit()
+        return notice_id
+    
+    def _close_notice(self, group_id):
+        """结束群内开启中的通知，返回被结束的通知编号"""
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute('''
+                SELECT id FROM notices
+                WHERE group_id = ? AND status = 'open'
+                ORDER BY id DESC
+                LIMIT 1
+            ''', (group_id,))
+            row = cursor.fetchone()
+            if not row:
+                conn.rollback()
+                return None
+            cursor.execute('''
+                UPDATE notices
+                SET status = 'closed', close_time = ?
+                WHERE group_id = ? AND status = 'open'
+            ''', (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), group_id))
+            conn.commit()
+        return row[0]
+    
+    def _migrate_latency_sketches(self, cursor):
+        """把旧版本按JSON整体保存的草图表转换为按桶保存，转换后删除旧表"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'read_latency_sketches'")
+        if not cursor.fetchone():
+            return
+        cursor.execute("SELECT group_id, week, sketch FROM read_latency_sketches")
+        deltas = {}
+        for group_id, week, sketch in cursor.fetchall():
+            for index, bin_count in QuantileSketch.from_json(sketch).to_bins():
+                deltas[(group_id, week, index)] = bin_count
+        apply_bin_deltas(cursor, deltas)
+        cursor.execute("DROP TABLE read_latency_sketches")
+        logger.info(f"[donotlazy] 已将阅读耗时草图转换为按桶保存，共 {len(deltas)} 个桶")
+    
+    def _update_latency_sketches(self, cursor, group_id, samples, weight=1):
+        """在当前事务中更新阅读耗时草图
+        
+        samples为(通知发布时间, 已读时间)列表，weight为-1时表示撤销这些样本。
+        只累加各桶的计数变化，并发写入同一个草图时不会丢失样本。
+        """
+        deltas = bin_deltas([(group_id, week_key(notice_time), minutes_between(notice_time, read_time))
+                             for notice_time, read_time in samples], weight)
+        apply_bin_deltas(cursor, deltas)
+    
+    def _update_student_stats(self, cursor, student_id, date_str):
+        """在当前事务中更新学生的连续已读天数和月度已读天数
+        
+        连续天数按"有已读记录的日期"计算，周末等没有通知的日子不会中断连续记录；
+        同时保存更新前的状态，重置当日记录时可以撤销。
+        """
+        cursor.execute("INSERT OR IGNORE INTO read_days (create_date) VALUES (?)", (date_str,))
+        cursor.execute('''
+            SELECT current_streak, last_read_date
+            FROM student_stats
+            WHERE student_id = ?
+        ''', (student_id,))
+        row = cursor.fetchone()
+        prev_streak, prev_read_date = row if row else (0, None)
+        if prev_read_date == date_str:
+            return
+        
+        cursor.execute("SELECT MAX(create_date) FROM read_days WHERE create_date < ?", (date_str,))
+        prev_day = cursor.fetchone()[0]
+        current_streak = prev_streak + 1 if prev_read_date and prev_read_date == prev_day else 1
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO student_stats
+            (student_id, current_streak, last_read_date, prev_streak, prev_read_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (student_id, current_streak, date_str, prev_streak, prev_read_date))
+        cursor.execute('''
+            INSERT INTO student_monthly_stats (student_id, month, read_days)
+            VALUES (?, ?, 1)
+            ON CONFLICT (student_id, month) DO UPDATE SET read_days = read_days + 1
+        ''', (student_id, date_str[:7]))
+    
+    def _count_read_day(self, cursor, student_id, date_str):
+        """在当前事务中把学生新的已读日期计入统计
+        
+        不早于学生最近已读日期时按实时逻辑更新连续天数；更早的日期（补录、重放）只计入有效日期和月度已读天数，
+        不改写已有的连续天数。
+        """
+        cursor.execute("SELECT last_read_date FROM student_stats WHERE student_id = ?", (student_id,))
+        row = cursor.fetchone()
+        if not row or not row[0] or date_str >= row[0]:
+            self._update_student_stats(cursor, student_id, date_str)
+            return
+        cursor.execute("INSERT OR IGNORE INTO read_days (create_date) VALUES (?)", (date_str,))
+        cursor.execute('''
+            INSERT INTO student_monthly_stats (student_id, month, read_days)
+            VALUES (?, ?, 1)
+            ON CONFLICT (student_id, month) DO UPDATE SET read_days = read_days + 1
+        ''', (student_id, date_str[:7]))
+    
+    def _revert_read_day(self, cursor, student_id, date_str):
+        """在当前事务中撤销学生在指定日期的统计，用于重置当日记录后修正"""
+        cursor.execute('''
+            UPDATE student_stats
+            SET current_streak = prev_streak, last_read_date = prev_read_date
+            WHERE student_id = ? AND last_read_date = ?
+        ''', (student_id, date_str))
+        cursor.execute('''
+            UPDATE student_monthly_stats
+            SET read_days = read_days - 1
+            WHERE student_id = ? AND month = ? AND read_days > 0
+        ''', (student_id, date_str[:7]))
+        # 当天已没有任何学生计入统计时，不再作为有效日期
+        cursor.execute('''
+            DELETE FROM read_days
+            WHERE create_date = ?
+            AND NOT EXISTS (SELECT 1 FROM student_read_groups WHERE create_date = ?)
+        ''', (date_str, date_str))
+    
+    def _apply_stats_events(self, cursor, events):
+        """在主数据库的当前事务中按顺序应用学生统计事件
+        
+        events为 (action, student_name, student_id, group_id, create_date) 列表：read表示学生当天在该群有已读记录，
+        revert表示该群当天的记录已被重置。统计按学号保存，只依据student_read_groups判断，不需要读取各分片：
+        学生当天第一个群的已读计入统计，最后一个群的记录被重置时撤销，重复的事件不会改变结果。
+        姓名只用于日志和排查，名单中改名不影响统计。
+        """
+        for action, _, student_id, group_id, date_str in events:
+            if action == "read":
+                cursor.execute('''
+                    INSERT OR IGNORE INTO student_read_groups (student_id, create_date, group_id)
+                    VALUES (?, ?, ?)
+                ''', (student_id, date_str, group_id))
+            else:
+                cursor.execute('''
+                    DELETE FROM student_read_groups
+                    WHERE student_id = ? AND create_date = ? AND group_id = ?
+                ''', (student_id, date_str, group_id))
+            if not cursor.rowcount:
+                continue
+            
+            cursor.execute('''
+                SELECT COUNT(*) FROM student_read_groups
+                WHERE student_id = ? AND create_date = ?
+            ''', (student_id, date_str))
+            groups = cursor.fetchone()[0]
+            if action == "read" and groups == 1:
+                self._count_read_day(cursor, student_id, date_str)
+            elif action == "revert" and groups == 0:
+                self._revert_read_day(cursor, student_id, date_str)
+    
+    def _queue_stats_events(self, cursor, path, events):
+        """在path分片的当前事务中提交学生统计事件，格式见_apply_stats_events
+        
+        未启用分片时直接在同一事务中更新统计；启用分片时写入分片的stats_outbox，与已读记录一起原子提交，
+        由后台线程应用到主数据库，收到已读时不需要等待主数据库的写锁。
+        """
+        if path == self.db_path:
+            self._apply_stats_events(cursor, events)
+            return
+        cursor.executemany('''
+            INSERT INTO stats_outbox (action, student_name, student_id, group_id, create_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', events)
+    
+    @staticmethod
+    def _outbox_key(path):
+        """db_meta中记录分片已应用的最大统计事件ID的键"""
+        return f"stats_outbox:{os.path.basename(path)}"
+    
+    def _drain_stats_outbox(self, path):
+        """把path分片中的学生统计事件应用到主数据库，返回应用的事件数
+        
+        已应用的最大事件ID与统计在主数据库的同一事务中更新，每个事件只应用一次；多个进程同时应用时
+        按主数据库的写锁排队。主数据库提交后再删除分片中已应用的事件，中途退出也不会重复应用。
+        """
+        key = self._outbox_key(path)
+        applied = 0
+        while True:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute("SELECT value FROM db_meta WHERE key = ?", (key,))
+                row = cursor.fetchone()
+                watermark = int(row[0]) if row else 0
+                with self._open_connection(self._readonly_uri(path), uri=True) as shard:
+                    stale = shard.execute("SELECT EXISTS (SELECT 1 FROM stats_outbox WHERE id <= ?)", (watermark,)).fetchone()[0]
+                    events = shard.execute('''
+                        SELECT id, action, student_name, student_id, group_id, create_date
+                        FROM stats_outbox
+                        WHERE id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    ''', (watermark, STATS_OUTBOX_BATCH)).fetchall()
+                shard.close()
+                if events:
+                    self._apply_stats_events(cursor, [event[1:] for event in events])
+                    watermark = events[-1][0]
+                    cursor.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES (?, ?)", (key, str(watermark)))
+                conn.commit()
+            
+            if events or stale:
+                with self._open_connection(path) as shard:
+                    shard.execute("DELETE FROM stats_outbox WHERE id <= ?", (watermark,))
+                shard.close()
+            if not events:
+                break
+            applied += len(events)
+        
+        if applied:
+            self._invalidate_reports()
+        return applied
+    
+    def _apply_stats_outboxes(self):
+        """启用分片时在后台把各分片的学生统计事件应用到主数据库
+        
+        本进程提交事件后立即应用，另外每STATS_OUTBOX_INTERVAL秒检查一次，其他进程退出前留下的事件也会被应用。
+        """
+        while True:
+            self.stats_pending.wait(STATS_OUTBOX_INTERVAL)
+            self.stats_pending.clear()
+            for path in self.shard_files:
+                try:
+                    self._drain_stats_outbox(path)
+                except Exception as e:
+                    if is_busy_error(e):
+                        logger.warning(f"[donotlazy] 数据库忙，稍后再应用学生统计事件：{e}")
+                    else:
+                        logger.error(f"[donotlazy] 应用学生统计事件异常：{e}")
+                        logger.exception(e)
+    
+    def _rebuild_student_stats(self):
+        """学生统计表为空时，根据保留期内的已读记录重建；旧版本升级后补全学生已读群组表"""
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM student_stats")
+                rebuild = cursor.fetchone()[0] == 0
+                cursor.execute("SELECT 1 FROM db_meta WHERE key = 'student_read_groups'")
+                if not rebuild and cursor.fetchone():
+                    return
+                
+                shard_rows = self._fan_out(lambda shard: shard.execute('''
+                    SELECT DISTINCT create_date, student_name, student_id, group_id
+                    FROM read_records
+                    WHERE student_id IS NOT NULL
+                ''').fetchall())
+                # 同一学生同一天可能在多个群都有记录，按日期顺序重建
+                rows = sorted(row for result in shard_rows for row in result)
+                if rebuild:
+                    cursor.execute("DELETE FROM student_read_groups")
+                    self._apply_stats_events(cursor, [("read", student_name, student_id, group_id, create_date)
+                                                      for create_date, student_name, student_id, group_id in rows])
+                else:
+                    # 已有的统计保持不变，只记录各学生每天在哪些群已读
+                    cursor.executemany('''
+                        INSERT OR IGNORE INTO student_read_groups (student_id, create_date, group_id)
+                        VALUES (?, ?, ?)
+                    ''', [(student_id, create_date, group_id) for create_date, _, student_id, group_id in rows])
+                cursor.execute("INSERT OR REPLACE INTO db_meta (key, value) VALUES ('student_read_groups', '1')")
+                conn.commit()
+                if rebuild and rows:
+                    logger.info(f"[donotlazy] 已根据 {len(rows)} 条记录重建学生统计")
+        except Exception as e:
+            logger.error(f"[donotlazy] 重建学生统计异常：{e}")
+    
     def on_handle_context(self, e_context: EventContext):
         """处理用户命令"""
         if e_context["context"].type not in [ContextType.TEXT]:
@@ -176,7 +1245,7 @@ class DoNotLazy(Plugin):
         # 检查是否为群消息，以及是否在白名单中
         if e_context["context"]["isgroup"]:
             # 如果白名单不为空，且当前群组不在白名单中，则不处理
-            if self.white_group_list and msg.other_user_id not in self.white_group_list:
+            if not self._is_group_allowed(msg.other_user_id):
                 logger.info(f"[donotlazy] 群组 {msg.other_user_id} 不在白名单中，跳过处理")
                 return
         
@@ -198,6 +1267,32 @@ class DoNotLazy(Plugin):
         # 更新学生名单
         elif content == "更新学生名单":
             self._handle_reload_students(e_context, msg)
+        # 从CSV/XLSX导入学生名单
+        elif content.startswith("导入学生名单"):
+            self._handle_import_students(e_context, msg, content[6:].strip())
+        # 导出已读记录
+        elif content.startswith("导出已读记录"):
+            self._handle_export_records(e_context, msg, content[6:].strip())
+        # 导出群消息，用于审计
+        elif content.startswith("导出群消息"):
+            self._handle_export_messages(e_context, msg, content[5:].strip())
+        # 从导出的聊天记录补录
+        elif content.startswith("补录聊天记录"):
+            self._handle_backfill_chat_log(e_context, msg, content[6:].strip())
+        # 立即备份数据库
+        elif content == "备份数据库":
+            self._handle_backup_database(e_context, msg)
+        # 查看插件状态
+        elif content == "插件状态":
+            self._handle_plugin_status(e_context, msg)
+        # 查看或清空慢语句统计
+        elif content.startswith("慢语句统计"):
+            self._handle_slow_statements(e_context, msg, content[5:].strip())
+        # 对指定命令的后续几次执行做性能分析
+        elif content.startswith("开启性能分析"):
+            self._handle_start_profiling(e_context, msg, content[6:].strip())
+        elif content == "关闭性能分析":
+            self._handle_stop_profiling(e_context, msg)
         # 测试记录命令
         elif content == "测试记录同学24":
             self._handle_test_record(e_context, msg, "同学24")
@@ -216,6 +1311,42 @@ class DoNotLazy(Plugin):
         # 白名单帮助
         elif content == "白名单帮助":
             self._handle_whitelist_help(e_context, msg)
+        # 绑定别名
+        elif content.startswith("绑定别名"):
+            self._handle_bind_alias(e_context, msg, content[4:].strip())
+        # 删除别名
+        elif content.startswith("删除别名"):
+            self._handle_unbind_alias(e_context, msg, content[4:].strip())
+        # 查看别名
+        elif content == "查看别名":
+            self._handle_show_aliases(e_context, msg)
+        # 发布通知
+        elif content == "发布通知" or content.startswith("发布通知 "):
+            self._handle_publish_notice(e_context, msg, content[4:].strip())
+        # 结束通知
+        elif content == "结束通知":
+            self._handle_close_notice(e_context, msg)
+        # 查看通知
+        elif content == "查看通知":
+            self._handle_list_notices(e_context, msg)
+        # 按通知查询已读/未读，如"查询未读 通知3"
+        elif re.match(r'^查询(已读|未读)\s*通知\s*\d+$', content):
+            self._handle_query_notice(e_context, msg, content)
+        # 阅读速度统计
+        elif content == "阅读速度统计":
+            self._handle_read_speed_stats(e_context, msg)
+        # 查询单个同学的已读记录
+        elif content.startswith("查询同学"):
+            self._handle_query_student(e_context, msg, content[4:].strip())
+        # 阅读排行
+        elif content == "阅读排行" or content.startswith("阅读排行 "):
+            self._handle_read_ranking(e_context, msg, content[4:].strip())
+        # 本周统计
+        elif content == "本周统计":
+            self._handle_weekly_stats(e_context, msg)
+        # 新增已读
+        elif content == "新增已读":
+            self._handle_query_new_reads(e_context, msg)
     
     def _handle_query_read(self, e_context, msg):
         """处理查询已读同学命令"""
@@ -397,41 +1528,36 @@ class DoNotLazy(Plugin):
             
             logger.info(f"[donotlazy] 已加载学生名单，共 {len(self.students)} 人")
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # 检查数据库是否有记录
-                cursor.execute("SELECT COUNT(*) FROM read_records WHERE create_date = ?", (query_date,))
-                total_records = cursor.fetchone()[0]
-                logger.info(f"[donotlazy] 数据库中 {query_date} 共有 {total_records} 条已读记录")
-                
-                # 查询记录 - 在私聊中查询所有记录而不仅是私聊的记录
-                if e_context["context"]["isgroup"]:
-                    # 群聊中只查询该群的记录
-                    logger.info(f"[donotlazy] 在群组中查询: {group_id}, 日期: {query_date}")
+            # 查询记录 - 在私聊中查询所有记录而不仅是私聊的记录
+            if e_context["context"]["isgroup"]:
+                # 群聊中只查询该群所在的分片
+                logger.info(f"[donotlazy] 在群组中查询: {group_id}, 日期: {query_date}")
+                with self._connect_group(group_id) as conn:
+                    cursor = conn.cursor()
                     cursor.execute('''
                         SELECT student_name, read_time
                         FROM read_records
                         WHERE group_id = ? AND create_date = ?
                         ORDER BY read_time ASC
                     ''', (group_id, query_date))
-                else:
-                    # 私聊中查询所有记录
-                    logger.info(f"[donotlazy] 在私聊中查询所有群组, 日期: {query_date}")
-                    cursor.execute('''
-                        SELECT student_name, read_time, group_id
-                        FROM read_records
-                        WHERE create_date = ?
-                        ORDER BY read_time ASC
-                    ''', (query_date,))
-                
-                records = cursor.fetchall()
-                logger.info(f"[donotlazy] 查询结果: 找到 {len(records)} 条符合条件的记录, 查询日期: {query_date}")
-                
-                # 仅用于调试 - 输出部分记录内容
-                if records and len(records) > 0:
-                    sample = records[0]
-                    logger.info(f"[donotlazy] 记录样例: {sample}")
+                    records = cursor.fetchall()
+            else:
+                # 私聊中查询所有分片的记录，按已读时间合并
+                logger.info(f"[donotlazy] 在私聊中查询所有群组, 日期: {query_date}")
+                shard_records = self._fan_out(lambda conn: conn.execute('''
+                    SELECT student_name, read_time, group_id
+                    FROM read_records
+                    WHERE create_date = ?
+                    ORDER BY read_time ASC
+                ''', (query_date,)).fetchall())
+                records = list(heapq.merge(*shard_records, key=lambda record: record[1]))
+            
+            logger.info(f"[donotlazy] 查询结果: 找到 {len(records)} 条符合条件的记录, 查询日期: {query_date}")
+            
+            # 仅用于调试 - 输出部分记录内容
+            if records and len(records) > 0:
+                sample = records[0]
+                logger.info(f"[donotlazy] 记录样例: {sample}")
             
             if not records:
                 date_display = "今日" if query_date == today else query_date
@@ -486,10 +1612,7 @@ class DoNotLazy(Plugin):
                         result += f"{i+1}. {name_display}（{time}）\n"
                     
                     # 计算名单中的未读人数
-                    in_list_count = 0
-                    for name in self.students:
-                        if not any(record[0] == name for record in records):
-                            in_list_count += 1
+                    in_list_count = len(self.students.names - {record[0] for record in records})
                     
                     result += f"\n已读：{len(records)}人，未读：{in_list_count}人"
                 
@@ -524,34 +1647,37 @@ class DoNotLazy(Plugin):
             group_id = msg.other_user_id if e_context["context"]["isgroup"] else "私聊"
             group_name = msg.other_user_nickname if e_context["context"]["isgroup"] else "私聊"
             
+            # 整个查询使用同一份名单快照
+            roster = self.students
+            
             # 在私聊中查询所有群组的未读情况
             if e_context["context"]["isgroup"]:
                 # 获取今日该群已读学生
-                with sqlite3.connect(self.db_path) as conn:
+                with self._connect_group(group_id) as conn:
                     cursor = conn.cursor()
                     cursor.execute('''
-                        SELECT student_name
+                        SELECT student_name, student_id
                         FROM read_records
                         WHERE group_id = ? AND create_date = ?
                     ''', (group_id, today))
                     
-                    all_read_users = [record[0] for record in cursor.fetchall()]
+                    all_read_users = cursor.fetchall()
                 
-                # 分类已读用户：在名单中和不在名单中的
+                # 分类已读用户：按学号区分在名单中和不在名单中的
                 read_students_in_list = []
                 read_students_not_in_list = []
+                read_ids = set()
                 
-                for name in all_read_users:
-                    if name in self.students:
+                for name, student_id in all_read_users:
+                    if student_id:
                         read_students_in_list.append(name)
+                        read_ids.add(student_id)
                     else:
                         read_students_not_in_list.append(name)
                 
-                # 找出未读的学生
-                unread_students = []
-                for name in self.students.keys():
-                    if name not in all_read_users:
-                        unread_students.append(name)
+                # 按学号顺序找出未读的学生
+                read_students_in_list.sort(key=lambda name: roster.positions.get(name, len(roster)))
+                unread_students = [name for name in roster.order if roster[name] not in read_ids]
                 
                 if not unread_students:
                     result = f"在 {today}，{group_name} 所有名单内的同学均已阅读。\n\n"
@@ -568,7 +1694,7 @@ class DoNotLazy(Plugin):
                     display_limit = min(10, len(read_students_in_list))
                     for i in range(display_limit):
                         student_name = read_students_in_list[i]
-                        student_id = self.students.get(student_name, "")
+                        student_id = roster.get(student_name, "")
                         result += f"  {i+1}. {student_name}（学号：{student_id}）\n"
                     
                     if len(read_students_in_list) > display_limit:
@@ -588,103 +1714,14 @@ class DoNotLazy(Plugin):
                 if len(unread_students) > 0:
                     result += f"未读同学名单：\n"
                     for i, name in enumerate(unread_students):
-                        student_id = self.students.get(name, "")
+                        student_id = roster.get(name, "")
                         result += f"  {i+1}. {name}（学号：{student_id}）\n"
                 
                 reply.content = result.strip()
             else:
-                # 私聊模式：获取所有群组的阅读情况
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    
-                    # 获取所有活跃的群组
-                    cursor.execute('''
-                        SELECT DISTINCT group_id 
-                        FROM read_records 
-                        WHERE create_date = ? AND group_id != '私聊'
-                    ''', (today,))
-                    
-                    active_groups = [record[0] for record in cursor.fetchall()]
-                    
-                    if not active_groups:
-                        reply.content = f"在 {today}，没有任何群组的已读记录。"
-                        e_context["reply"] = reply
-                        e_context.action = EventAction.BREAK_PASS
-                        return
-                    
-                    result = f"未读情况统计（{today}）\n\n"
-                    
-                    # 获取每个群的已读情况
-                    for group_id in active_groups:
-                        cursor.execute('''
-                            SELECT student_name
-                            FROM read_records
-                            WHERE group_id = ? AND create_date = ?
-                        ''', (group_id, today))
-                        
-                        all_read_users = [record[0] for record in cursor.fetchall()]
-                        
-                        # 分类已读用户：在名单中和不在名单中的
-                        read_students_in_list = []
-                        read_students_not_in_list = []
-                        
-                        for name in all_read_users:
-                            if name in self.students:
-                                read_students_in_list.append(name)
-                            else:
-                                read_students_not_in_list.append(name)
-                        
-                        # 找出未读的学生
-                        unread_students = []
-                        for name in self.students.keys():
-                            if name not in all_read_users:
-                                unread_students.append(name)
-                        
-                        # 获取群名称
-                        group_name = self._get_group_name(group_id)
-                        result += f"【群组: {group_name}】\n"
-                        result += f"在名单中的已读人数：{len(read_students_in_list)}人\n"
-                        result += f"未在同学名单中但已读人数：{len(read_students_not_in_list)}人\n"
-                        result += f"未读人数：{len(unread_students)}人\n"
-                        
-                        # 显示在名单中的已读学生
-                        if len(read_students_in_list) > 0:
-                            result += f"在名单中的已读同学：\n"
-                            # 只显示前10个已读学生，如果太多的话
-                            display_limit = min(10, len(read_students_in_list))
-                            for i in range(display_limit):
-                                student_name = read_students_in_list[i]
-                                student_id = self.students.get(student_name, "")
-                                result += f"  {i+1}. {student_name}（学号：{student_id}）\n"
-                            
-                            if len(read_students_in_list) > display_limit:
-                                result += f"  ...等共 {len(read_students_in_list)} 人已读\n"
-                            
-                            result += "\n"
-                        
-                        # 显示不在名单中但已读的用户
-                        if len(read_students_not_in_list) > 0:
-                            result += f"未在同学名单中但已读的用户：\n"
-                            for i, name in enumerate(read_students_not_in_list):
-                                result += f"  {i+1}. {name}\n"
-                            
-                            result += "\n"
-                        
-                        # 显示未读学生名单
-                        if len(unread_students) > 0:
-                            result += f"未读同学名单：\n"
-                            # 只显示前10个未读学生，如果太多的话
-                            display_limit = min(10, len(unread_students))
-                            for i in range(display_limit):
-                                student_id = self.students.get(unread_students[i], "")
-                                result += f"  {i+1}. {unread_students[i]}（学号：{student_id}）\n"
-                            
-                            if len(unread_students) > display_limit:
-                                result += f"  ...等共 {len(unread_students)} 人未读\n"
-                        
-                        result += "\n"
-                    
-                    reply.content = result.strip()
+                # 私聊模式：汇总所有群组耗时较长，在后台生成后再发送
+                reply.content = self._run_report_async(
+                    e_context, ("unread", today, roster.version), lambda: self._build_all_groups_unread_report(today, roster))
         except Exception as e:
             logger.error(f"[donotlazy] 查询未读同学异常：{e}")
             reply.content = f"查询失败：{str(e)}"
@@ -692,18 +1729,244 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
-    def _handle_reset_confirm(self, e_context, msg):
-        """处理重置记录确认"""
-        reply = Reply()
-        reply.type = ReplyType.TEXT
-        
-        try:
-            today = datetime.now().strftime('%Y-%m-%d')
-            group_id = msg.other_user_id if e_context["context"]["isgroup"] else "私聊"
+    def _connect(self, timeout=None):
+        """打开数据库连接，timeout为等待其他进程写入的秒数，默认为db_busy_timeout"""
+        return self._open_connection(self.db_path, timeout=timeout)
+    
+    def _connect_readonly(self):
+        """打开只读数据库连接，供后台报表线程使用"""
+        return self._open_connection(self._readonly_uri(self.db_path), uri=True)
+    
+    @staticmethod
+    def _readonly_uri(path):
+        return Path(os.path.abspath(path)).as_uri() + "?mode=ro"
+    
+    def _shard_path(self, group_id):
+        """群组数据所在的数据库文件，未启用分片时为主数据库"""
+        if self.shard_count <= 1:
+            return self.db_path
+        return self.shard_files[shard_index(group_id, self.shard_count)]
+    
+    def _connect_group(self, group_id, timeout=None, readonly=False):
+        """打开群组所在分片的连接，按群处理的命令和消息写入只访问这一个分片"""
+        return self._connect_shard(self._shard_path(group_id), timeout=timeout, readonly=readonly)
+    
+    def _connect_shard(self, path, timeout=None, readonly=False):
+        """打开分片连接并以只读方式附加主数据库
+        
+        分片中只有按群保存的表，通知等全局表按名称自动解析到附加的主数据库，可以在同一条SQL中读取。
+        主数据库只读：分片事务不会占用主数据库的写锁，学生统计通过_queue_stats_events异步写入。
+        """
+        if path == self.db_path:
+            return self._connect_readonly() if readonly else self._connect(timeout)
+        if readonly:
+            conn = self._open_connection(self._readonly_uri(path), uri=True)
+        else:
+            conn = self._open_connection(Path(os.path.abspath(path)).as_uri(), uri=True, timeout=timeout)
+        conn.execute("ATTACH DATABASE ? AS shared", (self._readonly_uri(self.db_path),))
+        return conn
+    
+    def _fan_out(self, query, readonly=True):
+        """在每个分片上执行query(conn)，按分片顺序返回结果列表
+        
+        有多个分片时在报表线程池中并行执行，因此不能在线程池的任务中调用。
+        """
+        def run(path):
+            with self._connect_shard(path, readonly=readonly) as conn:
+                return query(conn)
+        
+        if len(self.shard_files) == 1:
+            return [run(self.shard_files[0])]
+        return list(self.report_executor.map(run, self.shard_files))
+    
+    def _database_files(self):
+        """主数据库和所有分片的文件，用于备份、维护和统计大小"""
+        return list(dict.fromkeys([self.db_path] + self.shard_files))
+    
+    def _open_connection(self, database, uri=False, timeout=None):
+        """启用慢语句跟踪时返回记录每条语句耗时的连接"""
+        # 其他进程写入时默认最多等待db_busy_timeout秒
+        if timeout is None:
+            timeout = self.settings.db_busy_timeout
+        tracer = self._get_statement_tracer()
+        if tracer is None:
+            return sqlite3.connect(database, uri=uri, timeout=timeout)
+        conn = sqlite3.connect(database, uri=uri, timeout=timeout, factory=TracedConnection)
+        conn.tracer = tracer
+        return conn
+    
+    def _get_statement_tracer(self):
+        """按当前配置返回慢语句跟踪器，未启用时返回None；修改阈值后保留已记录的慢语句"""
+        settings = self.settings
+        if not settings.slow_query_ms:
+            return None
+        tracer = self.statement_tracer
+        if tracer is None:
+            with self.tracer_lock:
+                if self.statement_tracer is None:
+                    self.statement_tracer = StatementTracer(settings.slow_query_ms, settings.slow_query_top)
+                tracer = self.statement_tracer
+        tracer.threshold_ms = settings.slow_query_ms
+        tracer.top_n = settings.slow_query_top
+        return tracer
+    
+    def _build_all_groups_unread_report(self, today, roster):
+        """生成私聊模式下所有群组的未读情况报表，各分片并行查出活跃群组后，各群在线程池中并行处理"""
+        # 获取所有活跃的群组
+        shard_groups = self._fan_out(lambda conn: conn.execute('''
+            SELECT DISTINCT group_id 
+            FROM read_records 
+            WHERE create_date = ? AND group_id != '私聊'
+        ''', (today,)).fetchall())
+        active_groups = sorted(record[0] for records in shard_groups for record in records)
+        
+        if not active_groups:
+            return f"在 {today}，没有任何群组的已读记录。"
+        
+        result = f"未读情况统计（{today}）\n\n"
+        sections = self.report_executor.map(lambda group_id: self._render_group_unread(group_id, today, roster), active_groups)
+        result += "".join(sections)
+        return result.strip()
+    
+    def _render_group_unread(self, group_id, today, roster):
+        """生成单个群组的未读情况段落"""
+        with self._connect_group(group_id, readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT student_name, student_id
+                FROM read_records
+                WHERE group_id = ? AND create_date = ?
+            ''', (group_id, today))
+            
+            all_read_users = cursor.fetchall()
+        
+        # 分类已读用户：按学号区分在名单中和不在名单中的
+        read_students_in_list = []
+        read_students_not_in_list = []
+        read_ids = set()
+        
+        for name, student_id in all_read_users:
+            if student_id:
+                read_students_in_list.append(name)
+                read_ids.add(student_id)
+            else:
+                read_students_not_in_list.append(name)
+        
+        # 按学号顺序找出未读的学生
+        read_students_in_list.sort(key=lambda name: roster.positions.get(name, len(roster)))
+        unread_students = [name for name in roster.order if roster[name] not in read_ids]
+        
+        # 获取群名称
+        group_name = self._get_group_name(group_id)
+        result = f"【群组: {group_name}】\n"
+        result += f"在名单中的已读人数：{len(read_students_in_list)}人\n"
+        result += f"未在同学名单中但已读人数：{len(read_students_not_in_list)}人\n"
+        result += f"未读人数：{len(unread_students)}人\n"
+        
+        # 显示在名单中的已读学生
+        if len(read_students_in_list) > 0:
+            result += f"在名单中的已读同学：\n"
+            # 只显示前10个已读学生，如果太多的话
+            display_limit = min(10, len(read_students_in_list))
+            for i in range(display_limit):
+                student_name = read_students_in_list[i]
+                student_id = roster.get(student_name, "")
+                result += f"  {i+1}. {student_name}（学号：{student_id}）\n"
+            
+            if len(read_students_in_list) > display_limit:
+                result += f"  ...等共 {len(read_students_in_list)} 人已读\n"
+            
+            result += "\n"
+        
+        # 显示不在名单中但已读的用户
+        if len(read_students_not_in_list) > 0:
+            result += f"未在同学名单中但已读的用户：\n"
+            for i, name in enumerate(read_students_not_in_list):
+                result += f"  {i+1}. {name}\n"
+            
+            result += "\n"
+        
+        # 显示未读学生名单
+        if len(unread_students) > 0:
+            result += f"未读同学名单：\n"
+            # 只显示前10个未读学生，如果太多的话
+            display_limit = min(10, len(unread_students))
+            for i in range(display_limit):
+                student_id = roster.get(unread_students[i], "")
+                result += f"  {i+1}. {unread_students[i]}（学号：{student_id}）\n"
+            
+            if len(unread_students) > display_limit:
+                result += f"  ...等共 {len(unread_students)} 人未读\n"
+        
+        result += "\n"
+        return result
+    
+    def _run_report_async(self, e_context, cache_key, builder):
+        """在后台生成耗时报表
+        
+        最近 report_cache_minutes 分钟内生成过的报表直接返回；否则立即回复"生成中"，
+        报表生成完成后通过当前通道发送给请求人。
+        """
+        now = datetime.now()
+        with self.report_lock:
+            cached = self.async_reports.get(cache_key)
+            if cached and now - cached[0] < timedelta(minutes=self.settings.report_cache_minutes):
+                return f"{cached[1]}\n\n（报表生成于 {cached[0].strftime('%H:%M')}，{self.settings.report_cache_minutes}分钟内不会重复生成）"
+            if cache_key in self.building_reports:
+                return "报表正在生成中，完成后会自动发送，请稍候。"
+            self.building_reports.add(cache_key)
+        
+        channel = e_context.econtext.get("channel")
+        context = e_context["context"]
+        
+        def build_and_send():
+            try:
+                started = time.time()
+                content = builder()
+                with self.report_lock:
+                    self.async_reports[cache_key] = (datetime.now(), content)
+                logger.info(f"[donotlazy] 后台报表 {cache_key} 生成完成，耗时 {time.time() - started:.2f} 秒")
+            except Exception as e:
+                logger.error(f"[donotlazy] 后台生成报表异常：{e}")
+                logger.exception(e)
+                content = f"报表生成失败：{str(e)}"
+            finally:
+                with self.report_lock:
+                    self.building_reports.discard(cache_key)
+            
+            if channel is None:
+                logger.warning(f"[donotlazy] 无法获取消息通道，报表 {cache_key} 仅保存在缓存中")
+                return
+            self._send_to_channel(channel, context, content)
+        
+        threading.Thread(target=build_and_send, name="donotlazy-report", daemon=True).start()
+        return "报表生成中，涉及的群组较多，完成后会自动发送。"
+    
+    def _send_to_channel(self, channel, context, content):
+        """通过消息通道主动发送文本，用于后台任务完成后通知请求人"""
+        if channel is None:
+            logger.warning(f"[donotlazy] 无法获取消息通道，未发送：{content[:50]}")
+            return
+        try:
+            reply = Reply()
+            reply.type = ReplyType.TEXT
+            reply.content = content
+            channel.send(reply, context)
+        except Exception as e:
+            logger.error(f"[donotlazy] 发送后台消息异常：{e}")
+    
+    def _handle_reset_confirm(self, e_context, msg):
+        """处理重置记录确认"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            today = datetime.now().strftime('%Y-%m-%d')
+            group_id = msg.other_user_id if e_context["context"]["isgroup"] else "私聊"
             group_name = msg.other_user_nickname if e_context["context"]["isgroup"] else "私聊"
             
             # 查询当天记录数量
-            with sqlite3.connect(self.db_path) as conn:
+            with self._connect_group(group_id) as conn:
                 cursor = conn.cursor()
                 cursor.execute('''
                     SELECT COUNT(*)
@@ -734,15 +1997,41 @@ class DoNotLazy(Plugin):
             group_id = msg.other_user_id if e_context["context"]["isgroup"] else "私聊"
             today = datetime.now().strftime('%Y-%m-%d')
             
-            with sqlite3.connect(self.db_path) as conn:
+            path = self._shard_path(group_id)
+            with self._connect_shard(path) as conn:
                 cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT student_name, student_id FROM read_records
+                    WHERE group_id = ? AND create_date = ? AND student_id IS NOT NULL
+                ''', (group_id, today))
+                students = cursor.fetchall()
+                
                 cursor.execute('''
                     DELETE FROM read_records
                     WHERE group_id = ? AND create_date = ?
                 ''', (group_id, today))
-                conn.commit()
-                
                 deleted_count = cursor.rowcount
+                
+                # 修正学生统计，其他群当天仍有记录的学生不会被撤销
+                self._queue_stats_events(cursor, path, [("revert", student_name, student_id, group_id, today)
+                                                        for student_name, student_id in students])
+                
+                # 同时清除当日记录到通知中的已读，并从阅读速度草图中撤销
+                cursor.execute('''
+                    SELECT n.create_time, r.read_time
+                    FROM notice_reads r
+                    JOIN notices n ON n.id = r.notice_id
+                    WHERE r.group_id = ? AND r.read_time LIKE ?
+                ''', (group_id, f"{today}%"))
+                self._update_latency_sketches(cursor, group_id, cursor.fetchall(), -1)
+                cursor.execute('''
+                    DELETE FROM notice_reads
+                    WHERE group_id = ? AND read_time LIKE ?
+                ''', (group_id, f"{today}%"))
+                conn.commit()
+            
+            self.stats_pending.set()
+            self._invalidate_reports()
             
             reply.content = f"已重置{today}的阅读记录，共删除 {deleted_count} 条记录。"
         except Exception as e:
@@ -758,16 +2047,18 @@ class DoNotLazy(Plugin):
         reply.type = ReplyType.TEXT
         
         try:
-            if not self.students:
+            # 整个列表使用同一份名单快照，按学号顺序显示
+            roster = self.students
+            if not roster:
                 reply.content = "当前未加载任何学生信息。"
             else:
-                result = f"当前已加载 {len(self.students)} 名学生信息：\n\n"
-                for i, (name, student_id) in enumerate(self.students.items()):
-                    result += f"{i+1}. {name}（学号：{student_id}）\n"
+                result = f"当前已加载 {len(roster)} 名学生信息：\n\n"
+                for i, name in enumerate(roster.order):
+                    result += f"{i+1}. {name}（学号：{roster[name]}）\n"
                     
                 # 检查是否包含特定学生
-                if "同学24" in self.students:
-                    result += f"\n同学24在名单中，学号为：{self.students['同学24']}"
+                if "同学24" in roster:
+                    result += f"\n同学24在名单中，学号为：{roster['同学24']}"
                 else:
                     result += f"\n注意：同学24不在名单中"
                     
@@ -804,23 +2095,23 @@ class DoNotLazy(Plugin):
                 return
             
             # 如果白名单不为空，且当前群组不在白名单中，则不处理
-            if hasattr(msg, "other_user_id") and self.white_group_list and msg.other_user_id not in self.white_group_list:
+            if hasattr(msg, "other_user_id") and not self._is_group_allowed(msg.other_user_id):
                 logger.info(f"[donotlazy] 群组 {msg.other_user_id} 不在白名单中，跳过处理")
                 return
             
-            # 自动清理过期数据
-            self._clean_expired_records()
+            # 写入群消息、用户映射和已读共用一个截止时间，数据库被占用时整条消息最多等待spill_deadline秒
+            deadline = time.monotonic() + self.settings.spill_deadline
             
             # 优先检查消息类型
             if msg_type == 43:
                 # 处理视频消息（类型43）
                 logger.info(f"[donotlazy] 处理视频消息，发送者: {getattr(msg, 'actual_user_nickname', 'unknown')}")
-                self._process_non_text_message(msg)
+                self._process_non_text_message(msg, deadline)
                 return
             elif msg_type in [3, 47, 49]:
                 # 处理其他已知消息类型（3:图片, 47:表情, 49:链接）
                 logger.info(f"[donotlazy] 处理其他类型消息({msg_type})，发送者: {getattr(msg, 'actual_user_nickname', 'unknown')}")
-                self._process_non_text_message(msg)
+                self._process_non_text_message(msg, deadline)
                 return
             
             # 根据context类型处理
@@ -828,170 +2119,427 @@ class DoNotLazy(Plugin):
                 # 处理文本消息
                 content = e_context["context"].content.strip()
                 # 记录群消息
-                self._record_message(msg)
+                self._record_message(msg.other_user_id, msg.content, msg.other_user_nickname, deadline)
                 # 优化已读消息识别
-                self._process_read_message(msg, content)
+                self._process_read_message(msg, content, deadline)
             elif msg_type == 1:
                 # 处理文本消息但不是通过context检测到的
                 if hasattr(msg, "content"):
                     content = msg.content.strip()
-                    self._record_message(msg)
-                    self._process_read_message(msg, content)
+                    self._record_message(msg.other_user_id, msg.content, msg.other_user_nickname, deadline)
+                    self._process_read_message(msg, content, deadline)
                 else:
                     logger.warning(f"[donotlazy] 文本消息缺少content属性")
             else:
                 # 未知消息类型，尝试作为非文本消息处理
                 logger.info(f"[donotlazy] 收到未处理的消息类型: {msg_type}，尝试作为非文本消息处理")
-                self._process_non_text_message(msg)
+                self._process_non_text_message(msg, deadline)
         except Exception as e:
             logger.error(f"[donotlazy] 处理消息异常: {e}")
             logger.exception(e)
     
-    def _process_read_message(self, msg, content):
-        """处理可能的已读消息"""
+    def _process_read_message(self, msg, content, deadline):
+        """处理可能的已读消息，deadline为整条消息写入数据库的截止时间（time.monotonic()）"""
         try:
             logger.info(f"[donotlazy] 处理消息: {content}, 发送者: {msg.actual_user_nickname}")
             
-            # 直接发送"已读"的情况
-            if content == self.read_keyword:
-                student_name = msg.actual_user_nickname
-                logger.info(f"[donotlazy] 检测到纯已读消息，发送者: {student_name}")
-                # 不再检查学生是否在名单中，直接记录
-                self._record_read_status(msg, student_name)
-                return
-            
-            # "XXX已读"的情况
-            if self.read_keyword in content:
-                logger.info(f"[donotlazy] 检测到可能包含已读的消息: {content}")
-                
-                # 先尝试精确匹配 "某某已读"
-                found_match = False
-                for name in self.students.keys():
-                    pattern = f"{name}{self.read_keyword}"
-                    if pattern in content:
-                        logger.info(f"[donotlazy] 从消息中精确匹配到学生: {name}")
-                        self._record_read_status(msg, name)
-                        found_match = True
-                        break
-                
-                if found_match:
-                    return
-                    
-                # 尝试匹配发送者，如果发送包含已读关键词的消息
-                student_name = msg.actual_user_nickname
-                if self.read_keyword in content:
-                    logger.info(f"[donotlazy] 发送者消息包含已读关键词: {student_name}")
-                    self._record_read_status(msg, student_name)
-                    return
-                
-                # 尝试更宽松的匹配
-                for name in content.replace(self.read_keyword, "").strip().split():
-                    if name and len(name) > 1:  # 避免记录单个字符
-                        # 检查名字在已读关键词之前
-                        if name in content and content.find(name) < content.find(self.read_keyword):
-                            logger.info(f"[donotlazy] 从消息中提取可能的名字: {name}")
-                            self._record_read_status(msg, name)
-                            return
+            student_name = self._classify_message(msg, content, deadline=deadline)
+            # 老师在群里发布的消息开启新的通知
+            if student_name is NOTICE:
+                notice_id = self._open_notice(msg.other_user_id, content, msg.actual_user_nickname,
+                                              timeout=self._remaining(deadline))
+                logger.info(f"[donotlazy] 检测到老师 {msg.actual_user_nickname} 发布通知，通知编号: {notice_id}")
+            elif student_name:
+                self._record_read_status(msg, student_name, deadline)
         except Exception as e:
             logger.error(f"[donotlazy] 处理已读消息异常: {e}")
             logger.exception(e)
     
-    def _record_message(self, msg):
-        """记录群消息"""
+    def _classify_message(self, msg, content, batch=False, deadline=None):
+        """判断文本消息的类型
+        
+        返回NOTICE表示老师发布的通知，返回学生姓名表示该学生已读，其他消息返回None。
+        batch为True时用于批量补录：不写入用户映射，识别过程只记录DEBUG日志。
+        deadline为写入用户映射的截止时间，见_resolve_sender。
+        """
+        # 整条消息使用同一份配置快照中的已读关键词
+        read_keyword = self.settings.read_keyword
+        log = logger.debug if batch else logger.info
+        
+        if self._is_notice_message(msg, content):
+            return NOTICE
+        
+        # 直接发送"已读"的情况
+        if content == read_keyword:
+            student_name = self._resolve_sender(msg, batch, deadline)
+            log(f"[donotlazy] 检测到纯已读消息，发送者: {student_name}")
+            # 不再检查学生是否在名单中，直接记录
+            return student_name
+        
+        # "XXX已读"的情况
+        if read_keyword not in content:
+            return None
+        log(f"[donotlazy] 检测到可能包含已读的消息: {content}")
+        
+        # 先通过索引解析关键词前的称呼，如"张三妈妈已读"
+        prefix = content[:content.find(read_keyword)]
+        name = resolve_name(prefix, self.students, self.name_index)
+        if name:
+            log(f"[donotlazy] 从消息中解析到学生: {name}")
+            return name
+        
+        # 再尝试精确匹配 "某某已读"
+        for name in self.students.keys():
+            pattern = f"{name}{read_keyword}"
+            if pattern in content:
+                log(f"[donotlazy] 从消息中精确匹配到学生: {name}")
+                return name
+        
+        # 尝试匹配发送者，如果发送包含已读关键词的消息
+        student_name = self._resolve_sender(msg, batch, deadline)
+        log(f"[donotlazy] 发送者消息包含已读关键词: {student_name}")
+        return student_name
+    
+    def _record_message(self, group_id, content, group_name, deadline):
+        """记录群消息，返回是否写入成功
+        
+        消息记录只用于留档，到deadline时数据库仍被占用就跳过这条，不重试，把时间留给已读写入。
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                now = datetime.now()
-                time_str = now.strftime('%Y-%m-%d %H:%M:%S')
-                date_str = now.strftime('%Y-%m-%d')
-                
-                # 检查message_records表是否有other_user_nickname列
-                cursor.execute("PRAGMA table_info(message_records)")
-                columns = [info[1] for info in cursor.fetchall()]
-                
-                # 如果没有other_user_nickname列，则添加
-                if "other_user_nickname" not in columns:
-                    cursor.execute('''
-                        ALTER TABLE message_records 
-                        ADD COLUMN other_user_nickname TEXT
-                    ''')
-                    logger.info("[donotlazy] 已为message_records表添加other_user_nickname列")
-                
-                # 插入记录，包含群名称
-                cursor.execute('''
-                    INSERT INTO message_records 
-                    (group_id, message_content, create_time, create_date, other_user_nickname)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    msg.other_user_id,
-                    msg.content,
-                    time_str,
-                    date_str,
-                    msg.other_user_nickname
-                ))
-                conn.commit()
+            self._write_message(group_id, content, group_name, timeout=self._remaining(deadline))
+            return True
         except Exception as e:
-            logger.error(f"[donotlazy] 记录群消息异常：{e}")
+            if is_busy_error(e):
+                logger.warning(f"[donotlazy] 数据库忙，跳过记录群消息：{e}")
+            else:
+                logger.error(f"[donotlazy] 记录群消息异常：{e}")
+            return False
+    
+    @staticmethod
+    def _remaining(deadline):
+        """距截止时间的秒数，用作等待数据库锁的超时；已过截止时间时为0，数据库被占用时立即失败"""
+        return max(deadline - time.monotonic(), 0)
+    
+    def _write_message(self, group_id, content, group_name, timeout=None):
+        """在单独的事务中写入一条群消息记录"""
+        with self._connect_group(group_id, timeout=timeout) as conn:
+            cursor = conn.cursor()
+            now = datetime.now()
+            time_str = now.strftime('%Y-%m-%d %H:%M:%S')
+            date_str = now.strftime('%Y-%m-%d')
+            
+            # 插入记录，包含群名称
+            self._insert_message(cursor, group_id, content, time_str, date_str, group_name)
+            conn.commit()
+    
+    def _message_values(self, cursor, content):
+        """按message_storage准备消息内容，返回 (message_content, content_hash, content_size)
+        
+        - full：内容保存在message_records中
+        - metadata：只保存内容哈希和长度
+        - dedup：内容保存在message_contents中，相同内容只保存一份
+        超过message_compress_threshold字节的内容压缩后保存。
+        """
+        settings = self.settings
+        content = content or ""
+        digest = content_hash(content)
+        size = len(content.encode("utf-8"))
+        if settings.message_storage == "metadata":
+            return None, digest, size
+        stored = encode_content(content, settings.message_compress_threshold)
+        if settings.message_storage == "dedup":
+            cursor.execute("INSERT OR IGNORE INTO message_contents (hash, content) VALUES (?, ?)", (digest, stored))
+            return None, digest, size
+        return stored, digest, size
+    
+    def _insert_message(self, cursor, group_id, content, time_str, date_str, group_name):
+        """在当前事务中写入一条群消息记录"""
+        message_content, digest, size = self._message_values(cursor, content)
+        cursor.execute('''
+            INSERT INTO message_records
+            (group_id, message_content, create_time, create_date, other_user_nickname, content_hash, content_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (group_id, message_content, time_str, date_str, group_name, digest, size))
     
-    def _record_read_status(self, msg, student_name):
-        """记录学生已读状态"""
+    def _record_read_status(self, msg, student_name, deadline=None):
+        """记录学生已读状态，deadline前无法写入数据库时写入溢出日志，由后台线程稍后重放
+        
+        deadline为time.monotonic()的截止时间，收到消息时确定；不指定时为spill_deadline秒后。
+        只有数据库忙（包括等到截止时间仍未拿到锁）时写入溢出日志，其他错误记录异常，重放也无法解决。
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.settings.spill_deadline
+        read_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # 已读属于收到消息时群内开启中的通知，写入溢出日志后重放时也记录到该通知
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                now = datetime.now()
-                time_str = now.strftime('%Y-%m-%d %H:%M:%S')
-                date_str = now.strftime('%Y-%m-%d')
-                
-                group_id = msg.other_user_id
-                
-                # 检查该学生今日是否已记录
+            notice_id = self._find_open_notice(msg.other_user_id, timeout=self._remaining(deadline))
+        except Exception as e:
+            notice_id = None
+            if is_busy_error(e):
+                logger.warning(f"[donotlazy] 数据库忙，本条已读不记录到通知：{e}")
+            else:
+                logger.error(f"[donotlazy] 查询群内开启中的通知异常，本条已读不记录到通知：{e}")
+                logger.exception(e)
+        event = ReadEvent(
+            group_id=msg.other_user_id,
+            student_name=student_name,
+            nickname=getattr(msg, "actual_user_nickname", None) or student_name,
+            read_time=read_time,
+            notice_id=notice_id,
+        )
+        try:
+            self._write_read_status(event, timeout=self._remaining(deadline))
+        except Exception as e:
+            if not is_busy_error(e):
+                logger.error(f"[donotlazy] 写入 {student_name} 的已读记录异常：{e}")
+                logger.exception(e)
+                return
+            logger.warning(f"[donotlazy] 数据库忙，写入已读记录失败：{e}，已写入溢出日志稍后重试")
+            try:
+                self.spill_journal.append(event)
+            except Exception as e:
+                logger.error(f"[donotlazy] 写入溢出日志异常，{student_name} 的已读记录丢失：{e}")
+    
+    def _replay_spilled_reads(self):
+        """定期把溢出日志中的已读写入数据库，数据库仍不可用时保留日志等待下次重放"""
+        while True:
+            time.sleep(SPILL_REPLAY_INTERVAL)
+            try:
+                if not self.spill_journal.has_pending():
+                    continue
+                quarantined = self.spill_journal.quarantined
+                applied = self.spill_journal.replay(
+                    lambda event: retry_on_busy(self._write_read_status, event, replay=True))
+                logger.info(f"[donotlazy] 已从溢出日志重放 {applied} 条已读记录")
+                if self.spill_journal.quarantined > quarantined:
+                    logger.error(f"[donotlazy] {self.spill_journal.quarantined - quarantined} 条已读无法写入数据库，"
+                                 f"已移到 {self.spill_journal.quarantine_path}，需要人工处理")
+            except Exception as e:
+                logger.warning(f"[donotlazy] 重放溢出日志未完成，稍后重试：{e}")
+    
+    def _write_read_status(self, event, timeout=None, replay=False):
+        """在群所在分片的单独事务中写入已读记录、通知已读、阅读耗时和学生统计事件
+        
+        启用分片时事务只写入该分片，学生统计由后台线程应用到主数据库，见_queue_stats_events。
+        replay为True时表示重放溢出日志：同一条已读可能已经写入过，只在时间更晚时更新已读时间；
+        学生统计按群和日期去重，重复应用不会改变结果。
+        """
+        path = self._shard_path(event.group_id)
+        with self._connect_shard(path, timeout=timeout) as conn:
+            cursor = conn.cursor()
+            time_str = event.read_time
+            date_str = time_str[:10]
+            
+            group_id = event.group_id
+            student_name = event.student_name
+            student_id = self.students.get(student_name)
+            nickname = event.nickname
+            
+            # 检查该学生今日是否已记录，名单内的学生按学号查找
+            if student_id:
                 cursor.execute('''
-                    SELECT id FROM read_records 
+                    SELECT id, read_time FROM read_records 
+                    WHERE group_id = ? AND create_date = ?
+                    AND (student_id = ? OR (student_id IS NULL AND student_name = ?))
+                ''', (group_id, date_str, student_id, student_name))
+            else:
+                cursor.execute('''
+                    SELECT id, read_time FROM read_records 
                     WHERE group_id = ? AND student_name = ? AND create_date = ?
                 ''', (group_id, student_name, date_str))
-                record = cursor.fetchone()
+            record = cursor.fetchone()
+            
+            # 重放时已有更晚的记录则保持不变
+            if record and replay and record[1] >= time_str:
+                logger.info(f"[donotlazy] 学生 {student_name} 已有更晚的已读记录，跳过重放")
+            elif record:
+                logger.info(f"[donotlazy] 学生 {student_name} 今日已有记录，更新时间")
+                cursor.execute('''
+                    UPDATE read_records 
+                    SET read_time = ?, student_name = ?, student_id = ?, nickname = ?
+                    WHERE id = ?
+                ''', (time_str, student_name, student_id, nickname, record[0]))
+            else:
+                logger.info(f"[donotlazy] 新增学生 {student_name} 的已读记录")
+                cursor.execute('''
+                    INSERT INTO read_records (group_id, student_name, student_id, nickname, read_time, create_date)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (group_id, student_name, student_id, nickname, time_str, date_str))
+            
+            # 名单内学生更新连续天数和月度统计，重放较早日期时按补录的方式计入
+            if student_id:
+                self._queue_stats_events(cursor, path, [("read", student_name, student_id, group_id, date_str)])
+            
+            # 群内有开启中的通知时，同时记录到该通知，只保留首次已读时间
+            notice_id = event.notice_id
+            if notice_id:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO notice_reads
+                    (notice_id, student_name, student_id, group_id, nickname, read_time)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (notice_id, student_name, student_id, group_id, nickname, time_str))
                 
-                if record:
-                    logger.info(f"[donotlazy] 学生 {student_name} 今日已有记录，更新时间")
-                    cursor.execute('''
-                        UPDATE read_records 
-                        SET read_time = ? 
-                        WHERE group_id = ? AND student_name = ? AND create_date = ?
-                    ''', (time_str, group_id, student_name, date_str))
+                # 首次已读时把耗时计入阅读速度草图，通知在主数据库中，启用分片时通过附加的主数据库读取
+                if cursor.rowcount == 1:
+                    cursor.execute("SELECT create_time FROM notices WHERE id = ?", (notice_id,))
+                    notice = cursor.fetchone()
+                    if notice:
+                        self._update_latency_sketches(cursor, group_id, [(notice[0], time_str)])
+            
+            conn.commit()
+            self.stats_pending.set()
+            self._invalidate_reports()
+            logger.info(f"[donotlazy] 成功记录 {student_name} 的已读状态, 群组ID: {group_id}, 日期: {date_str}")
+    
+    def _is_leader(self):
+        """当前进程是否为主进程；非主进程每LEADER_CHECK_INTERVAL秒尝试接替一次"""
+        if self.leader_lock.is_leader:
+            return True
+        now = time.time()
+        if now - self.last_leader_check < LEADER_CHECK_INTERVAL:
+            return False
+        self.last_leader_check = now
+        if self.leader_lock.acquire():
+            logger.info(f"[donotlazy] 当前进程 {os.getpid()} 成为主进程，负责清理、维护和定时备份")
+            return True
+        return False
+    
+    def _schedule_retention(self):
+        """每RETENTION_INTERVAL秒清理一次过期记录，只由主进程执行
+        
+        数据库被其他进程占用时不重试，直接等下一轮，清理晚一分钟不影响结果。
+        """
+        while True:
+            try:
+                if self._is_leader():
+                    self._delete_expired_records()
+            except Exception as e:
+                if is_busy_error(e):
+                    logger.warning(f"[donotlazy] 数据库忙，本轮跳过过期记录清理：{e}")
                 else:
-                    logger.info(f"[donotlazy] 新增学生 {student_name} 的已读记录")
-                    cursor.execute('''
-                        INSERT INTO read_records (group_id, student_name, read_time, create_date)
-                        VALUES (?, ?, ?, ?)
-                    ''', (group_id, student_name, time_str, date_str))
-                
-                conn.commit()
-                logger.info(f"[donotlazy] 成功记录 {student_name} 的已读状态, 群组ID: {group_id}, 日期: {date_str}")
-        except Exception as e:
-            logger.error(f"[donotlazy] 记录已读状态异常：{e}")
+                    logger.error(f"[donotlazy] 清理过期记录异常：{e}")
+                    logger.exception(e)
+            time.sleep(RETENTION_INTERVAL)
     
-    def _clean_expired_records(self):
-        """清理过期记录"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
+    def _delete_expired_records(self):
+        """删除过期记录，每个分片和主数据库各在单独的事务中清理，分片的事务不写入主数据库"""
+        expire_date = (datetime.now() - timedelta(days=self.settings.max_record_days)).strftime('%Y-%m-%d')
+        check_quota = self._message_quota_due()
+        for path in self.shard_files:
+            with self._connect_shard(path) as conn:
                 cursor = conn.cursor()
-                expire_date = (datetime.now() - timedelta(days=self.max_record_days)).strftime('%Y-%m-%d')
-                
-                # 清理已读记录
-                cursor.execute('''
-                    DELETE FROM read_records
-                    WHERE create_date < ?
-                ''', (expire_date,))
-                
-                # 清理消息记录
+                # 清理已读记录、查看水位线和消息记录，并按群消息配额删除各群最早的记录
+                removed_messages = delete_expired_records(cursor, expire_date)
+                if check_quota:
+                    removed_messages += self._enforce_message_quota(cursor)
+                # 清理不再被引用的消息内容
+                if removed_messages > 0:
+                    delete_unreferenced_contents(cursor)
+                # 清理已结束的过期通知的已读记录，通知在各分片清理后从主数据库中删除
                 cursor.execute('''
-                    DELETE FROM message_records
-                    WHERE create_date < ?
+                    DELETE FROM notice_reads
+                    WHERE notice_id IN (
+                        SELECT id FROM notices
+                        WHERE create_date < ? AND status = 'closed'
+                    )
                 ''', (expire_date,))
-                
                 conn.commit()
-        except Exception as e:
-            logger.error(f"[donotlazy] 清理过期记录异常：{e}")
+        
+        with self._connect() as conn:
+            cursor = conn.cursor()
+            # 清理已结束的过期通知
+            cursor.execute('''
+                DELETE FROM notices
+                WHERE create_date < ? AND status = 'closed'
+            ''', (expire_date,))
+            # 过期的已读记录已经删除，对应的学生已读群组不会再被重置
+            cursor.execute("DELETE FROM student_read_groups WHERE create_date < ?", (expire_date,))
+            
+            conn.commit()
+    
+    def _message_quota_due(self):
+        """是否需要按群消息配额清理：配额检查需要扫描整张消息表，每MESSAGE_QUOTA_INTERVAL秒最多执行一次"""
+        settings = self.settings
+        if not settings.message_quota_rows and not settings.message_quota_bytes:
+            return False
+        now = time.time()
+        if now - self.last_quota_check < MESSAGE_QUOTA_INTERVAL:
+            return False
+        self.last_quota_check = now
+        return True
+    
+    def _enforce_message_quota(self, cursor):
+        """按message_quota_rows/message_quota_bytes保留各群最近的消息记录，返回删除的行数
+        
+        字节数按原始内容的UTF-8长度计算，与存储模式和压缩无关。
+        """
+        settings = self.settings
+        removed = 0
+        if settings.message_quota_rows:
+            cursor.execute('''
+                DELETE FROM message_records
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (PARTITION BY group_id ORDER BY id DESC) AS position
+                        FROM message_records
+                    )
+                    WHERE position > ?
+                )
+            ''', (settings.message_quota_rows,))
+            removed += cursor.rowcount
+        if settings.message_quota_bytes:
+            cursor.execute('''
+                DELETE FROM message_records
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, SUM(COALESCE(content_size, LENGTH(CAST(message_content AS BLOB)), 0))
+                            OVER (PARTITION BY group_id ORDER BY id DESC) AS total_size
+                        FROM message_records
+                    )
+                    WHERE total_size > ?
+                )
+            ''', (settings.message_quota_bytes,))
+            removed += cursor.rowcount
+        if removed:
+            logger.info(f"[donotlazy] 按群消息配额删除了 {removed} 条消息记录")
+        return removed
+    
+    def run_maintenance(self, force=False):
+        """执行一次存储维护：必要时转换为增量清理模式，回收有限数量的空闲页，并定期更新统计信息
+        
+        启用分片时主数据库和每个分片依次维护，回收页数和剩余空闲页为各文件之和。
+        返回本次维护的结果，同时保存在last_maintenance中。
+        """
+        settings = self.settings
+        started = time.perf_counter()
+        result = {"time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "converted": False, "pages": 0, "optimized": False,
+                  "free_pages": 0}
+        run_optimize = force or time.time() - self.last_optimize >= OPTIMIZE_INTERVAL
+        for path in self._database_files():
+            with self._open_connection(path) as conn:
+                result["converted"] = enable_incremental_vacuum(conn) or result["converted"]
+                result["pages"] += incremental_vacuum(conn, settings.maintenance_vacuum_pages)
+                if run_optimize:
+                    optimize(conn)
+                result["free_pages"] += freelist_count(conn)
+        if run_optimize:
+            self.last_optimize = time.time()
+            result["optimized"] = True
+        result["duration"] = time.perf_counter() - started
+        self.last_maintenance = result
+        logger.info(f"[donotlazy] 存储维护完成：{result}")
+        return result
+    
+    def _schedule_maintenance(self):
+        """在maintenance_hours配置的空闲时段定期执行存储维护，只由主进程执行"""
+        while True:
+            time.sleep(MAINTENANCE_INTERVAL)
+            try:
+                if datetime.now().hour in self.settings.maintenance_hours and self._is_leader():
+                    self.run_maintenance()
+            except Exception as e:
+                logger.error(f"[donotlazy] 存储维护异常：{e}")
+                logger.exception(e)
     
     def get_help_text(self, **kwargs):
         help_text = "【不要偷懒】插件使用说明：\n"
@@ -1008,6 +2556,22 @@ class DoNotLazy(Plugin):
         help_text += "11. 发送「删除白名单 群组名称」删除白名单群组\n"
         help_text += "12. 发送「清空白名单」清空所有白名单群组\n"
         help_text += "13. 发送「白名单帮助」获取白名单帮助\n"
+        help_text += "14. 私聊发送「绑定别名 别名 学生姓名」绑定家长昵称等别名\n"
+        help_text += "15. 私聊发送「删除别名 别名」删除别名，发送「查看别名」查看别名表\n"
+        help_text += "16. 群内发送「发布通知 内容」开启通知跟踪，之后的已读记到该通知，发送「结束通知」关闭\n"
+        help_text += "17. 发送「查看通知」查看最近的通知，发送「查询未读 通知3」「查询已读 通知3」按通知查询\n"
+        help_text += "18. 发送「阅读速度统计」查看各群每周从发布通知到回复已读的中位数和P90耗时\n"
+        help_text += "19. 发送「查询同学 姓名」查看该同学在各群、各日期的已读记录\n"
+        help_text += "20. 发送「阅读排行」查看本月各同学的已读天数、已读率和连续已读天数\n"
+        help_text += "21. 发送「本周统计」查看本周每日已读率和同学已读率分布\n"
+        help_text += "22. 发送「新增已读」只查看自己上次查看之后新增的已读同学\n"
+        help_text += "23. 私聊发送「导入学生名单 文件名」从插件目录下的CSV或XLSX文件导入学生名单\n"
+        help_text += "24. 发送「导出已读记录 2025-04」导出指定月份或日期范围的已读记录（群聊中只导出本群）\n"
+        help_text += "25. 发送「导出群消息 2025-04」导出指定月份或日期范围的群消息内容（群聊中只导出本群）\n"
+        help_text += "26. 私聊发送「补录聊天记录 文件名」从导出的群聊记录补录已读情况\n"
+        help_text += "27. 私聊发送「备份数据库」立即备份数据库，发送「插件状态」查看最近一次备份等运行状态\n"
+        help_text += "28. 私聊发送「慢语句统计」查看执行最慢的SQL语句及查询计划（需配置slow_query_ms），发送「慢语句统计 清空」重新统计\n"
+        help_text += "29. 私聊发送「开启性能分析 查询未读同学 3」对该命令接下来3次执行做性能分析，发送「关闭性能分析」取消\n"
         return help_text
     
     def _load_config_template(self):
@@ -1043,6 +2607,13 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
+    def _reload_roster(self):
+        """重新加载学生名单并整体替换名单快照，然后重建昵称索引、回填学号"""
+        self.students = self.students.replace(self.load_students())
+        logger.info(f"[donotlazy] 学生名单已更新为版本 {self.students.version}，共 {len(self.students)} 名学生")
+        self._rebuild_name_index()
+        self._backfill_student_ids()
+    
     def _handle_reload_students(self, e_context, msg):
         """重新加载学生名单"""
         reply = Reply()
@@ -1051,7 +2622,7 @@ class DoNotLazy(Plugin):
         try:
             # 如果是群消息，检查是否在白名单中
             if e_context["context"]["isgroup"]:
-                if self.white_group_list and msg.other_user_id not in self.white_group_list:
+                if not self._is_group_allowed(msg.other_user_id):
                     reply.content = "当前群组不在白名单中，无法执行此操作。"
                     e_context["reply"] = reply
                     e_context.action = EventAction.BREAK_PASS
@@ -1062,7 +2633,7 @@ class DoNotLazy(Plugin):
             old_students = list(self.students.keys())[:5]
             
             # 重新加载学生名单
-            self.students = self.load_students()
+            self._reload_roster()
             
             # 计算新增学生
             new_count = len(self.students)
@@ -1084,118 +2655,914 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
-    def _get_group_name(self, group_id):
-        """根据群ID获取群名称"""
-        try:
-            # 尝试从数据库获取群名称
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                # 首先尝试从other_user_nickname字段中获取群名称
-                cursor.execute('''
-                    SELECT other_user_nickname 
-                    FROM message_records 
-                    WHERE group_id = ? AND other_user_nickname IS NOT NULL
-                    ORDER BY create_time DESC
-                    LIMIT 1
-                ''', (group_id,))
-                
-                result = cursor.fetchone()
-                if result and result[0]:
-                    return result[0]
-                
-                # 如果没有找到，尝试旧方法
-                cursor.execute('''
-                    SELECT DISTINCT other_user_nickname 
-                    FROM message_records 
-                    WHERE group_id = ? 
-                    LIMIT 1
-                ''', (group_id,))
-                
-                result = cursor.fetchone()
-                if result and result[0]:
-                    return result[0]
-            
-            # 如果找不到群名称，则返回群ID的前10个字符 + "..."
-            if len(group_id) > 10:
-                return group_id[:10] + "..."
-            return group_id
-        except Exception as e:
-            logger.error(f"[donotlazy] 获取群名称异常：{e}")
-            return group_id
-    
-    def _handle_show_whitelist(self, e_context, msg):
-        """显示白名单"""
+    def _handle_import_students(self, e_context, msg, file_name):
+        """从CSV或XLSX文件导入学生名单，导入在后台进行，完成后发送结果"""
         reply = Reply()
         reply.type = ReplyType.TEXT
         
         try:
-            if not self.white_group_list:
-                reply.content = "当前没有设置白名单，插件会响应所有群组消息。"
+            if e_context["context"]["isgroup"]:
+                reply.content = "只能在私聊中导入学生名单。"
+            elif not file_name:
+                reply.content = "请指定名单文件，文件需放在插件目录下。格式：导入学生名单 students.csv"
+            elif self.import_progress is not None:
+                reply.content = f"名单正在导入中，已处理 {self.import_progress} 行，完成后会自动发送结果。"
             else:
-                result = f"当前白名单群组({len(self.white_group_list)}个)：\n\n"
-                # 读取数据库获取群组名称
-                group_names = {}
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    for group_id in self.white_group_list:
-                        cursor.execute('''
-                            SELECT other_user_nickname 
-                            FROM message_records 
-                            WHERE group_id = ? AND other_user_nickname IS NOT NULL
-                            ORDER BY create_time DESC
-                            LIMIT 1
-                        ''', (group_id,))
-                        
-                        record = cursor.fetchone()
-                        if record and record[0]:
-                            group_names[group_id] = record[0]
-                        else:
-                            group_names[group_id] = "未知群名"
-                
-                # 显示群组列表
-                for i, group_id in enumerate(self.white_group_list):
-                    group_name = group_names.get(group_id, "未知群名")
-                    result += f"{i+1}. {group_id} ({group_name})\n"
-                
-                result += "\n说明：插件只会响应白名单中的群组消息。如需修改，请编辑配置文件。"
-                reply.content = result.strip()
+                path = self._plugin_file_path(file_name)
+                if not path:
+                    reply.content = "名单文件必须放在插件目录下。"
+                elif not os.path.isfile(path):
+                    reply.content = f"找不到名单文件：{file_name}"
+                else:
+                    self.import_progress = 0
+                    channel = e_context.econtext.get("channel")
+                    context = e_context["context"]
+                    threading.Thread(target=self._import_students, args=(path, channel, context),
+                                     name="donotlazy-import", daemon=True).start()
+                    reply.content = f"开始导入名单文件 {file_name}，完成后会自动发送结果，期间发送相同命令可查看进度。"
         except Exception as e:
-            logger.error(f"[donotlazy] 显示白名单异常：{e}")
+            logger.error(f"[donotlazy] 导入学生名单异常：{e}")
             logger.exception(e)
-            reply.content = f"获取白名单失败：{str(e)}"
+            reply.content = f"导入学生名单失败：{str(e)}"
         
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
-    def _handle_add_whitelist(self, e_context, msg, group_id_or_name):
-        """添加白名单群组"""
-        reply = Reply()
-        reply.type = ReplyType.TEXT
+    def _plugin_file_path(self, file_name):
+        """返回插件目录下文件的绝对路径，路径指向插件目录之外时返回None"""
+        curdir = os.path.realpath(self.curdir)
+        path = os.path.realpath(os.path.join(curdir, file_name))
+        return path if path.startswith(curdir + os.sep) else None
+    
+    def _import_students(self, path, channel, context):
+        """后台导入名单：逐行校验，无冲突时一次性写入名单文件和名单缓存并替换当前名单"""
+        def report_progress(rows):
+            self.import_progress = rows
+            logger.info(f"[donotlazy] 名单导入中，已处理 {rows} 行")
         
-        # 只允许在私聊中管理白名单
-        if e_context["context"]["isgroup"]:
-            reply.content = "只能在私聊中管理白名单。"
-            e_context["reply"] = reply
-            e_context.action = EventAction.BREAK_PASS
-            return
+        try:
+            started = time.time()
+            result = RosterImport(self.settings.class_name, report_progress).run(iter_rows(path))
+            
+            summary = f"共读取 {result.rows} 行，有效学生 {len(result.students)} 名"
+            if result.duplicates:
+                summary += f"，重复行 {result.duplicates} 行"
+            if result.skipped:
+                summary += f"，缺少姓名或学号 {result.skipped} 行"
+            if result.other_class:
+                summary += f"，其他班级 {result.other_class} 行"
+            
+            if result.conflicts:
+                content = f"名单导入失败，发现 {len(result.conflicts)} 处冲突，当前名单未修改：\n"
+                content += "\n".join(result.conflicts[:10])
+                if len(result.conflicts) > 10:
+                    content += f"\n...等共 {len(result.conflicts)} 处"
+                content += f"\n\n{summary}"
+            elif not result.students:
+                content = f"名单文件中没有可导入的学生，当前名单未修改。\n{summary}"
+            else:
+                old_count = len(self.students)
+                self._write_student_file(result.students, result.classes)
+                self._reload_roster()
+                content = f"名单导入成功，{summary}。\n学生人数：{old_count} -> {len(self.students)}"
+                logger.info(f"[donotlazy] 名单导入完成，耗时 {time.time() - started:.2f} 秒，{summary}")
+        except RosterImportError as e:
+            content = f"名单导入失败：{e}"
+        except Exception as e:
+            logger.error(f"[donotlazy] 导入学生名单异常：{e}")
+            logger.exception(e)
+            content = f"名单导入失败：{str(e)}"
+        finally:
+            self.import_progress = None
         
+        self._send_to_channel(channel, context, content)
+    
+    def _write_student_file(self, students, classes):
+        """将名单按students.json格式写入配置的名单文件（原子替换），同时写入名单缓存"""
+        student_file = os.path.join(self.curdir, self.settings.student_file)
+        tmp_path = None
         try:
-            if not group_id_or_name:
-                reply.content = "请指定要添加的群组ID或群名称。格式：添加白名单 群组名称"
-                e_context["reply"] = reply
-                e_context.action = EventAction.BREAK_PASS
-                return
-                
-            # 判断是否为纯数字ID
-            if group_id_or_name.isdigit():
-                # 按ID处理
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(student_file), prefix=".students.", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write('{\n  "students": [\n')
+                for i, (name, student_id) in enumerate(students.items()):
+                    entry = {"name": name, "id": student_id}
+                    if name in classes:
+                        entry["class"] = classes[name]
+                    f.write(f"    {json.dumps(entry, ensure_ascii=False)}{',' if i < len(students) - 1 else ''}\n")
+                f.write("  ]\n}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, student_file)
+            tmp_path = None
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        
+        stat = os.stat(student_file)
+        self._write_roster_cache((os.path.abspath(student_file), stat.st_mtime_ns, stat.st_size), students)
+    
+    def export_read_records(self, path, start_date, end_date, group_ids=None, fmt="csv", batch_size=1000):
+        """将日期范围内的已读记录流式导出为CSV或JSONL文件，返回导出的行数
+        
+        group_ids为空时导出所有群组。记录按批从数据库读取并直接写入文件，内存占用与记录数无关；
+        启用分片时各分片的记录按日期归并。先写入同目录下的临时文件，完成后再替换，导出出错不会留下不完整的文件。
+        """
+        roster = self.students
+        return self._export_rows(path, group_ids, fmt, lambda conn: iter_read_records(
+            conn, start_date, end_date, group_ids, roster, batch_size))
+    
+    def export_messages(self, path, start_date, end_date, group_ids=None, fmt="csv", batch_size=1000):
+        """将日期范围内的群消息流式导出为CSV或JSONL文件，返回导出的行数
+        
+        去重保存和压缩保存的内容还原为原文，message_storage为metadata时只有内容哈希和长度。
+        """
+        return self._export_rows(path, group_ids, fmt, lambda conn: iter_messages(
+            conn, start_date, end_date, group_ids, batch_size), MESSAGE_COLUMNS)
+    
+    def _export_rows(self, path, group_ids, fmt, iterate, columns=EXPORT_COLUMNS):
+        """把各分片中iterate(conn)产生的行按日期归并后写入导出文件，返回导出的行数
+        
+        先写入同目录下的临时文件，完成后再替换，导出出错不会留下不完整的文件。
+        """
+        writer = EXPORT_WRITERS.get(fmt)
+        if writer is None:
+            raise ValueError(f"不支持的导出格式：{fmt}")
+        
+        if group_ids:
+            shards = list(dict.fromkeys(self._shard_path(group_id) for group_id in group_ids))
+        else:
+            shards = self.shard_files
+        tmp_path = None
+        connections = []
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".export.", suffix=".tmp")
+            # CSV带BOM，便于用Excel直接打开
+            with os.fdopen(fd, "w", encoding="utf-8-sig" if fmt == "csv" else "utf-8", newline="") as f:
+                connections = [self._connect_shard(shard, readonly=True) for shard in shards]
+                rows = heapq.merge(*(iterate(conn) for conn in connections), key=lambda row: row[0])
+                count = writer(rows, f, columns)
+            os.replace(tmp_path, path)
+            tmp_path = None
+            return count
+        finally:
+            for conn in connections:
+                conn.close()
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _parse_export_args(self, args):
+        """解析导出命令参数，返回 (开始日期, 结束日期, 格式)
+        
+        支持「2025-04」（整月）、「2025-04-01」（单日）和「2025-04-01 2025-04-30」，不指定日期时导出本月。
+        """
+        fmt = "csv"
+        dates = []
+        for arg in args.split():
+            if arg.lower() in EXPORT_WRITERS:
+                fmt = arg.lower()
+            else:
+                dates.append(arg)
+        
+        if not dates:
+            dates = [datetime.now().strftime('%Y-%m')]
+        if len(dates) > 2:
+            raise ValueError("最多指定开始和结束两个日期")
+        try:
+            if len(dates) == 1 and re.fullmatch(r"\d{4}-\d{2}", dates[0]):
+                month_start = datetime.strptime(dates[0], '%Y-%m')
+                next_month = (month_start + timedelta(days=32)).replace(day=1)
+                return month_start.strftime('%Y-%m-%d'), (next_month - timedelta(days=1)).strftime('%Y-%m-%d'), fmt
+            start_date = datetime.strptime(dates[0], '%Y-%m-%d').strftime('%Y-%m-%d')
+            end_date = datetime.strptime(dates[-1], '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"日期格式不正确：{' '.join(dates)}")
+        if start_date > end_date:
+            raise ValueError("开始日期不能晚于结束日期")
+        return start_date, end_date, fmt
+    
+    def _handle_export_records(self, e_context, msg, args):
+        """导出已读记录到插件目录下的exports文件夹，群聊中只导出本群，导出在后台进行"""
+        self._handle_export(e_context, msg, args, "已读记录", "read_records", self.export_read_records)
+    
+    def _handle_export_messages(self, e_context, msg, args):
+        """导出群消息到插件目录下的exports文件夹，用于审计，群聊中只导出本群，导出在后台进行"""
+        self._handle_export(e_context, msg, args, "群消息", "messages", self.export_messages)
+    
+    def _handle_export(self, e_context, msg, args, label, prefix, export):
+        """在后台执行导出命令，export为export_read_records或export_messages，label为回复中的数据名称"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            try:
+                start_date, end_date, fmt = self._parse_export_args(args)
+            except ValueError as e:
+                reply.content = f"参数有误：{e}\n格式：导出{label} 2025-04 或 导出{label} 2025-04-01 2025-04-30 jsonl"
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+            
+            group_ids = [msg.other_user_id] if e_context["context"]["isgroup"] else None
+            export_dir = os.path.join(self.curdir, "exports")
+            os.makedirs(export_dir, exist_ok=True)
+            suffix = f"_{msg.other_user_id}" if group_ids else ""
+            path = os.path.join(export_dir, f"{prefix}_{start_date}_{end_date}{suffix}.{fmt}")
+            
+            channel = e_context.econtext.get("channel")
+            context = e_context["context"]
+            
+            def export_and_send():
+                try:
+                    started = time.time()
+                    count = export(path, start_date, end_date, group_ids, fmt)
+                    logger.info(f"[donotlazy] 已导出 {count} 条{label}到 {path}，耗时 {time.time() - started:.2f} 秒")
+                    content = f"已导出 {start_date} ~ {end_date} 的 {count} 条{label}：\n{path}"
+                except Exception as e:
+                    logger.error(f"[donotlazy] 导出{label}异常：{e}")
+                    logger.exception(e)
+                    content = f"导出{label}失败：{str(e)}"
+                self._send_to_channel(channel, context, content)
+            
+            threading.Thread(target=export_and_send, name="donotlazy-export", daemon=True).start()
+            reply.content = f"正在导出 {start_date} ~ {end_date} 的{label}，完成后会自动发送文件位置。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 导出{label}异常：{e}")
+            logger.exception(e)
+            reply.content = f"导出{label}失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def backfill_chat_log(self, path, batch_size=5000, progress=None):
+        """从导出的群聊记录补录群消息和已读记录，返回补录统计
+        
+        每条记录按与实时消息相同的逻辑识别已读，群消息和已读记录按批用executemany写入，每批一个事务。
+        已读记录按(群组, 学生, 日期)合并，已存在的记录只在补录的时间更晚时更新；重复补录同一文件不会产生重复数据。
+        超出保留天数、不在白名单中的群组的记录会被跳过；老师通知只补录为群消息，不会开启通知。
+        """
+        reader = ChatLogReader(path)
+        result = {"messages": 0, "reads": 0, "updated": 0, "skipped": 0}
+        cutoff = (datetime.now() - timedelta(days=self.settings.max_record_days)).strftime('%Y-%m-%d')
+        roster = self.students
+        messages = []
+        reads = {}
+        
+        # 各分片的连接在补录期间保持打开，每批按分片分别写入
+        connections = {}
+        try:
+            for entry in reader:
+                date_str = entry.time[:10]
+                if date_str < cutoff or not self._is_group_allowed(entry.group_id):
+                    result["skipped"] += 1
+                    continue
+                
+                msg = SimpleNamespace(
+                    other_user_id=entry.group_id,
+                    other_user_nickname=entry.group_name,
+                    actual_user_id=entry.sender_id,
+                    actual_user_nickname=entry.sender,
+                    content=entry.content,
+                    msg_type=entry.msg_type,
+                    is_group=True,
+                )
+                if entry.msg_type == 1:
+                    content = entry.content
+                    student_name = self._classify_message(msg, content, batch=True)
+                    if student_name is NOTICE:
+                        student_name = None
+                else:
+                    # 非文本消息与实时处理一致，视为发送者已读
+                    content = NON_TEXT_LABELS.get(entry.msg_type, f"[未知类型消息: {entry.msg_type}]")
+                    student_name = self._resolve_sender(msg, batch=True)
+                
+                messages.append((entry.group_id, content, entry.time, date_str, entry.group_name))
+                if student_name:
+                    # 同一天多次已读与实时处理一致，保留最后一次的时间
+                    reads[(entry.group_id, student_name, date_str)] = (entry.time, entry.sender)
+                
+                if len(messages) >= batch_size:
+                    self._flush_backfill(connections, messages, reads, roster, result)
+                    if progress:
+                        progress(reader.lines)
+            
+            self._flush_backfill(connections, messages, reads, roster, result)
+        finally:
+            for conn in connections.values():
+                conn.close()
+        
+        result["lines"] = reader.lines
+        result["invalid"] = reader.invalid
+        self._invalidate_reports()
+        return result
+    
+    def _flush_backfill(self, connections, messages, reads, roster, result):
+        """把缓冲的补录数据按分片拆分，每个分片一个事务写入，写入后清空缓冲区
+        
+        connections为分片文件到连接的缓存，首次写入某个分片时打开连接。
+        """
+        batches = {}
+        for message in messages:
+            batches.setdefault(self._shard_path(message[0]), ([], {}))[0].append(message)
+        for key, value in reads.items():
+            batches.setdefault(self._shard_path(key[0]), ([], {}))[1][key] = value
+        
+        for path, (shard_messages, shard_reads) in batches.items():
+            conn = connections.get(path)
+            if conn is None:
+                conn = connections[path] = self._connect_shard(path)
+            self._write_backfill_batch(conn.cursor(), path, shard_messages, shard_reads, roster, result)
+            conn.commit()
+        self.stats_pending.set()
+        messages.clear()
+        reads.clear()
+    
+    def _write_backfill_batch(self, cursor, path, messages, reads, roster, result):
+        """在path分片的当前事务中写入一批补录数据，写入后清空缓冲区
+        
+        名单内学生的已读按日期顺序提交学生统计事件，学生当天已计入统计的事件不会改变结果。
+        result中的reads和updated分别为实际新增的已读记录和更新了已读时间的记录数，重复补录时都为0。
+        """
+        if messages:
+            rows = []
+            for group_id, content, time_str, date_str, group_name in messages:
+                message_content, digest, size = self._message_values(cursor, content)
+                rows.append((group_id, message_content, time_str, date_str, group_name, digest, size,
+                             group_id, time_str, digest, content))
+            # 旧版本写入的记录没有内容哈希，按内容比较
+            cursor.executemany('''
+                INSERT INTO message_records
+                (group_id, message_content, create_time, create_date, other_user_nickname, content_hash, content_size)
+                SELECT ?, ?, ?, ?, ?, ?, ?
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM message_records
+                    WHERE group_id = ? AND create_time = ?
+                    AND (content_hash = ? OR (content_hash IS NULL AND message_content = ?))
+                )
+            ''', rows)
+            result["messages"] += cursor.rowcount
+        
+        rows = []
+        for (group_id, student_name, date_str), (time_str, nickname) in reads.items():
+            rows.append((group_id, student_name, roster.get(student_name), nickname, time_str, date_str))
+        if rows:
+            # 已存在的记录只在补录的时间更晚时更新，新增和更新分别计数
+            cursor.executemany('''
+                UPDATE read_records
+                SET read_time = ?, student_id = ?, nickname = ?
+                WHERE group_id = ? AND student_name = ? AND create_date = ? AND read_time < ?
+            ''', [(time_str, student_id, nickname, group_id, student_name, date_str, time_str)
+                  for group_id, student_name, student_id, nickname, time_str, date_str in rows])
+            result["updated"] += cursor.rowcount
+            cursor.executemany('''
+                INSERT OR IGNORE INTO read_records (group_id, student_name, student_id, nickname, read_time, create_date)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', rows)
+            result["reads"] += cursor.rowcount
+            self._queue_stats_events(cursor, path, sorted(
+                (("read", student_name, student_id, group_id, date_str)
+                 for group_id, student_name, student_id, _, _, date_str in rows if student_id),
+                key=lambda event: event[4]))
+        
+        messages.clear()
+        reads.clear()
+    
+    def _handle_backfill_chat_log(self, e_context, msg, file_name):
+        """从插件目录下的聊天记录文件补录已读记录，补录在后台进行，完成后发送结果"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            if e_context["context"]["isgroup"]:
+                reply.content = "只能在私聊中补录聊天记录。"
+            elif not file_name:
+                reply.content = "请指定聊天记录文件，文件需放在插件目录下。格式：补录聊天记录 chat.jsonl"
+            elif self.backfill_progress is not None:
+                reply.content = f"聊天记录正在补录中，已处理 {self.backfill_progress} 行，完成后会自动发送结果。"
+            else:
+                path = self._plugin_file_path(file_name)
+                if not path:
+                    reply.content = "聊天记录文件必须放在插件目录下。"
+                elif not os.path.isfile(path):
+                    reply.content = f"找不到聊天记录文件：{file_name}"
+                else:
+                    self.backfill_progress = 0
+                    channel = e_context.econtext.get("channel")
+                    context = e_context["context"]
+                    
+                    def backfill_and_send():
+                        # 每写入一批（默认5000条消息）记录一次进度，单条消息的识别过程只记录DEBUG日志
+                        def report_progress(lines):
+                            self.backfill_progress = lines
+                            logger.info(f"[donotlazy] 聊天记录补录中，已处理 {lines} 行")
+                        
+                        try:
+                            started = time.time()
+                            result = self.backfill_chat_log(path, progress=report_progress)
+                            content = (f"聊天记录补录完成，共 {result['lines']} 行，"
+                                       f"新增群消息 {result['messages']} 条，新增已读 {result['reads']} 条")
+                            if result["updated"]:
+                                content += f"，更新已读时间 {result['updated']} 条"
+                            if result["skipped"]:
+                                content += f"，超出保留天数或不在白名单中 {result['skipped']} 行"
+                            if result["invalid"]:
+                                content += f"，无法解析 {result['invalid']} 行"
+                            logger.info(f"[donotlazy] {content}，耗时 {time.time() - started:.2f} 秒")
+                        except Exception as e:
+                            logger.error(f"[donotlazy] 补录聊天记录异常：{e}")
+                            logger.exception(e)
+                            content = f"补录聊天记录失败：{str(e)}"
+                        finally:
+                            self.backfill_progress = None
+                        self._send_to_channel(channel, context, content)
+                    
+                    threading.Thread(target=backfill_and_send, name="donotlazy-backfill", daemon=True).start()
+                    reply.content = f"开始补录聊天记录 {file_name}，完成后会自动发送结果，期间发送相同命令可查看进度。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 补录聊天记录异常：{e}")
+            logger.exception(e)
+            reply.content = f"补录聊天记录失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _backup_dir(self):
+        """备份目录，相对路径相对于插件目录"""
+        return os.path.join(self.curdir, self.settings.backup_dir)
+    
+    def _backup_prefix(self, path):
+        """备份文件名前缀，分片的前缀带上分片文件名，各文件的快照分别轮换"""
+        if path == self.db_path:
+            return BACKUP_PREFIX
+        return f"{BACKUP_PREFIX}.shard{os.path.splitext(os.path.basename(path))[0]}"
+    
+    def backup_now(self):
+        """立即备份数据库，已有备份在进行时返回None
+        
+        启用分片时依次备份主数据库和每个分片，各文件分别是一致的快照；返回主数据库的备份结果，
+        大小、耗时和页数为所有文件之和。
+        """
+        if not self.backup_lock.acquire(blocking=False):
+            return None
+        try:
+            settings = self.settings
+            result = None
+            for path in self._database_files():
+                shard_result = backup_database(path, self._backup_dir(), self._backup_prefix(path), settings.backup_keep)
+                if result is None:
+                    result = shard_result
+                else:
+                    result = result._replace(size=result.size + shard_result.size, pages=result.pages + shard_result.pages,
+                                             duration=result.duration + shard_result.duration)
+            self.last_backup = result
+            self.last_backup_error = None
+            logger.info(f"[donotlazy] 数据库备份完成：{result.path}，{result.size / 1024:.1f}KB，耗时 {result.duration:.2f} 秒")
+            return result
+        except Exception as e:
+            self.last_backup_error = str(e)
+            raise
+        finally:
+            self.backup_lock.release()
+    
+    def _schedule_backups(self):
+        """按backup_interval_hours定时备份，只由主进程执行；以最近一份快照的修改时间判断是否到期，重启后不会立即重复备份"""
+        while True:
+            time.sleep(BACKUP_CHECK_INTERVAL)
+            try:
+                interval_hours = self.settings.backup_interval_hours
+                if not interval_hours or not self._is_leader():
+                    continue
+                snapshots = list_backups(self._backup_dir(), BACKUP_PREFIX)
+                if snapshots and time.time() - os.path.getmtime(snapshots[-1]) < interval_hours * 3600:
+                    continue
+                self.backup_now()
+            except Exception as e:
+                logger.error(f"[donotlazy] 定时备份数据库异常：{e}")
+                logger.exception(e)
+    
+    def _handle_backup_database(self, e_context, msg):
+        """立即备份数据库，备份在后台进行，完成后发送结果"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            if e_context["context"]["isgroup"]:
+                reply.content = "只能在私聊中备份数据库。"
+            elif self.backup_lock.locked():
+                reply.content = "数据库正在备份中，完成后会自动发送结果。"
+            else:
+                channel = e_context.econtext.get("channel")
+                context = e_context["context"]
+                
+                def backup_and_send():
+                    try:
+                        result = self.backup_now()
+                        if result is None:
+                            return
+                        content = (f"数据库备份完成：{os.path.basename(result.path)}，"
+                                   f"大小 {result.size / 1024:.1f}KB，耗时 {result.duration:.2f} 秒，完整性检查通过")
+                    except Exception as e:
+                        logger.error(f"[donotlazy] 备份数据库异常：{e}")
+                        logger.exception(e)
+                        content = f"备份数据库失败：{str(e)}"
+                    self._send_to_channel(channel, context, content)
+                
+                threading.Thread(target=backup_and_send, name="donotlazy-backup-now", daemon=True).start()
+                reply.content = "开始备份数据库，备份期间不影响已读记录，完成后会自动发送结果。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 备份数据库异常：{e}")
+            logger.exception(e)
+            reply.content = f"备份数据库失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _start_http_server(self):
+        """http_port大于0时启动HTTP统计接口，端口被占用等错误不影响插件其他功能"""
+        settings = self.settings
+        if not settings.http_port:
+            return
+        try:
+            self.http_server = start_server(StatsApi(self), settings.http_host, settings.http_port)
+            logger.info(f"[donotlazy] HTTP统计接口已启动：http://{settings.http_host}:{settings.http_port}/api/")
+        except OSError as e:
+            logger.error(f"[donotlazy] HTTP统计接口启动失败：{e}")
+    
+    def group_read_status(self, group_id, date):
+        """单个群组某天的已读和未读名单，未读按学号顺序"""
+        roster = self.students
+        with self._connect_group(group_id, readonly=True) as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT student_name, student_id, nickname, read_time
+                FROM read_records
+                WHERE group_id = ? AND create_date = ?
+                ORDER BY read_time
+            ''', (group_id, date))
+            records = cursor.fetchall()
+        
+        read_ids = {student_id for _, student_id, _, _ in records if student_id}
+        return {
+            "group_id": group_id,
+            "group_name": self._get_group_name(group_id),
+            "date": date,
+            "read": [{"name": name, "student_id": student_id, "nickname": nickname or name, "read_time": read_time}
+                     for name, student_id, nickname, read_time in records if student_id],
+            "read_not_in_roster": [{"name": name, "nickname": nickname or name, "read_time": read_time}
+                                   for name, student_id, nickname, read_time in records if not student_id],
+            "unread": [{"name": name, "student_id": roster[name]} for name in roster.order if roster[name] not in read_ids],
+        }
+    
+    def daily_summary(self, date):
+        """某天各群组的已读人数、未读人数和已读率，各分片并行统计后合并"""
+        total = len(self.students)
+        shard_rows = self._fan_out(lambda conn: conn.execute('''
+            SELECT group_id, COUNT(DISTINCT student_id), SUM(student_id IS NULL)
+            FROM read_records
+            WHERE create_date = ? AND group_id != '私聊'
+            GROUP BY group_id
+        ''', (date,)).fetchall())
+        
+        groups = []
+        for group_id, read_count, not_in_roster in sorted(row for rows in shard_rows for row in rows):
+            groups.append({
+                "group_id": group_id,
+                "group_name": self._get_group_name(group_id),
+                "read": read_count,
+                "read_not_in_roster": not_in_roster,
+                "unread": max(total - read_count, 0),
+                "read_rate": round(read_count / total, 4) if total else None,
+            })
+        return {"date": date, "students": total, "groups": groups}
+    
+    def metrics(self):
+        """插件运行指标，只读取内存中的状态"""
+        settings = self.settings
+        tracer = self.statement_tracer
+        return {
+            "students": len(self.students),
+            "roster_version": self.students.version,
+            "data_version": self.data_version,
+            "pid": os.getpid(),
+            "leader": self.leader_lock.is_leader,
+            "white_groups": len(settings.white_group_list),
+            "db_size": self._database_size(),
+            "db_shards": self.shard_count,
+            "startup_ms": {phase: round(elapsed, 1) for phase, elapsed in self.startup_timings},
+            "import_progress": self.import_progress,
+            "backfill_progress": self.backfill_progress,
+            "spill_pending": self.spill_journal.pending,
+            "spill_quarantined": self.spill_journal.quarantined_events(),
+            "last_backup": self.last_backup._asdict() if self.last_backup else None,
+            "last_backup_error": self.last_backup_error,
+            "last_maintenance": self.last_maintenance,
+            "slow_statements": len(tracer.top()) if tracer else None,
+            "profiling": dict(self.profiling),
+        }
+    
+    def _database_size(self):
+        """主数据库和所有分片的文件大小之和"""
+        return sum(os.path.getsize(path) for path in self._database_files() if os.path.exists(path))
+    
+    def _handle_plugin_status(self, e_context, msg):
+        """显示插件运行状态：名单、数据库大小、启动耗时、后台任务和备份情况"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            settings = self.settings
+            lines = ["【插件状态】"]
+            lines.append(f"学生名单：{len(self.students)} 名（版本 {self.students.version}）")
+            lines.append(f"白名单群组：{len(settings.white_group_list)} 个")
+            shards = f"，{self.shard_count} 个分片" if self.shard_count > 1 else ""
+            lines.append(f"数据库大小：{self._database_size() / 1024:.1f}KB{shards}")
+            lines.append(f"进程：{os.getpid()}（{'主进程，负责清理、维护和定时备份' if self.leader_lock.is_leader else '非主进程'}）")
+            timings = "，".join(f"{phase} {elapsed:.0f}ms" for phase, elapsed in self.startup_timings)
+            lines.append(f"启动耗时：{timings}")
+            if self.import_progress is not None:
+                lines.append(f"名单导入中：已处理 {self.import_progress} 行")
+            if self.backfill_progress is not None:
+                lines.append(f"聊天记录补录中：已处理 {self.backfill_progress} 行")
+            
+            if self.spill_journal.has_pending():
+                lines.append(f"溢出日志：有待重放的已读记录（本进程 {self.spill_journal.pending} 条），数据库可写后自动写入")
+            quarantined = self.spill_journal.quarantined_events()
+            if quarantined:
+                lines.append(f"溢出日志：{quarantined} 条已读重放失败，已隔离到 {SPILL_DIR}/{QUARANTINE_NAME}，需要人工处理")
+            if self.backup_lock.locked():
+                lines.append("数据库备份：正在备份")
+            if self.last_backup:
+                result = self.last_backup
+                lines.append(f"最近一次备份：{result.backup_time}，大小 {result.size / 1024:.1f}KB，"
+                             f"耗时 {result.duration:.2f} 秒，{os.path.basename(result.path)}")
+            if self.last_backup_error:
+                lines.append(f"最近一次备份失败：{self.last_backup_error}")
+            snapshots = list_backups(self._backup_dir(), BACKUP_PREFIX)
+            schedule = f"每 {settings.backup_interval_hours} 小时" if settings.backup_interval_hours else "未启用定时备份"
+            lines.append(f"备份快照：{len(snapshots)} 份（保留 {settings.backup_keep} 份，{schedule}）")
+            if self.last_maintenance:
+                result = self.last_maintenance
+                lines.append(f"最近一次维护：{result['time']}，回收 {result['pages']} 页，剩余空闲 {result['free_pages']} 页")
+            reply.content = "\n".join(lines)
+        except Exception as e:
+            logger.error(f"[donotlazy] 查看插件状态异常：{e}")
+            logger.exception(e)
+            reply.content = f"查看插件状态失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_slow_statements(self, e_context, msg, args):
+        """显示慢语句跟踪记录的最慢语句，参数为「清空」时清空统计"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            tracer = self.statement_tracer
+            if e_context["context"]["isgroup"]:
+                reply.content = "只能在私聊中查看慢语句统计。"
+            elif not self.settings.slow_query_ms:
+                reply.content = "未启用慢语句跟踪，请在配置中将slow_query_ms设置为大于0的毫秒数。"
+            elif args == "清空":
+                if tracer:
+                    tracer.reset()
+                reply.content = "已清空慢语句统计。"
+            elif not tracer or not tracer.top():
+                reply.content = f"暂无超过 {self.settings.slow_query_ms}ms 的语句。"
+            else:
+                lines = [f"【慢语句统计】（超过 {tracer.threshold_ms}ms，按最大耗时排序）"]
+                for i, (statement, entry) in enumerate(tracer.top(), 1):
+                    lines.append(f"{i}. 最大 {entry['max_ms']:.1f}ms，平均 {entry['total_ms'] / entry['count']:.1f}ms，共 {entry['count']} 次")
+                    lines.append(f"   {statement[:120]}")
+                    if entry["plan"]:
+                        lines.append("   计划：" + "；".join(entry["plan"].splitlines()))
+                reply.content = "\n".join(lines)
+        except Exception as e:
+            logger.error(f"[donotlazy] 查看慢语句统计异常：{e}")
+            logger.exception(e)
+            reply.content = f"查看慢语句统计失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_start_profiling(self, e_context, msg, args):
+        """对指定命令的后续N次执行做性能分析，格式：开启性能分析 命令 [次数]"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            parts = args.split()
+            count = 1
+            if len(parts) > 1 and parts[-1].isdigit():
+                count = min(max(int(parts.pop()), 1), PROFILE_MAX_RUNS)
+            name = " ".join(parts)
+            handler_name = PROFILE_COMMANDS.get(name, name)
+            
+            if e_context["context"]["isgroup"]:
+                reply.content = "只能在私聊中开启性能分析。"
+            elif not name:
+                reply.content = f"请指定命令。格式：开启性能分析 查询未读同学 3\n可分析的命令：{'、'.join(PROFILE_COMMANDS)}"
+            elif not handler_name.startswith("_handle_") or not callable(getattr(type(self), handler_name, None)):
+                reply.content = f"无法分析「{name}」。可分析的命令：{'、'.join(PROFILE_COMMANDS)}"
+            else:
+                self._profile_handler(handler_name, count, e_context.econtext.get("channel"), e_context["context"])
+                reply.content = (f"已开启性能分析：接下来 {count} 次「{name}」的执行结果会保存到插件目录的{PROFILE_DIR}文件夹，"
+                                 f"并发送累计耗时最多的 {PROFILE_TOP} 个函数。")
+        except Exception as e:
+            logger.error(f"[donotlazy] 开启性能分析异常：{e}")
+            logger.exception(e)
+            reply.content = f"开启性能分析失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_stop_profiling(self, e_context, msg):
+        """取消所有尚未完成的性能分析"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        if e_context["context"]["isgroup"]:
+            reply.content = "只能在私聊中关闭性能分析。"
+        else:
+            names = list(self.profiling)
+            for handler_name in names:
+                self._stop_profiling(handler_name)
+            reply.content = f"已关闭性能分析：{'、'.join(names)}" if names else "当前没有进行中的性能分析。"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _profile_handler(self, handler_name, count, channel, context):
+        """用实例属性临时覆盖处理方法，执行count次后删除覆盖，未分析时调用的仍是原方法"""
+        original = getattr(type(self), handler_name)
+        
+        def profiled(*args, **kwargs):
+            remaining = self.profiling.get(handler_name, 0) - 1
+            if remaining <= 0:
+                self._stop_profiling(handler_name)
+            else:
+                self.profiling[handler_name] = remaining
+            # 同一时间只能有一个分析器，其他线程中的调用直接执行
+            if not self.profile_lock.acquire(blocking=False):
+                return original(self, *args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(original, self, *args, **kwargs)
+            finally:
+                self.profile_lock.release()
+                self._report_profile(handler_name, profiler, channel, context)
+        
+        self.profiling[handler_name] = count
+        setattr(self, handler_name, profiled)
+        logger.info(f"[donotlazy] 已开启性能分析：{handler_name}，{count} 次")
+    
+    def _stop_profiling(self, handler_name):
+        self.profiling.pop(handler_name, None)
+        self.__dict__.pop(handler_name, None)
+    
+    def _report_profile(self, handler_name, profiler, channel, context):
+        """保存分析结果并向开启分析的人发送累计耗时最多的函数"""
+        try:
+            profile_dir = os.path.join(self.curdir, PROFILE_DIR)
+            os.makedirs(profile_dir, exist_ok=True)
+            now = datetime.now()
+            path = os.path.join(profile_dir, f"{handler_name.lstrip('_')}-{now.strftime('%Y%m%d-%H%M%S')}-{now.microsecond // 1000:03d}.prof")
+            profiler.dump_stats(path)
+            
+            stats = pstats.Stats(profiler)
+            total = max((entry[3] for entry in stats.stats.values()), default=0)
+            top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+            lines = [f"【性能分析】{handler_name} 总耗时 {total * 1000:.1f}ms，结果已保存到 {PROFILE_DIR}/{os.path.basename(path)}"]
+            for (file_name, line, func_name), (_, calls, _, cumulative, _) in top:
+                location = f"{os.path.basename(file_name)}:{line}" if line else "内置"
+                lines.append(f"{cumulative * 1000:.1f}ms  {func_name}（{location}）×{calls}")
+            self._send_to_channel(channel, context, "\n".join(lines))
+        except Exception as e:
+            logger.error(f"[donotlazy] 保存性能分析结果异常：{e}")
+            logger.exception(e)
+    
+    def _get_group_name(self, group_id):
+        """根据群ID获取群名称"""
+        try:
+            # 尝试从群组所在分片的消息记录获取群名称
+            with self._connect_group(group_id) as conn:
+                cursor = conn.cursor()
+                # 首先尝试从other_user_nickname字段中获取群名称
+                cursor.execute('''
+                    SELECT other_user_nickname 
+                    FROM message_records 
+                    WHERE group_id = ? AND other_user_nickname IS NOT NULL
+                    ORDER BY create_time DESC
+                    LIMIT 1
+                ''', (group_id,))
+                
+                result = cursor.fetchone()
+                if result and result[0]:
+                    return result[0]
+                
+                # 如果没有找到，尝试旧方法
+                cursor.execute('''
+                    SELECT DISTINCT other_user_nickname 
+                    FROM message_records 
+                    WHERE group_id = ? 
+                    LIMIT 1
+                ''', (group_id,))
+                
+                result = cursor.fetchone()
+                if result and result[0]:
+                    return result[0]
+            
+            # 如果找不到群名称，则返回群ID的前10个字符 + "..."
+            if len(group_id) > 10:
+                return group_id[:10] + "..."
+            return group_id
+        except Exception as e:
+            logger.error(f"[donotlazy] 获取群名称异常：{e}")
+            return group_id
+    
+    def _handle_show_whitelist(self, e_context, msg):
+        """显示白名单"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            if not self.settings.white_group_list:
+                reply.content = "当前没有设置白名单，插件会响应所有群组消息。"
+            else:
+                result = f"当前白名单群组({len(self.settings.white_group_list)}个)：\n\n"
+                # 读取数据库获取群组名称，同一分片的群组共用一个连接
+                group_names = {}
+                shard_groups = {}
+                for group_id in self.settings.white_group_list:
+                    shard_groups.setdefault(self._shard_path(group_id), []).append(group_id)
+                for path, group_ids in shard_groups.items():
+                    with self._connect_shard(path) as conn:
+                        cursor = conn.cursor()
+                        for group_id in group_ids:
+                            cursor.execute('''
+                                SELECT other_user_nickname 
+                                FROM message_records 
+                                WHERE group_id = ? AND other_user_nickname IS NOT NULL
+                                ORDER BY create_time DESC
+                                LIMIT 1
+                            ''', (group_id,))
+                            
+                            record = cursor.fetchone()
+                            if record and record[0]:
+                                group_names[group_id] = record[0]
+                            else:
+                                group_names[group_id] = "未知群名"
+                
+                # 显示群组列表
+                for i, group_id in enumerate(self.settings.white_group_list):
+                    group_name = group_names.get(group_id, "未知群名")
+                    result += f"{i+1}. {group_id} ({group_name})\n"
+                
+                result += "\n说明：插件只会响应白名单中的群组消息。如需修改，请编辑配置文件。"
+                reply.content = result.strip()
+        except Exception as e:
+            logger.error(f"[donotlazy] 显示白名单异常：{e}")
+            logger.exception(e)
+            reply.content = f"获取白名单失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_add_whitelist(self, e_context, msg, group_id_or_name):
+        """添加白名单群组"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        # 只允许在私聊中管理白名单
+        if e_context["context"]["isgroup"]:
+            reply.content = "只能在私聊中管理白名单。"
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+        
+        try:
+            if not group_id_or_name:
+                reply.content = "请指定要添加的群组ID或群名称。格式：添加白名单 群组名称"
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+            
+            # 多个群组用逗号或顿号分隔时批量添加
+            items = [item.strip() for item in re.split(r"[,，、]", group_id_or_name) if item.strip()]
+            if len(items) > 1:
+                reply.content = self._bulk_add_whitelist(items)
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+                
+            # 判断是否为纯数字ID
+            if group_id_or_name.isdigit():
+                # 按ID处理
                 group_id = group_id_or_name
-                if group_id in self.white_group_list:
+                if group_id in self.settings.white_group_set:
                     reply.content = f"群组ID {group_id} 已在白名单中。"
                 else:
-                    self.white_group_list.append(group_id)
-                    # 保存配置
-                    self._save_config()
+                    self._add_whitelist_groups([group_id])
                     
                     # 尝试获取群名称
                     group_name = self._get_group_name(group_id)
@@ -1212,18 +3579,16 @@ class DoNotLazy(Plugin):
                 elif len(matched_groups) == 1:
                     # 只有一个匹配，直接添加
                     group_id, group_name = matched_groups[0]
-                    if group_id in self.white_group_list:
+                    if group_id in self.settings.white_group_set:
                         reply.content = f"群组「{group_name}」(ID: {group_id}) 已在白名单中。"
                     else:
-                        self.white_group_list.append(group_id)
-                        # 保存配置
-                        self._save_config()
+                        self._add_whitelist_groups([group_id])
                         reply.content = f"已成功将群组「{group_name}」(ID: {group_id}) 添加到白名单。"
                 else:
                     # 多个匹配，列出所有匹配项
                     result = f"找到多个匹配「{group_id_or_name}」的群组，请使用群ID添加或者提供更精确的群名称：\n\n"
                     for i, (gid, gname) in enumerate(matched_groups):
-                        status = "（已在白名单中）" if gid in self.white_group_list else ""
+                        status = "（已在白名单中）" if gid in self.settings.white_group_set else ""
                         result += f"{i+1}. {gname} (ID: {gid}) {status}\n"
                     
                     result += "\n添加格式：添加白名单 群组名称"
@@ -1237,6 +3602,33 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
+    def _bulk_add_whitelist(self, items):
+        """批量添加白名单，逐项解析群ID或群名称，全部解析后只保存一次配置"""
+        to_add = []
+        lines = []
+        for item in items:
+            if item.isdigit():
+                matched_groups = [(item, self._get_group_name(item))]
+            else:
+                matched_groups = self._find_group_by_name(item)
+            
+            if not matched_groups:
+                lines.append(f"✗ {item}：未找到匹配的群组")
+            elif len(matched_groups) > 1:
+                lines.append(f"✗ {item}：匹配到{len(matched_groups)}个群组，请使用群ID或更精确的群名称")
+            else:
+                group_id, group_name = matched_groups[0]
+                if group_id in self.settings.white_group_set or group_id in to_add:
+                    lines.append(f"- {item}：群组「{group_name}」(ID: {group_id}) 已在白名单中")
+                else:
+                    to_add.append(group_id)
+                    lines.append(f"✓ {item}：已添加群组「{group_name}」(ID: {group_id})")
+        
+        if to_add:
+            self._add_whitelist_groups(to_add)
+        
+        return f"批量添加白名单完成，新增{len(to_add)}个群组：\n\n" + "\n".join(lines)
+    
     def _handle_remove_whitelist(self, e_context, msg, group_id_or_name):
         """删除白名单群组"""
         reply = Reply()
@@ -1260,12 +3652,10 @@ class DoNotLazy(Plugin):
             if group_id_or_name.isdigit():
                 # 按ID处理
                 group_id = group_id_or_name
-                if group_id not in self.white_group_list:
+                if group_id not in self.settings.white_group_set:
                     reply.content = f"群组ID {group_id} 不在白名单中。"
                 else:
-                    self.white_group_list.remove(group_id)
-                    # 保存配置
-                    self._save_config()
+                    self._remove_whitelist_groups([group_id])
                     
                     # 尝试获取群名称
                     group_name = self._get_group_name(group_id)
@@ -1282,25 +3672,21 @@ class DoNotLazy(Plugin):
                 elif len(matched_groups) == 1:
                     # 只有一个匹配，检查是否在白名单中
                     group_id, group_name = matched_groups[0]
-                    if group_id not in self.white_group_list:
+                    if group_id not in self.settings.white_group_set:
                         reply.content = f"群组「{group_name}」(ID: {group_id}) 不在白名单中。"
                     else:
-                        self.white_group_list.remove(group_id)
-                        # 保存配置
-                        self._save_config()
+                        self._remove_whitelist_groups([group_id])
                         reply.content = f"已成功将群组「{group_name}」(ID: {group_id}) 从白名单中删除。"
                 else:
                     # 多个匹配，筛选出在白名单中的群组
-                    whitelist_matches = [(gid, gname) for gid, gname in matched_groups if gid in self.white_group_list]
+                    whitelist_matches = [(gid, gname) for gid, gname in matched_groups if gid in self.settings.white_group_set]
                     
                     if not whitelist_matches:
                         reply.content = f"找到多个匹配「{group_id_or_name}」的群组，但它们都不在白名单中。"
                     elif len(whitelist_matches) == 1:
                         # 只有一个在白名单中的匹配，直接删除
                         group_id, group_name = whitelist_matches[0]
-                        self.white_group_list.remove(group_id)
-                        # 保存配置
-                        self._save_config()
+                        self._remove_whitelist_groups([group_id])
                         reply.content = f"已成功将群组「{group_name}」(ID: {group_id}) 从白名单中删除。"
                     else:
                         # 多个在白名单中的匹配，列出所有匹配项
@@ -1319,23 +3705,136 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
-    def _save_config(self):
-        """保存配置到文件"""
+    def _set_whitelist(self, update):
+        """用update(当前白名单)的结果替换配置快照中的白名单（保持顺序、去重）并保存配置
+        
+        读取、替换快照和安排保存都在config_lock中进行，与_reload_config互斥，热加载不会覆盖刚修改的白名单。
+        """
+        with self.config_lock:
+            self.settings = with_whitelist(self.settings, update(self.settings.white_group_list))
+            self._schedule_config_save()
+    
+    def _add_whitelist_groups(self, group_ids):
+        """批量添加白名单群组，只触发一次配置保存"""
+        self._set_whitelist(lambda white_group_list: white_group_list + tuple(group_ids))
+    
+    def _remove_whitelist_groups(self, group_ids):
+        """批量删除白名单群组，只触发一次配置保存"""
+        removed = set(group_ids)
+        self._set_whitelist(lambda white_group_list: [gid for gid in white_group_list if gid not in removed])
+    
+    def _schedule_config_save(self):
+        """延迟保存配置，短时间内的多次修改只写一次文件；调用方需持有config_lock"""
+        if self.config_save_timer:
+            self.config_save_timer.cancel()
+        self.config_save_timer = threading.Timer(self.settings.config_save_delay, self._flush_config)
+        self.config_save_timer.daemon = True
+        self.config_save_timer.start()
+    
+    def _flush_pending_config(self):
+        """进程退出时立即写入尚未保存的配置"""
+        with self.config_lock:
+            timer = self.config_save_timer
+        if timer:
+            timer.cancel()
+            self._flush_config()
+    
+    def _flush_config(self):
+        """保存配置到文件：先写同目录下的临时文件并落盘，再原子替换config.json"""
+        tmp_path = None
         try:
-            # 更新配置
-            self.config["white_group_list"] = self.white_group_list
-            
-            # 保存到文件
-            config_path = os.path.join(self.curdir, "config.json")
-            with open(config_path, "w", encoding="utf-8") as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+            with self.config_lock:
+                self.config_save_timer = None
+                # 更新配置
+                self.config["white_group_list"] = list(self.settings.white_group_list)
+                
+                config_path = os.path.join(self.curdir, "config.json")
+                fd, tmp_path = tempfile.mkstemp(dir=self.curdir, prefix=".config.", suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(self.config, f, ensure_ascii=False, indent=4)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, config_path)
+                tmp_path = None
+                # 自己写入的配置不需要再热加载
+                self.config_mtime = self._get_config_mtime()
             
-            logger.info(f"[donotlazy] 配置已保存，白名单: {self.white_group_list}")
+            logger.info(f"[donotlazy] 配置已保存，白名单: {self.settings.white_group_list}")
             return True
         except Exception as e:
             logger.error(f"[donotlazy] 保存配置异常：{e}")
             logger.exception(e)
             return False
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _get_config_mtime(self):
+        """获取config.json的修改时间，文件不存在时返回None"""
+        try:
+            return os.stat(os.path.join(self.curdir, "config.json")).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _start_config_watcher(self):
+        """启动后台线程，按修改时间检测config.json的变化"""
+        self.config_mtime = self._get_config_mtime()
+        if not self.settings.config_reload_interval:
+            logger.info("[donotlazy] 未启用配置热加载")
+            return
+        threading.Thread(target=self._watch_config, name="donotlazy-config", daemon=True).start()
+    
+    def _watch_config(self):
+        """定期检查config.json的修改时间，变化后重新加载配置"""
+        while True:
+            time.sleep(max(self.settings.config_reload_interval, 1))
+            try:
+                mtime = self._get_config_mtime()
+                if mtime is None or mtime == self.config_mtime:
+                    continue
+                # 先记录修改时间，文件格式错误时只报告一次，等下次修改再重试
+                self.config_mtime = mtime
+                self._reload_config()
+            except Exception as e:
+                logger.error(f"[donotlazy] 重新加载配置异常：{e}")
+                logger.exception(e)
+    
+    @staticmethod
+    def _build_settings(config):
+        """构建配置快照，取值无效的配置项记录警告后使用默认值"""
+        for key, value, choices in invalid_options(config):
+            logger.warning(f"[donotlazy] 配置项 {key} 的值 {value!r} 无效，可选值为 {'/'.join(choices)}，"
+                           f"已使用默认值 {DEFAULT_CONFIG[key]!r}")
+        return build_settings(config)
+    
+    def _reload_config(self):
+        """读取config.json并构建新的配置快照，然后整体替换当前快照"""
+        config_path = os.path.join(self.curdir, "config.json")
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        
+        with self.config_lock:
+            old_settings = self.settings
+            # 白名单的修改还在等待保存时以内存中的为准，保存时与新加载的其他配置一起写入文件
+            if self.config_save_timer:
+                config["white_group_list"] = list(old_settings.white_group_list)
+            new_settings = self._build_settings(config)
+            self.config = config
+            if new_settings == old_settings:
+                return
+            self.settings = new_settings
+        logger.info(f"[donotlazy] 配置已重新加载: {new_settings}")
+        
+        # 重建依赖配置的数据
+        if new_settings.student_file != old_settings.student_file:
+            self._reload_roster()
+        if new_settings.report_workers != old_settings.report_workers:
+            logger.warning("[donotlazy] report_workers 的修改需要重启后生效")
+        if (new_settings.http_host, new_settings.http_port) != (old_settings.http_host, old_settings.http_port):
+            logger.warning("[donotlazy] http_host、http_port 的修改需要重启后生效")
+        if new_settings.db_shards != old_settings.db_shards:
+            logger.warning("[donotlazy] db_shards 的修改需要重启后生效，重启时会按新的分片数迁移数据")
+        self._invalidate_reports()
     
     def _handle_clear_whitelist(self, e_context, msg):
         """清空白名单"""
@@ -1343,9 +3842,7 @@ class DoNotLazy(Plugin):
         reply.type = ReplyType.TEXT
         
         try:
-            self.white_group_list = []
-            # 保存配置
-            self._save_config()
+            self._set_whitelist(lambda white_group_list: [])
             reply.content = "已成功清空白名单。"
         except Exception as e:
             logger.error(f"[donotlazy] 清空白名单异常：{e}")
@@ -1367,7 +3864,7 @@ class DoNotLazy(Plugin):
         
         help_text += "私聊命令：\n"
         help_text += "1. 显示白名单：查看当前白名单群组\n"
-        help_text += "2. 添加白名单 群组名称：添加指定群组到白名单（支持群名称或群ID）\n"
+        help_text += "2. 添加白名单 群组名称：添加指定群组到白名单（支持群名称或群ID，多个群组用逗号分隔）\n"
         help_text += "3. 删除白名单 群组名称：从白名单中删除指定群组（支持群名称或群ID）\n"
         help_text += "4. 清空白名单：清空所有白名单群组\n\n"
         
@@ -1394,12 +3891,10 @@ class DoNotLazy(Plugin):
             group_id = msg.other_user_id
             group_name = msg.other_user_nickname
             
-            if group_id in self.white_group_list:
+            if group_id in self.settings.white_group_set:
                 reply.content = f"群组「{group_name}」已在白名单中。"
             else:
-                self.white_group_list.append(group_id)
-                # 保存配置
-                self._save_config()
+                self._add_whitelist_groups([group_id])
                 reply.content = f"已成功将群组「{group_name}」(ID: {group_id}) 添加到白名单。"
         except Exception as e:
             logger.error(f"[donotlazy] 添加当前群组异常：{e}")
@@ -1418,12 +3913,10 @@ class DoNotLazy(Plugin):
             group_id = msg.other_user_id
             group_name = msg.other_user_nickname
             
-            if group_id not in self.white_group_list:
+            if group_id not in self.settings.white_group_set:
                 reply.content = f"群组「{group_name}」不在白名单中。"
             else:
-                self.white_group_list.remove(group_id)
-                # 保存配置
-                self._save_config()
+                self._remove_whitelist_groups([group_id])
                 reply.content = f"已成功将群组「{group_name}」(ID: {group_id}) 从白名单中删除。"
         except Exception as e:
             logger.error(f"[donotlazy] 删除当前群组异常：{e}")
@@ -1433,33 +3926,673 @@ class DoNotLazy(Plugin):
         e_context["reply"] = reply
         e_context.action = EventAction.BREAK_PASS
     
-    def _find_group_by_name(self, group_name):
-        """根据群名称查找对应的群ID"""
+    def _handle_bind_alias(self, e_context, msg, args):
+        """绑定昵称别名到学生"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        # 只允许在私聊中管理别名
+        if e_context["context"]["isgroup"]:
+            reply.content = "只能在私聊中管理别名。"
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+        
+        try:
+            parts = args.rsplit(None, 1)
+            if len(parts) != 2:
+                reply.content = "格式错误。格式：绑定别名 别名 学生姓名，比如「绑定别名 张三爸爸 张三」"
+            else:
+                alias, student_name = parts[0].strip(), parts[1].strip()
+                alias_key = normalize_name(alias)
+                if student_name not in self.students:
+                    reply.content = f"学生「{student_name}」不在学生名单中，无法绑定。"
+                elif not alias_key:
+                    reply.content = f"别名「{alias}」去除空格和表情后为空，请换一个别名。"
+                else:
+                    with self._connect() as conn:
+                        cursor = conn.cursor()
+                        cursor.execute('''
+                            INSERT OR REPLACE INTO student_aliases (alias, student_name, create_time)
+                            VALUES (?, ?, ?)
+                        ''', (alias_key, student_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                        conn.commit()
+                    
+                    self._rebuild_name_index()
+                    self._backfill_student_ids()
+                    reply.content = f"已将别名「{alias}」绑定到学生「{student_name}」（学号：{self.students[student_name]}）。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 绑定别名异常：{e}")
+            logger.exception(e)
+            reply.content = f"绑定别名失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_unbind_alias(self, e_context, msg, alias):
+        """删除昵称别名"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        # 只允许在私聊中管理别名
+        if e_context["context"]["isgroup"]:
+            reply.content = "只能在私聊中管理别名。"
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+        
+        try:
+            if not alias:
+                reply.content = "请指定要删除的别名。格式：删除别名 别名"
+            else:
+                with self._connect() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        DELETE FROM student_aliases
+                        WHERE alias = ?
+                    ''', (normalize_name(alias),))
+                    conn.commit()
+                    
+                    deleted_count = cursor.rowcount
+                
+                if deleted_count:
+                    self._rebuild_name_index()
+                    reply.content = f"已删除别名「{alias}」。"
+                else:
+                    reply.content = f"别名「{alias}」不存在。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 删除别名异常：{e}")
+            logger.exception(e)
+            reply.content = f"删除别名失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_show_aliases(self, e_context, msg):
+        """显示别名表"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        if not self.aliases:
+            reply.content = "当前没有绑定任何别名。\n绑定格式：绑定别名 别名 学生姓名"
+        else:
+            result = f"当前别名表({len(self.aliases)}个)：\n\n"
+            for i, (alias, student_name) in enumerate(sorted(self.aliases.items())):
+                result += f"{i+1}. {alias} -> {student_name}\n"
+            reply.content = result.strip()
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_publish_notice(self, e_context, msg, notice_content):
+        """发布通知，之后的已读记录到该通知"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        if not e_context["context"]["isgroup"]:
+            reply.content = "只能在群聊中发布通知。"
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+        
+        try:
+            notice_id = self._open_notice(msg.other_user_id, notice_content, msg.actual_user_nickname)
+            reply.content = f"已发布通知{notice_id}，之后群内的已读将记录到该通知。\n查询格式：「查询未读 通知{notice_id}」"
+        except Exception as e:
+            logger.error(f"[donotlazy] 发布通知异常：{e}")
+            logger.exception(e)
+            reply.content = f"发布通知失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_close_notice(self, e_context, msg):
+        """结束当前群的通知"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        if not e_context["context"]["isgroup"]:
+            reply.content = "只能在群聊中结束通知。"
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+        
+        try:
+            notice_id = self._close_notice(msg.other_user_id)
+            if notice_id:
+                reply.content = f"已结束通知{notice_id}。"
+            else:
+                reply.content = "当前群没有开启中的通知。"
+        except Exception as e:
+            logger.error(f"[donotlazy] 结束通知异常：{e}")
+            logger.exception(e)
+            reply.content = f"结束通知失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_list_notices(self, e_context, msg):
+        """查看最近的通知"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            # 已读人数通过notice_reads主键前缀统计，通知已读保存在通知所在群的分片中
+            if e_context["context"]["isgroup"]:
+                with self._connect_group(msg.other_user_id, readonly=True) as conn:
+                    notices = conn.execute('''
+                        SELECT n.id, n.group_id, n.content, n.create_time, n.status,
+                               (SELECT COUNT(*) FROM notice_reads r WHERE r.notice_id = n.id)
+                        FROM notices n
+                        WHERE n.group_id = ?
+                        ORDER BY n.id DESC
+                        LIMIT 10
+                    ''', (msg.other_user_id,)).fetchall()
+            else:
+                with self._connect_readonly() as conn:
+                    notices = conn.execute('''
+                        SELECT id, group_id, content, create_time, status
+                        FROM notices
+                        ORDER BY id DESC
+                        LIMIT 10
+                    ''').fetchall()
+                notice_ids = [notice[0] for notice in notices]
+                placeholders = ", ".join("?" * len(notice_ids))
+                read_counts = {}
+                for shard_counts in self._fan_out(lambda conn: conn.execute(f'''
+                    SELECT notice_id, COUNT(*) FROM notice_reads
+                    WHERE notice_id IN ({placeholders})
+                    GROUP BY notice_id
+                ''', notice_ids).fetchall()):
+                    for notice_id, count in shard_counts:
+                        read_counts[notice_id] = read_counts.get(notice_id, 0) + count
+                notices = [notice + (read_counts.get(notice[0], 0),) for notice in notices]
+            
+            if not notices:
+                reply.content = "当前没有通知记录。\n群内发送「发布通知 内容」可以开启通知跟踪。"
+            else:
+                result = "最近的通知：\n\n"
+                for notice_id, group_id, notice_content, create_time, status, read_count in notices:
+                    status_display = "进行中" if status == "open" else "已结束"
+                    summary = (notice_content or "（无内容）")[:20]
+                    result += f"通知{notice_id}（{status_display}）{create_time}\n"
+                    if not e_context["context"]["isgroup"]:
+                        result += f"  群组：{self._get_group_name(group_id)}\n"
+                    result += f"  内容：{summary}\n"
+                    result += f"  已读：{read_count}人\n\n"
+                result += "查询格式：「查询未读 通知3」或「查询已读 通知3」"
+                reply.content = result.strip()
+        except Exception as e:
+            logger.error(f"[donotlazy] 查看通知异常：{e}")
+            logger.exception(e)
+            reply.content = f"查看通知失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_query_notice(self, e_context, msg, content):
+        """按通知查询已读或未读同学"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            match = re.match(r'^查询(已读|未读)\s*通知\s*(\d+)$', content)
+            query_type, notice_id = match.group(1), int(match.group(2))
+            
+            with self._connect_readonly() as conn:
+                notice = conn.execute('''
+                    SELECT group_id, content, create_time, status
+                    FROM notices
+                    WHERE id = ?
+                ''', (notice_id,)).fetchone()
+            
+            # 群聊中只能查询本群的通知
+            if notice and e_context["context"]["isgroup"] and notice[0] != msg.other_user_id:
+                notice = None
+            
+            records = []
+            if notice:
+                # 通知已读保存在通知所在群的分片中
+                with self._connect_group(notice[0], readonly=True) as conn:
+                    records = conn.execute('''
+                        SELECT student_name, student_id, read_time
+                        FROM notice_reads
+                        WHERE notice_id = ?
+                        ORDER BY read_time ASC
+                    ''', (notice_id,)).fetchall()
+            
+            if not notice:
+                reply.content = f"未找到通知{notice_id}。发送「查看通知」查看最近的通知。"
+            else:
+                group_id, notice_content, create_time, status = notice
+                status_display = "进行中" if status == "open" else "已结束"
+                result = f"通知{notice_id}（{status_display}，发布于 {create_time}）\n"
+                result += f"内容：{(notice_content or '（无内容）')[:50]}\n\n"
+                
+                read_ids = {student_id for _, student_id, _ in records if student_id}
+                if query_type == "已读":
+                    result += f"已读：{len(records)}人\n"
+                    for i, (name, student_id, read_time) in enumerate(records):
+                        name_display = name if student_id else f"{name}(未在同学名单)"
+                        result += f"{i+1}. {name_display}（{read_time}）\n"
+                else:
+                    roster = self.students
+                    unread_students = [(name, roster[name]) for name in roster.order if roster[name] not in read_ids]
+                    result += f"名单内已读：{len(read_ids)}人，未读：{len(unread_students)}人\n"
+                    for i, (name, student_id) in enumerate(unread_students):
+                        result += f"{i+1}. {name}（学号：{student_id}）\n"
+                
+                reply.content = result.strip()
+        except Exception as e:
+            logger.error(f"[donotlazy] 按通知查询异常：{e}")
+            logger.exception(e)
+            reply.content = f"查询失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_read_speed_stats(self, e_context, msg):
+        """阅读速度统计，直接从草图计算中位数和P90"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            group_id = msg.other_user_id if e_context["context"]["isgroup"] else None
+            # 每个群的草图只保存在所在的分片中
+            if group_id:
+                with self._connect_group(group_id, readonly=True) as conn:
+                    sketches = load_sketches(conn.cursor(), group_id)
+            else:
+                sketches = {}
+                for shard_sketches in self._fan_out(lambda conn: load_sketches(conn.cursor())):
+                    sketches.update(shard_sketches)
+            group_ids = sorted({gid for gid, _ in sketches})
+            
+            result = "阅读速度统计（通知发布到回复已读的分钟数）\n\n"
+            total = QuantileSketch()
+            for group_id in group_ids:
+                weeks = sorted(week for gid, week in sketches if gid == group_id)
+                
+                group_total = QuantileSketch()
+                result += f"【{self._get_group_name(group_id)}】\n"
+                # 只显示最近4周
+                for week in weeks[-4:]:
+                    sketch = sketches[(group_id, week)]
+                    result += f"  {week}：{self._format_latency(sketch)}\n"
+                for week in weeks:
+                    group_total.merge(sketches[(group_id, week)])
+                result += f"  累计：{self._format_latency(group_total)}\n\n"
+                total.merge(group_total)
+            
+            if total.count == 0:
+                reply.content = "暂无阅读速度数据。\n发布通知后，同学回复已读的耗时会计入统计。"
+            else:
+                if len(group_ids) > 1:
+                    result += f"全部群组：{self._format_latency(total)}\n"
+                reply.content = result.strip()
+        except Exception as e:
+            logger.error(f"[donotlazy] 阅读速度统计异常：{e}")
+            logger.exception(e)
+            reply.content = f"统计失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _format_latency(self, sketch):
+        """格式化草图的已读人次、中位数和P90"""
+        if sketch.count == 0:
+            return "暂无数据"
+        return f"{sketch.count}人次，中位数 {sketch.quantile(0.5):.1f}分钟，P90 {sketch.quantile(0.9):.1f}分钟"
+    
+    def _handle_query_student(self, e_context, msg, args):
+        """查询单个同学在各群各日期的已读记录"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            parts = args.split()
+            if not parts:
+                reply.content = "请指定要查询的同学。格式：查询同学 姓名，比如「查询同学 同学1」"
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+            
+            # 最后一个参数为数字时作为页码
+            page = 1
+            if len(parts) > 1 and parts[-1].isdigit():
+                page = int(parts[-1])
+                parts = parts[:-1]
+            input_name = " ".join(parts)
+            student_name = self._resolve_student_name(input_name)
+            
+            # 使用覆盖索引 idx_read_records_student_history，一次索引范围扫描即可
+            if e_context["context"]["isgroup"]:
+                with self._connect_group(msg.other_user_id) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT create_date, group_id, read_time
+                        FROM read_records
+                        WHERE student_name = ? AND group_id = ?
+                        ORDER BY create_date DESC
+                    ''', (student_name, msg.other_user_id))
+                    records = cursor.fetchall()
+            else:
+                shard_records = self._fan_out(lambda conn: conn.execute('''
+                    SELECT create_date, group_id, read_time
+                    FROM read_records
+                    WHERE student_name = ?
+                    ORDER BY create_date DESC
+                ''', (student_name,)).fetchall())
+                records = list(heapq.merge(*shard_records, key=lambda record: record[0], reverse=True))
+            
+            if student_name in self.students:
+                name_display = f"{student_name}（学号：{self.students[student_name]}）"
+            else:
+                name_display = f"{student_name}(未在同学名单)"
+            
+            if not records:
+                reply.content = f"近{self.settings.max_record_days}天内没有 {name_display} 的已读记录。"
+            else:
+                lines = []
+                group_names = {}
+                for create_date, group_id, read_time in records:
+                    if group_id not in group_names:
+                        group_names[group_id] = self._get_group_name(group_id)
+                    lines.append(f"{create_date} [{group_names[group_id]}]（{read_time[11:]}）")
+                
+                header = f"{name_display} 的已读记录：\n共 {len(records)} 条，涉及 {len({r[0] for r in records})} 天\n"
+                reply.content = self._render_page(header, lines, page, f"查询同学 {input_name}")
+        except Exception as e:
+            logger.error(f"[donotlazy] 查询同学异常：{e}")
+            logger.exception(e)
+            reply.content = f"查询失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _render_page(self, header, lines, page, command, page_size=20):
+        """分页渲染编号列表，超过一页时提示翻页命令"""
+        total_pages = max((len(lines) + page_size - 1) // page_size, 1)
+        page = min(max(page, 1), total_pages)
+        start = (page - 1) * page_size
+        
+        result = header + "\n"
+        for i, line in enumerate(lines[start:start + page_size], start + 1):
+            result += f"{i}. {line}\n"
+        
+        if total_pages > 1:
+            result += f"\n第 {page}/{total_pages} 页"
+            if page < total_pages:
+                result += f"，发送「{command} {page + 1}」查看下一页"
+        return result.strip()
+    
+    def _handle_read_ranking(self, e_context, msg, args):
+        """本月阅读排行"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            page = int(args) if args.isdigit() else 1
+            now = datetime.now()
+            month = now.strftime('%Y-%m')
+            
+            with self._connect() as conn:
                 cursor = conn.cursor()
-                # 使用LIKE进行模糊匹配
+                # 按 (month, read_days) 索引有序读取排行，只按索引列排序，不需要额外的排序步骤
                 cursor.execute('''
-                    SELECT DISTINCT group_id, other_user_nickname
-                    FROM message_records 
-                    WHERE other_user_nickname LIKE ?
-                    ORDER BY create_time DESC
-                ''', (f'%{group_name}%',))
+                    SELECT m.student_id, m.read_days, s.current_streak, s.last_read_date
+                    FROM student_monthly_stats m
+                    LEFT JOIN student_stats s ON s.student_id = m.student_id
+                    WHERE m.month = ? AND m.read_days > 0
+                    ORDER BY m.read_days DESC
+                ''', (month,))
+                rankings = cursor.fetchall()
+                
+                # 本月的有效日期数，以及用于判断连续记录是否中断的最近两个有效日期
+                cursor.execute('''
+                    SELECT COUNT(*) FROM read_days
+                    WHERE create_date BETWEEN ? AND ?
+                ''', (f"{month}-01", f"{month}-31"))
+                month_days = cursor.fetchone()[0]
+                cursor.execute("SELECT create_date FROM read_days ORDER BY create_date DESC LIMIT 2")
+                recent_days = [row[0] for row in cursor.fetchall()]
+            
+            if not rankings:
+                reply.content = f"本月（{month}）还没有已读记录。"
+            else:
+                # 最近一个有效日期是今天时，截至昨天的连续记录仍然有效
+                valid_dates = set(recent_days[:1])
+                if recent_days and recent_days[0] == now.strftime('%Y-%m-%d'):
+                    valid_dates.update(recent_days[1:2])
                 
-                matched_groups = cursor.fetchall()
+                roster = self.students
+                lines = []
+                for student_id, read_days, current_streak, last_read_date in rankings:
+                    student_name = roster.names_by_id.get(student_id)
+                    if student_name is None:
+                        continue
+                    streak = current_streak if last_read_date in valid_dates else 0
+                    rate = read_days * 100 // month_days if month_days else 0
+                    lines.append(f"{student_name}：已读 {read_days}天（{rate}%），连续 {streak}天")
                 
-                if matched_groups:
-                    # 返回匹配到的群组ID和名称列表
-                    return [(group_id, name) for group_id, name in matched_groups]
-                else:
-                    return []
+                unread_count = len(roster) - len(lines)
+                header = f"本月（{month}）阅读排行，本月共 {month_days} 个有已读记录的日期："
+                if unread_count > 0:
+                    header += f"\n本月尚无已读记录：{unread_count}人"
+                reply.content = self._render_page(header + "\n", lines, page, "阅读排行")
+        except Exception as e:
+            logger.error(f"[donotlazy] 阅读排行异常：{e}")
+            logger.exception(e)
+            reply.content = f"获取阅读排行失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _invalidate_reports(self):
+        """数据或名单变化后使报表缓存失效"""
+        self.data_version += 1
+        self.report_cache = {}
+    
+    def current_data_version(self):
+        """当前的数据版本，用作报表和HTTP响应缓存的键
+        
+        由本进程的版本号和每个数据库文件的PRAGMA data_version组成。同一连接读取的data_version在
+        其他连接提交写入后就会变化，因此其他进程的写入、过期清理、补录和溢出日志重放都会使版本变化。
+        """
+        with self.version_lock:
+            versions = [self.data_version]
+            for path in self._database_files():
+                conn = self.version_connections.get(path)
+                if conn is None:
+                    conn = self.version_connections[path] = sqlite3.connect(path, check_same_thread=False)
+                versions.append(conn.execute("PRAGMA data_version").fetchone()[0])
+            return tuple(versions)
+    
+    def _handle_weekly_stats(self, e_context, msg):
+        """本周统计：学生 × 日期 的已读率矩阵报表"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            now = datetime.now()
+            week_start = (now - timedelta(days=now.weekday())).strftime('%Y-%m-%d')
+            today = now.strftime('%Y-%m-%d')
+            group_id = msg.other_user_id if e_context["context"]["isgroup"] else None
+            
+            # 数据没有变化时直接返回缓存的报表
+            roster = self.students
+            cache_key = ("weekly", group_id, today, self.current_data_version(), roster.version)
+            if cache_key in self.report_cache:
+                reply.content = self.report_cache[cache_key]
+                e_context["reply"] = reply
+                e_context.action = EventAction.BREAK_PASS
+                return
+            
+            # 一次性读取本周已读记录，群聊中只读该群所在的分片，私聊中各分片并行读取后合并
+            if group_id:
+                with self._connect_group(group_id) as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        SELECT student_name, create_date
+                        FROM read_records
+                        WHERE group_id = ? AND create_date BETWEEN ? AND ? AND student_id IS NOT NULL
+                    ''', (group_id, week_start, today))
+                    reads = cursor.fetchall()
+            else:
+                shard_reads = self._fan_out(lambda conn: conn.execute('''
+                    SELECT student_name, create_date
+                    FROM read_records
+                    WHERE create_date BETWEEN ? AND ? AND student_id IS NOT NULL
+                ''', (week_start, today)).fetchall())
+                reads = [read for rows in shard_reads for read in rows]
+            
+            dates = [(now - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(now.weekday(), -1, -1)]
+            matrix = ReadMatrix.build(roster.order, dates, reads)
+            row_totals = matrix.row_totals()
+            col_totals = matrix.col_totals()
+            active_days = sum(1 for total in col_totals if total > 0)
+            student_count = len(matrix.student_names)
+            
+            scope = self._get_group_name(group_id) if group_id else "全部群组"
+            result = f"本周统计（{week_start} ~ {today}，{scope}）\n"
+            result += f"名单 {student_count} 人，有已读记录 {active_days} 天\n\n"
+            
+            weekday_names = ["周一", "周二", "周三", "周四", "周五", "周六", "周日"]
+            result += "每日已读率：\n"
+            for i, (date, total) in enumerate(zip(dates, col_totals)):
+                rate = total * 100 // student_count if student_count else 0
+                result += f"  {date[5:]} {weekday_names[i]}：{total}/{student_count}（{rate}%）\n"
+            
+            if active_days:
+                result += "\n已读率分布：\n"
+                for label, count in matrix.rate_distribution(active_days).items():
+                    result += f"  {label}：{count}人\n"
+                
+                # 已读天数最少的同学，按名单顺序取前10个
+                lowest = sorted(zip(row_totals, range(student_count)))[:10]
+                lowest = [(total, i) for total, i in lowest if total < active_days]
+                if lowest:
+                    result += "\n已读天数最少的同学：\n"
+                    for rank, (total, i) in enumerate(lowest, 1):
+                        result += f"  {rank}. {matrix.student_names[i]}：{total}/{active_days}天\n"
+            
+            reply.content = result.strip()
+            # 其他进程写入后旧版本的缓存项不会再命中，数据版本变化后整体清空
+            if any(key[3] != cache_key[3] for key in self.report_cache):
+                self.report_cache = {}
+            self.report_cache[cache_key] = reply.content
+        except Exception as e:
+            logger.error(f"[donotlazy] 本周统计异常：{e}")
+            logger.exception(e)
+            reply.content = f"统计失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _handle_query_new_reads(self, e_context, msg):
+        """新增已读：只返回上次查看之后新增的已读记录"""
+        reply = Reply()
+        reply.type = ReplyType.TEXT
+        
+        try:
+            now = datetime.now()
+            today = now.strftime('%Y-%m-%d')
+            requester = getattr(msg, "actual_user_id", None) or getattr(msg, "from_user_id", "")
+            # 私聊中查看所有群组，水位线按"*"记录
+            group_id = msg.other_user_id if e_context["context"]["isgroup"] else "*"
+            
+            check_time = now.strftime('%Y-%m-%d %H:%M:%S')
+            if group_id != "*":
+                with self._connect_group(group_id) as conn:
+                    records, last_check_time = self._advance_watermark(conn, requester, group_id, today, check_time)
+            else:
+                # 记录ID在各分片中独立分配，每个分片保存各自的"*"水位线，合并后按已读时间排序
+                results = self._fan_out(
+                    lambda conn: self._advance_watermark(conn, requester, group_id, today, check_time), readonly=False)
+                records = sorted((record for shard_records, _ in results for record in shard_records), key=lambda record: record[3])
+                last_check_time = max((check for _, check in results if check), default=None)
+            
+            since = f"上次查看（{last_check_time[11:16]}）" if last_check_time else "今日"
+            if not records:
+                reply.content = f"自{since}以来没有新增已读。"
+            else:
+                result = f"自{since}以来新增已读 {len(records)} 人：\n"
+                for i, (_, name, student_id, read_time, record_group_id) in enumerate(records):
+                    name_display = name if student_id else f"{name}(未在同学名单)"
+                    if group_id == "*":
+                        name_display += f" [{self._get_group_name(record_group_id)}]"
+                    result += f"{i+1}. {name_display}（{read_time[11:]}）\n"
+                reply.content = result.strip()
+        except Exception as e:
+            logger.error(f"[donotlazy] 查询新增已读异常：{e}")
+            logger.exception(e)
+            reply.content = f"查询失败：{str(e)}"
+        
+        e_context["reply"] = reply
+        e_context.action = EventAction.BREAK_PASS
+    
+    def _advance_watermark(self, conn, requester, group_id, today, check_time):
+        """在一个分片中读取水位线之后新增的已读记录并推进水位线，返回 (新增记录, 上次查看时间)"""
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT last_id, check_time
+            FROM read_watermarks
+            WHERE requester = ? AND group_id = ? AND create_date = ?
+        ''', (requester, group_id, today))
+        row = cursor.fetchone()
+        last_id, last_check_time = row if row else (0, None)
+        
+        # 索引末尾隐含rowid，id > ? 是一次索引范围定位
+        if group_id != "*":
+            cursor.execute('''
+                SELECT id, student_name, student_id, read_time, group_id
+                FROM read_records
+                WHERE group_id = ? AND create_date = ? AND id > ?
+                ORDER BY id ASC
+            ''', (group_id, today, last_id))
+        else:
+            cursor.execute('''
+                SELECT id, student_name, student_id, read_time, group_id
+                FROM read_records
+                WHERE create_date = ? AND id > ?
+                ORDER BY id ASC
+            ''', (today, last_id))
+        records = cursor.fetchall()
+        
+        if records:
+            last_id = records[-1][0]
+        cursor.execute('''
+            INSERT OR REPLACE INTO read_watermarks (requester, group_id, create_date, last_id, check_time)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (requester, group_id, today, last_id, check_time))
+        conn.commit()
+        return records, last_check_time
+    
+    def _find_group_by_name(self, group_name):
+        """根据群名称查找对应的群ID"""
+        try:
+            # 使用LIKE进行模糊匹配，群组分散在各分片中，合并时去掉重复项
+            shard_groups = self._fan_out(lambda conn: conn.execute('''
+                SELECT DISTINCT group_id, other_user_nickname
+                FROM message_records 
+                WHERE other_user_nickname LIKE ?
+                ORDER BY create_time DESC
+            ''', (f'%{group_name}%',)).fetchall())
+            
+            matched_groups = list(dict.fromkeys(group for groups in shard_groups for group in groups))
+            
+            if matched_groups:
+                # 返回匹配到的群组ID和名称列表
+                return [(group_id, name) for group_id, name in matched_groups]
+            else:
+                return []
         except Exception as e:
             logger.error(f"[donotlazy] 根据群名称查找群ID异常：{e}")
             logger.exception(e)
             return []
     
-    def _process_non_text_message(self, msg):
-        """处理非文本消息，如视频消息等"""
+    def _process_non_text_message(self, msg, deadline):
+        """处理非文本消息，如视频消息等，deadline为整条消息写入数据库的截止时间"""
         try:
             msg_type = getattr(msg, "msg_type", "unknown")
             sender_name = getattr(msg, "actual_user_nickname", "unknown")
@@ -1476,57 +4609,24 @@ class DoNotLazy(Plugin):
                 return
                 
             # 如果白名单不为空，且当前群组不在白名单中，则不处理
-            if self.white_group_list and msg.other_user_id not in self.white_group_list:
+            if not self._is_group_allowed(msg.other_user_id):
                 logger.info(f"[donotlazy] 群组 {msg.other_user_id} 不在白名单中，跳过处理")
                 return
                 
-            # 自动清理过期数据
-            self._clean_expired_records()
-            
             # 记录非文本消息
             group_id = msg.other_user_id
             
-            # 记录消息到数据库
-            try:
-                with sqlite3.connect(self.db_path) as conn:
-                    cursor = conn.cursor()
-                    now = datetime.now()
-                    time_str = now.strftime('%Y-%m-%d %H:%M:%S')
-                    date_str = now.strftime('%Y-%m-%d')
-                    
-                    # 构建消息内容
-                    if msg_type == 43:
-                        content = f"[视频消息]"
-                    elif msg_type == 3:
-                        content = f"[图片消息]"
-                    elif msg_type == 47:
-                        content = f"[表情消息]"
-                    elif msg_type == 49:
-                        content = f"[链接消息]"
-                    else:
-                        content = f"[未知类型消息: {msg_type}]"
-                    
-                    # 插入记录，包含群名称
-                    cursor.execute('''
-                        INSERT INTO message_records 
-                        (group_id, message_content, create_time, create_date, other_user_nickname)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (
-                        group_id,
-                        content,
-                        time_str,
-                        date_str,
-                        getattr(msg, 'other_user_nickname', '')
-                    ))
-                    conn.commit()
-                    logger.info(f"[donotlazy] 已记录非文本消息，群组: {group_id}, 发送者: {sender_name}, 类型: {content}")
-            except Exception as e:
-                logger.error(f"[donotlazy] 记录非文本消息异常: {e}")
-                logger.exception(e)
+            # 构建消息内容
+            content = NON_TEXT_LABELS.get(msg_type, f"[未知类型消息: {msg_type}]")
+            
+            # 插入记录，包含群名称
+            if self._record_message(group_id, content, getattr(msg, 'other_user_nickname', ''), deadline):
+                logger.info(f"[donotlazy] 已记录非文本消息，群组: {group_id}, 发送者: {sender_name}, 类型: {content}")
             
             # 记录发送者已读状态
+            student_name = self._resolve_sender(msg, deadline=deadline)
             logger.info(f"[donotlazy] 将非文本消息发送者 {sender_name} 标记为已读")
-            self._record_read_status(msg, sender_name)
+            self._record_read_status(msg, student_name, deadline)
             
         except Exception as e:
             logger.error(f"[donotlazy] 处理非文本消息异常: {e}")
@@ -0,0 +1,114 @@
+# encoding:utf-8
+
+import csv
+import json
+
+from .message_store import decode_content
+
+# 导出文件的列，CSV表头和JSONL的键都使用这些名称
+EXPORT_COLUMNS = ("create_date", "read_time", "group_id", "group_name", "student_name", "student_id", "nickname", "in_roster")
+
+# 导出群消息时的列，content为还原后的消息内容，message_storage为metadata时为空
+MESSAGE_COLUMNS = ("create_date", "create_time", "group_id", "group_name", "content", "content_hash", "content_size")
+
+
+def load_group_names(conn):
+    """读取每个群最近一次记录的群名称"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT group_id, other_user_nickname
+        FROM message_records
+        WHERE id IN (
+            SELECT MAX(id) FROM message_records
+            WHERE other_user_nickname IS NOT NULL
+            GROUP BY group_id
+        )
+    ''')
+    return dict(cursor.fetchall())
+
+
+def iter_read_records(conn, start_date, end_date, group_ids=None, roster=None, batch_size=1000):
+    """按日期范围和群组逐批读取已读记录，每次只在内存中保留一批
+    
+    按 (create_date, id) 顺序读取，可以直接走 create_date 索引而不需要排序；
+    roster 用于为尚未回填学号的记录补充学号。
+    """
+    group_names = load_group_names(conn)
+    sql = '''
+        SELECT create_date, read_time, group_id, student_name, student_id, nickname
+        FROM read_records
+        WHERE create_date BETWEEN ? AND ?
+    '''
+    params = [start_date, end_date]
+    if group_ids:
+        sql += f" AND group_id IN ({','.join('?' * len(group_ids))})"
+        params.extend(group_ids)
+    sql += " ORDER BY create_date, id"
+    
+    cursor = conn.cursor()
+    cursor.arraysize = batch_size
+    cursor.execute(sql, params)
+    while True:
+        batch = cursor.fetchmany()
+        if not batch:
+            break
+        for create_date, read_time, group_id, student_name, student_id, nickname in batch:
+            if not student_id and roster is not None:
+                student_id = roster.get(student_name)
+            yield (create_date, read_time, group_id, group_names.get(group_id, ""),
+                   student_name, student_id or "", nickname or student_name, bool(student_id))
+
+
+def iter_messages(conn, start_date, end_date, group_ids=None, batch_size=1000):
+    """按日期范围和群组逐批读取群消息，用于审计导出
+    
+    message_storage为dedup时内容按content_hash从message_contents读取，压缩保存的内容用decode_content还原；
+    按 (create_date, id) 顺序读取，可以直接走 create_date 索引。
+    """
+    sql = '''
+        SELECT m.create_date, m.create_time, m.group_id, m.other_user_nickname,
+               COALESCE(m.message_content, c.content), m.content_hash, m.content_size
+        FROM message_records m
+        LEFT JOIN message_contents c ON m.message_content IS NULL AND c.hash = m.content_hash
+        WHERE m.create_date BETWEEN ? AND ?
+    '''
+    params = [start_date, end_date]
+    if group_ids:
+        sql += f" AND m.group_id IN ({','.join('?' * len(group_ids))})"
+        params.extend(group_ids)
+    sql += " ORDER BY m.create_date, m.id"
+    
+    cursor = conn.cursor()
+    cursor.arraysize = batch_size
+    cursor.execute(sql, params)
+    while True:
+        batch = cursor.fetchmany()
+        if not batch:
+            break
+        for create_date, create_time, group_id, group_name, content, digest, size in batch:
+            yield (create_date, create_time, group_id, group_name or "",
+                   decode_content(content), digest or "", size)
+
+
+def write_csv(rows, f, columns=EXPORT_COLUMNS):
+    """以CSV格式写入导出行，返回写入的行数"""
+    writer = csv.writer(f)
+    writer.writerow(columns)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_jsonl(rows, f, columns=EXPORT_COLUMNS):
+    """以每行一个JSON对象的格式写入导出行，返回写入的行数"""
+    count = 0
+    for row in rows:
+        f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False))
+        f.write("\n")
+        count += 1
+    return count
+
+
+EXPORT_WRITERS = {"csv": write_csv, "jsonl": write_jsonl}
@@ -0,0 +1,140 @@
+# encoding:utf-8
+
+import hashlib
+import json
+import re
+import threading
+from collections import namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from common.log import logger
+
+# 一次请求的响应，body为编码后的JSON
+ApiResponse = namedtuple("ApiResponse", ["etag", "body"])
+
+
+class ApiError(Exception):
+    """请求参数错误或资源不存在，status为返回的HTTP状态码"""
+    
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(payload):
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return ApiResponse(etag='"' + hashlib.sha1(body).hexdigest()[:20] + '"', body=body)
+
+
+class StatsApi:
+    """只读统计接口：按路径分发到插件提供的数据方法，并按数据版本缓存响应
+    
+    已读名单和每日汇总只在插件的数据版本、名单版本变化后重新查询；数据版本取自数据库，其他进程的写入
+    也会使其变化。ETag取自响应内容，数据版本变化但内容未变时客户端仍会收到304。插件指标直接读取内存状态，不查询数据库。
+    """
+    
+    ROUTES = (
+        (re.compile(r"^/api/groups/(?P<group_id>[^/]+)/reads$"), "group_reads"),
+        (re.compile(r"^/api/summary$"), "daily_summary"),
+        (re.compile(r"^/api/metrics$"), "metrics"),
+    )
+    
+    def __init__(self, plugin):
+        self.plugin = plugin
+        self.lock = threading.Lock()
+        self.cache = {}
+    
+    def respond(self, path, query):
+        for pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                return getattr(self, name)(query, **{key: unquote(value) for key, value in match.groupdict().items()})
+        raise ApiError(404, f"未知的接口：{path}")
+    
+    @staticmethod
+    def _query_date(query):
+        value = query.get("date") or datetime.now().strftime('%Y-%m-%d')
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+        except ValueError:
+            raise ApiError(400, f"日期格式不正确：{value}，应为YYYY-MM-DD")
+    
+    def _cached(self, key, build):
+        """数据版本和名单版本都未变化时直接返回上次的响应"""
+        version = (self.plugin.current_data_version(), self.plugin.students.version)
+        with self.lock:
+            cached = self.cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        response = _encode(build())
+        with self.lock:
+            # 旧版本的缓存项不会再命中，版本变化后整体清空
+            if any(entry[0] != version for entry in self.cache.values()):
+                self.cache = {}
+            self.cache[key] = (version, response)
+        return response
+    
+    def group_reads(self, query, group_id):
+        date = self._query_date(query)
+        return self._cached(("reads", group_id, date), lambda: self.plugin.group_read_status(group_id, date))
+    
+    def daily_summary(self, query):
+        date = self._query_date(query)
+        return self._cached(("summary", date), lambda: self.plugin.daily_summary(date))
+    
+    def metrics(self, query):
+        return _encode(self.plugin.metrics())
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_version = "donotlazy"
+    
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            response = self.server.api.respond(url.path, query)
+        except ApiError as e:
+            self._send_error(e.status, str(e))
+            return
+        except Exception as e:
+            logger.error(f"[donotlazy] HTTP接口异常：{e}")
+            logger.exception(e)
+            self._send_error(500, str(e))
+            return
+        
+        if_none_match = self.headers.get("If-None-Match", "")
+        if response.etag in (tag.strip() for tag in if_none_match.split(",")):
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(response.body)))
+        self.send_header("ETag", response.etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(response.body)
+    
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        logger.debug(f"[donotlazy] HTTP {self.address_string()} {format % args}")
+
+
+def start_server(api, host, port):
+    """在后台线程中启动HTTP服务，返回服务对象"""
+    server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+    server.daemon_threads = True
+    server.api = api
+    threading.Thread(target=server.serve_forever, name="donotlazy-http", daemon=True).start()
+    return server
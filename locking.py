@@ -0,0 +1,85 @@
+# encoding:utf-8
+
+import os
+import random
+import sqlite3
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# 数据库忙时的重试次数和退避时间（秒），每次等待在 [0, 上限] 之间随机，上限按次数翻倍
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+BUSY_BACKOFF_MAX = 2.0
+
+
+def is_busy_error(error):
+    """判断是否为其他连接或进程持有锁导致的错误（SQLITE_BUSY / SQLITE_LOCKED）"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_on_busy(func, *args, **kwargs):
+    """执行func，数据库忙时按带随机抖动的指数退避重试，func应是一个完整的事务"""
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if attempt == BUSY_RETRIES or not is_busy_error(e):
+                raise
+            time.sleep(random.uniform(0, min(BUSY_BACKOFF * 2 ** attempt, BUSY_BACKOFF_MAX)))
+
+
+class LeaderLock:
+    """基于文件锁的主进程选举：多个进程共用一个数据库时，只有持有锁的进程执行清理和维护任务
+    
+    锁在进程退出时由操作系统释放，其他进程之后调用 acquire() 即可接替。
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+    
+    @property
+    def is_leader(self):
+        return self.file is not None
+    
+    def acquire(self):
+        """尝试以非阻塞方式获取锁，返回当前进程是否为主进程"""
+        if self.file is not None:
+            return True
+        f = open(self.path, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self.file = f
+        return True
+    
+    def release(self):
+        if self.file is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
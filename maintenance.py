@@ -0,0 +1,60 @@
+# encoding:utf-8
+
+# PRAGMA auto_vacuum 的取值：0 NONE，1 FULL，2 INCREMENTAL
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def freelist_count(conn):
+    """数据库中空闲页的数量"""
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+def enable_incremental_vacuum(conn):
+    """将数据库切换为增量清理模式，返回是否执行了转换
+    
+    新建的数据库在建表前设置即可生效；已有数据库需要执行一次VACUUM才能切换，
+    VACUUM期间会锁住整个数据库，应在空闲时段调用。
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def incremental_vacuum(conn, pages):
+    """最多回收pages个空闲页并缩小文件，返回实际回收的页数"""
+    before = freelist_count(conn)
+    if not before:
+        return 0
+    # incremental_vacuum每执行一步只回收一页，通过executescript执行到结束
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    return before - freelist_count(conn)
+
+
+def optimize(conn):
+    """更新查询优化器使用的统计信息：从未分析过时执行完整的ANALYZE，之后由PRAGMA optimize按需分析"""
+    analyzed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if analyzed:
+        conn.execute("PRAGMA optimize").fetchall()
+    else:
+        conn.execute("ANALYZE")
+
+
+def delete_expired_records(cursor, expire_date):
+    """在当前事务中删除create_date早于expire_date的已读记录、查看水位线和消息记录，返回删除的消息记录数"""
+    cursor.execute("DELETE FROM read_records WHERE create_date < ?", (expire_date,))
+    cursor.execute("DELETE FROM read_watermarks WHERE create_date < ?", (expire_date,))
+    cursor.execute("DELETE FROM message_records WHERE create_date < ?", (expire_date,))
+    return cursor.rowcount
+
+
+def delete_unreferenced_contents(cursor):
+    """删除不再被任何消息记录引用的消息内容"""
+    cursor.execute('''
+        DELETE FROM message_contents
+        WHERE hash NOT IN (
+            SELECT content_hash FROM message_records
+            WHERE content_hash IS NOT NULL
+        )
+    ''')
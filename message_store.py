@@ -0,0 +1,32 @@
+# encoding:utf-8
+
+import hashlib
+import zlib
+
+# 群消息内容的存储模式：
+# full     - 内容保存在message_records中（默认，与旧版本一致）
+# metadata - 只保存群组、时间、群名称等元数据和内容哈希，不保存内容
+# dedup    - 内容按哈希去重保存在message_contents中，message_records只保存哈希
+STORAGE_MODES = ("full", "metadata", "dedup")
+
+
+def content_hash(content):
+    """内容的SHA-1哈希，用于去重和判断消息是否已存在"""
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def encode_content(content, compress_threshold):
+    """超过阈值（字节）的内容用zlib压缩后以BLOB保存，否则原样保存为文本，阈值为0时不压缩"""
+    data = content.encode("utf-8")
+    if compress_threshold and len(data) > compress_threshold:
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return compressed
+    return content
+
+
+def decode_content(value):
+    """还原encode_content保存的内容"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode("utf-8")
+    return value
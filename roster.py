@@ -0,0 +1,148 @@
+# encoding:utf-8
+
+import unicodedata
+from collections.abc import Mapping
+from types import MappingProxyType
+
+# 家长常用的昵称后缀，按长度从长到短排列，保证优先匹配更长的后缀
+PARENT_SUFFIXES = (
+    "的妈妈", "的爸爸", "的家长",
+    "妈妈", "爸爸", "家长", "爷爷", "奶奶", "外公", "外婆", "姥姥", "姥爷",
+)
+
+# 单字称谓容易误伤以这些字结尾的昵称，只在去除后唯一匹配名单时使用，见resolve_name
+SHORT_PARENT_SUFFIXES = ("妈", "爸")
+
+# 需要剔除的Unicode字符类别：空白(Z)、控制/格式(C)、符号及emoji(S)、标点(P)
+_STRIP_CATEGORIES = ("Z", "C", "S", "P")
+
+# emoji变体选择符（属于组合字符类别，需要单独剔除）
+_STRIP_CHARS = {"\ufe0e", "\ufe0f"}
+
+
+def normalize_name(name):
+    """归一化昵称：全角转半角、去除空白/emoji/标点并统一大小写"""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKC", str(name))
+    chars = []
+    for ch in text:
+        if ch in _STRIP_CHARS:
+            continue
+        if unicodedata.category(ch)[0] in _STRIP_CATEGORIES:
+            continue
+        chars.append(ch)
+    return "".join(chars).lower()
+
+
+def strip_parent_suffix(key):
+    """去除归一化昵称末尾的家长称谓，如"张三妈妈" -> "张三" """
+    for suffix in PARENT_SUFFIXES:
+        if key.endswith(suffix) and len(key) > len(suffix):
+            return key[:-len(suffix)]
+    return key
+
+
+def build_name_index(student_names, aliases=None):
+    """构建 归一化昵称 -> 学生姓名 的哈希索引
+    
+    多个学生归一化后冲突的键不会进入索引，避免误匹配；
+    别名表优先级高于学生名单本身的归一化结果。
+    """
+    index = {}
+    conflicts = set()
+    for name in student_names:
+        key = normalize_name(name)
+        if not key:
+            continue
+        if key in index and index[key] != name:
+            conflicts.add(key)
+        else:
+            index[key] = name
+    for key in conflicts:
+        index.pop(key, None)
+    
+    for alias, student_name in (aliases or {}).items():
+        key = normalize_name(alias)
+        if key:
+            index[key] = student_name
+    return index, conflicts
+
+
+def resolve_name(nickname, students, name_index):
+    """将昵称解析为学生名单中的姓名，无法解析时返回None
+    
+    依次尝试：精确匹配、归一化匹配、去除家长称谓后匹配，每一步都是一次字典查找。
+    """
+    if not nickname:
+        return None
+    if nickname in students:
+        return nickname
+    key = normalize_name(nickname)
+    if not key:
+        return None
+    name = name_index.get(key)
+    if name:
+        return name
+    stripped = strip_parent_suffix(key)
+    if stripped != key:
+        return name_index.get(stripped)
+    return _strip_short_suffix(key, name_index)
+
+
+def _strip_short_suffix(key, name_index):
+    """去除单字称谓后匹配，如"张三妈" -> "张三"
+    
+    只有去除后的键在索引中、且没有其他键以它开头时才采用：名单中同时有"陈一"和"陈一博"时，
+    "陈一爸"可能是陈一博的家长，不做猜测。这一步需要遍历索引，只在前面的查找都失败时执行。
+    """
+    if not key.endswith(SHORT_PARENT_SUFFIXES) or len(key) < 3:
+        return None
+    stripped = key[:-1]
+    name = name_index.get(stripped)
+    if not name:
+        return None
+    if any(other != stripped and other.startswith(stripped) for other in name_index):
+        return None
+    return name
+
+
+def student_id_key(student_id):
+    """学号排序键：纯数字学号按数值排序并排在其他学号之前"""
+    text = str(student_id)
+    return (0, int(text), text) if text.isdigit() else (1, 0, text)
+
+
+class Roster(Mapping):
+    """不可变的学生名单快照，按 姓名 -> 学号 的映射使用
+    
+    构建时预先计算姓名集合、按学号排序的展示顺序、姓名在展示顺序中的位置和 学号 -> 姓名 的映射，
+    报表和昵称匹配共用这些视图；按学号保存的统计通过names_by_id显示当前姓名。名单每次重新加载都生成新快照并递增版本号，
+    版本号可以作为报表缓存键的一部分。
+    """
+    
+    def __init__(self, students=None, version=0):
+        ids = dict(students or {})
+        self.version = version
+        self.ids = MappingProxyType(ids)
+        self.names = frozenset(ids)
+        self.order = tuple(sorted(ids, key=lambda name: student_id_key(ids[name])))
+        self.positions = MappingProxyType({name: i for i, name in enumerate(self.order)})
+        # 数据库中的学号为文本，统一按字符串查找
+        self.names_by_id = MappingProxyType({str(student_id): name for name, student_id in ids.items()})
+    
+    def __getitem__(self, name):
+        return self.ids[name]
+    
+    def __iter__(self):
+        return iter(self.ids)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, name):
+        return name in self.names
+    
+    def replace(self, students):
+        """返回新名单的快照，版本号加一"""
+        return Roster(students, self.version + 1)
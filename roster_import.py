@@ -0,0 +1,202 @@
+# encoding:utf-8
+
+import codecs
+import csv
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+# 表头别名，表头先去除空白并转为小写再匹配
+NAME_HEADERS = ("姓名", "学生姓名", "学生", "name", "student_name")
+ID_HEADERS = ("学号", "学籍号", "编号", "id", "student_id")
+CLASS_HEADERS = ("班级", "班别", "class", "class_name")
+
+_XLSX_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+
+class RosterImportError(Exception):
+    """名单文件无法导入（格式不支持、缺少姓名/学号列等）"""
+
+
+def _detect_encoding(path):
+    """根据文件开头判断CSV编码：UTF-8（含BOM）或Excel常用的GBK"""
+    with open(path, "rb") as f:
+        head = f.read(65536)
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8-sig"
+    except UnicodeDecodeError:
+        return "gbk"
+
+
+def iter_csv_rows(path):
+    """逐行读取CSV文件，每行返回字符串列表"""
+    with open(path, "r", encoding=_detect_encoding(path), newline="") as f:
+        for row in csv.reader(f):
+            yield row
+
+
+def _column_index(ref):
+    """将单元格引用中的列字母转换为从0开始的列号，如 'C12' -> 2"""
+    index = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        index = index * 26 + ord(ch.upper()) - ord("A") + 1
+    return index - 1
+
+
+def _first_sheet_path(archive):
+    """通过workbook.xml及其关系文件找到第一个工作表在压缩包中的路径"""
+    try:
+        workbook = ET.fromstring(archive.read("xl/workbook.xml"))
+        rels = ET.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        sheet = workbook.find(f"{_XLSX_NS}sheets/{_XLSX_NS}sheet")
+        rel_id = sheet.get(f"{_REL_NS}id")
+        for rel in rels.iter(f"{_PKG_REL_NS}Relationship"):
+            if rel.get("Id") == rel_id:
+                target = rel.get("Target").lstrip("/")
+                return target if target.startswith("xl/") else f"xl/{target}"
+    except (KeyError, AttributeError, ET.ParseError):
+        pass
+    return "xl/worksheets/sheet1.xml"
+
+
+def _load_shared_strings(archive):
+    """读取共享字符串表，单元格中的文本通过下标引用这张表"""
+    try:
+        source = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, elem in ET.iterparse(source):
+            if elem.tag == f"{_XLSX_NS}si":
+                strings.append("".join(text.text or "" for text in elem.iter(f"{_XLSX_NS}t")))
+                elem.clear()
+    return strings
+
+
+def _cell_value(cell, shared_strings):
+    cell_type = cell.get("t")
+    if cell_type == "inlineStr":
+        return "".join(text.text or "" for text in cell.iter(f"{_XLSX_NS}t"))
+    value = cell.findtext(f"{_XLSX_NS}v") or ""
+    if cell_type == "s" and value:
+        return shared_strings[int(value)]
+    # 数字格式的学号会被Excel保存为"12.0"这样的形式
+    if cell_type in (None, "n") and re.fullmatch(r"\d+\.0+", value):
+        return value.split(".")[0]
+    return value
+
+
+def iter_xlsx_rows(path):
+    """逐行读取XLSX文件第一个工作表，只用标准库解析压缩包中的XML，读完的行立即释放"""
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise RosterImportError("文件不是有效的XLSX文件")
+    with archive:
+        shared_strings = _load_shared_strings(archive)
+        with archive.open(_first_sheet_path(archive)) as source:
+            for _, elem in ET.iterparse(source):
+                if elem.tag != f"{_XLSX_NS}row":
+                    continue
+                row = []
+                for cell in elem.iter(f"{_XLSX_NS}c"):
+                    ref = cell.get("r")
+                    index = _column_index(ref) if ref else len(row)
+                    row.extend([""] * (index - len(row)))
+                    row.append(_cell_value(cell, shared_strings))
+                elem.clear()
+                yield row
+
+
+def iter_rows(path):
+    """根据扩展名选择CSV或XLSX读取方式"""
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension == "csv":
+        return iter_csv_rows(path)
+    if extension == "xlsx":
+        return iter_xlsx_rows(path)
+    raise RosterImportError(f"不支持的文件格式：.{extension}，仅支持CSV和XLSX")
+
+
+def _find_column(header, aliases):
+    for i, title in enumerate(header):
+        if "".join(str(title).split()).lower() in aliases:
+            return i
+    return None
+
+
+def _class_matches(value, class_name):
+    """班级列与配置的班级名称匹配，如"三年级3班"匹配"3班"，但"13班"不匹配"""
+    value = "".join(value.split())
+    if not class_name or value == class_name:
+        return True
+    return value.endswith(class_name) and not (class_name[0].isdigit() and value[-len(class_name) - 1].isdigit())
+
+
+class RosterImport:
+    """流式导入名单：逐行校验并汇总为 姓名 -> 学号 的映射
+    
+    第一行非空行作为表头，按表头别名识别姓名、学号和班级列；有班级列时只导入
+    与 class_name 匹配的行。同一学号对应不同姓名、同一姓名对应不同学号都记为冲突，
+    存在冲突时调用方不应写入名单。
+    """
+    
+    def __init__(self, class_name=None, progress=None, progress_every=1000):
+        self.class_name = class_name
+        self.progress = progress
+        self.progress_every = progress_every
+        self.students = {}
+        self.classes = {}
+        self.rows = 0
+        self.skipped = 0
+        self.other_class = 0
+        self.duplicates = 0
+        self.conflicts = []
+    
+    def run(self, rows):
+        rows = iter(rows)
+        header = next((row for row in rows if any(str(cell).strip() for cell in row)), None)
+        if header is None:
+            raise RosterImportError("文件中没有数据")
+        name_col = _find_column(header, NAME_HEADERS)
+        id_col = _find_column(header, ID_HEADERS)
+        class_col = _find_column(header, CLASS_HEADERS)
+        if name_col is None or id_col is None:
+            raise RosterImportError(f"表头中未找到姓名列或学号列，表头为：{header}")
+        
+        ids = {}
+        for row in rows:
+            self.rows += 1
+            if self.progress and self.rows % self.progress_every == 0:
+                self.progress(self.rows)
+            
+            name = row[name_col].strip() if name_col < len(row) else ""
+            student_id = row[id_col].strip() if id_col < len(row) else ""
+            if not name or not student_id:
+                self.skipped += 1
+                continue
+            class_value = row[class_col].strip() if class_col is not None and class_col < len(row) else ""
+            if class_value and not _class_matches(class_value, self.class_name):
+                self.other_class += 1
+                continue
+            
+            if name in self.students:
+                if self.students[name] == student_id:
+                    self.duplicates += 1
+                else:
+                    self.conflicts.append(f"第{self.rows + 1}行：{name} 的学号 {student_id} 与之前的 {self.students[name]} 不同")
+                continue
+            if student_id in ids:
+                self.conflicts.append(f"第{self.rows + 1}行：学号 {student_id} 同时属于 {ids[student_id]} 和 {name}")
+                continue
+            self.students[name] = student_id
+            ids[student_id] = name
+            if class_value:
+                self.classes[name] = class_value
+        return self
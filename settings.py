@@ -0,0 +1,132 @@
+# encoding:utf-8
+
+from collections import namedtuple
+
+from .message_store import STORAGE_MODES
+
+# 默认配置，配置文件中缺少的项使用这里的值
+DEFAULT_CONFIG = {
+    "max_record_days": 7,
+    "read_keyword": "已读",
+    "class_name": "3班",
+    "student_file": "students.json",
+    "white_group_list": [],
+    "teacher_list": [],
+    "notice_min_length": 10,
+    "report_cache_minutes": 5,
+    "report_workers": 4,
+    "config_save_delay": 1,
+    "config_reload_interval": 5,
+    "message_storage": "full",
+    "message_compress_threshold": 0,
+    "message_quota_rows": 0,
+    "message_quota_bytes": 0,
+    "backup_interval_hours": 24,
+    "backup_keep": 7,
+    "backup_dir": "backups",
+    "maintenance_hours": [2, 3, 4, 5],
+    "maintenance_vacuum_pages": 1000,
+    "slow_query_ms": 0,
+    "slow_query_top": 20,
+    "http_host": "127.0.0.1",
+    "http_port": 0,
+    "db_busy_timeout": 10,
+    "spill_deadline": 2,
+    "db_shards": 1,
+}
+
+# 不可变的配置快照，消息处理时只读取一次引用，重新加载配置时整体替换
+Settings = namedtuple("Settings", [
+    "max_record_days",
+    "read_keyword",
+    "class_name",
+    "student_file",
+    "white_group_list",
+    "white_group_set",
+    "teacher_list",
+    "teacher_set",
+    "notice_min_length",
+    "report_cache_minutes",
+    "report_workers",
+    "config_save_delay",
+    "config_reload_interval",
+    "message_storage",
+    "message_compress_threshold",
+    "message_quota_rows",
+    "message_quota_bytes",
+    "backup_interval_hours",
+    "backup_keep",
+    "backup_dir",
+    "maintenance_hours",
+    "maintenance_vacuum_pages",
+    "slow_query_ms",
+    "slow_query_top",
+    "http_host",
+    "http_port",
+    "db_busy_timeout",
+    "spill_deadline",
+    "db_shards",
+])
+
+
+# 只能取固定几个值的配置项，配置为其他值时使用默认值
+CHOICES = {
+    "message_storage": STORAGE_MODES,
+}
+
+
+def invalid_options(config):
+    """返回配置中取值无效的项 [(配置项, 值, 可选值)]，build_settings对这些项使用默认值"""
+    config = config or {}
+    return [(key, config[key], choices) for key, choices in CHOICES.items()
+            if key in config and config[key] not in choices]
+
+
+def build_settings(config):
+    """根据配置字典构建配置快照，白名单和老师名单同时生成用于成员判断的集合
+    
+    取值无效的项使用默认值，见invalid_options。
+    """
+    values = dict(DEFAULT_CONFIG)
+    values.update({key: value for key, value in (config or {}).items() if key in DEFAULT_CONFIG})
+    for key, _, _ in invalid_options(config):
+        values[key] = DEFAULT_CONFIG[key]
+    white_group_list = tuple(dict.fromkeys(values["white_group_list"] or []))
+    teacher_list = tuple(values["teacher_list"] or [])
+    return Settings(
+        max_record_days=values["max_record_days"],
+        read_keyword=values["read_keyword"],
+        class_name=values["class_name"],
+        student_file=values["student_file"],
+        white_group_list=white_group_list,
+        white_group_set=frozenset(white_group_list),
+        teacher_list=teacher_list,
+        teacher_set=frozenset(teacher_list),
+        notice_min_length=values["notice_min_length"],
+        report_cache_minutes=values["report_cache_minutes"],
+        report_workers=values["report_workers"],
+        config_save_delay=values["config_save_delay"],
+        config_reload_interval=values["config_reload_interval"],
+        message_storage=values["message_storage"],
+        message_compress_threshold=values["message_compress_threshold"],
+        message_quota_rows=values["message_quota_rows"],
+        message_quota_bytes=values["message_quota_bytes"],
+        backup_interval_hours=values["backup_interval_hours"],
+        backup_keep=values["backup_keep"],
+        backup_dir=values["backup_dir"],
+        maintenance_hours=frozenset(values["maintenance_hours"] or []),
+        maintenance_vacuum_pages=values["maintenance_vacuum_pages"],
+        slow_query_ms=values["slow_query_ms"],
+        slow_query_top=values["slow_query_top"],
+        http_host=values["http_host"],
+        http_port=values["http_port"],
+        db_busy_timeout=values["db_busy_timeout"],
+        spill_deadline=values["spill_deadline"],
+        db_shards=values["db_shards"],
+    )
+
+
+def with_whitelist(settings, group_ids):
+    """返回替换了白名单的新快照"""
+    white_group_list = tuple(dict.fromkeys(group_ids))
+    return settings._replace(white_group_list=white_group_list, white_group_set=frozenset(white_group_list))
@@ -0,0 +1,95 @@
+# encoding:utf-8
+
+import os
+import zlib
+
+# 按群分片的表迁移时复制的列，自增id在目标分片中重新分配
+SHARDED_COLUMNS = {
+    "read_records": ("group_id", "student_name", "read_time", "create_date", "student_id", "nickname"),
+    "message_records": ("group_id", "message_content", "create_time", "create_date",
+                        "other_user_nickname", "content_hash", "content_size"),
+}
+
+# 按群保存、没有自增id的表，迁移时按主键合并
+SHARDED_SUMMARIES = ("notice_reads", "read_latency_bins")
+
+
+def shard_index(group_id, count):
+    """群ID对应的分片序号
+    
+    使用CRC32而不是内置hash：内置hash每次启动都会随机化，多个进程、重启前后必须得到相同的分片。
+    """
+    return zlib.crc32(str(group_id).encode("utf-8")) % count
+
+
+def shard_paths(directory, count):
+    """分片数为count时各分片的数据库文件，文件名包含分片数，调整分片数后新旧文件互不重叠"""
+    return [os.path.join(directory, f"{count}-{index}.db") for index in range(count)]
+
+
+def move_groups(conn, source, target, target_index, count, source_name):
+    """在当前事务中把source里属于target分片的群组数据移到target，返回移动的已读记录数
+    
+    source和target为连接中的数据库名（main或ATTACH的别名），两边都已建好分片表；source_name标识原文件。
+    WAL模式下跨文件的事务按数据库顺序逐个提交，应以target为main、附加source，提交时先写入target：
+    中途退出最多留下两边都有的数据，不会丢失。复制时在target的shard_moves中记录source_name，与数据一起提交，
+    重新执行时跳过复制、只删除原文件中的数据，消息记录不会重复，阅读耗时草图的计数也不会重复相加；
+    迁移全部完成后由调用方清空shard_moves。已读记录和通知已读另外按唯一键去重，阅读耗时草图的同一个桶合并时计数相加。
+    迁移的消息引用的消息内容一起复制，原文件中不再被引用的消息内容随后删除。
+    """
+    conn.create_function("shard_of", 1, lambda group_id: shard_index(group_id, count), deterministic=True)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {target}.shard_moves (source TEXT PRIMARY KEY)")
+    cursor.execute(f"SELECT 1 FROM {target}.shard_moves WHERE source = ?", (source_name,))
+    moved = 0
+    if not cursor.fetchone():
+        moved = _copy_groups(cursor, source, target, target_index)
+        cursor.execute(f"INSERT INTO {target}.shard_moves (source) VALUES (?)", (source_name,))
+    for table in (*SHARDED_COLUMNS, *SHARDED_SUMMARIES):
+        cursor.execute(f"DELETE FROM {source}.{table} WHERE shard_of(group_id) = ?", (target_index,))
+    cursor.execute(f'''
+        DELETE FROM {source}.message_contents
+        WHERE hash NOT IN (
+            SELECT content_hash FROM {source}.message_records
+            WHERE content_hash IS NOT NULL
+        )
+    ''')
+    return moved
+
+
+def _copy_groups(cursor, source, target, target_index):
+    """把source里属于target分片的群组数据复制到target，返回复制的已读记录数"""
+    moved = 0
+    for table, columns in SHARDED_COLUMNS.items():
+        column_list = ", ".join(columns)
+        ignore = "OR IGNORE " if table == "read_records" else ""
+        cursor.execute(f'''
+            INSERT {ignore}INTO {target}.{table} ({column_list})
+            SELECT {column_list} FROM {source}.{table}
+            WHERE shard_of(group_id) = ?
+            ORDER BY id
+        ''', (target_index,))
+        if table == "read_records":
+            moved = cursor.rowcount
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO {target}.message_contents (hash, content)
+        SELECT hash, content FROM {source}.message_contents
+        WHERE hash IN (
+            SELECT content_hash FROM {source}.message_records
+            WHERE shard_of(group_id) = ?
+        )
+    ''', (target_index,))
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO {target}.notice_reads
+        (notice_id, student_name, student_id, group_id, nickname, read_time)
+        SELECT notice_id, student_name, student_id, group_id, nickname, read_time
+        FROM {source}.notice_reads
+        WHERE shard_of(group_id) = ?
+    ''', (target_index,))
+    cursor.execute(f'''
+        INSERT INTO {target}.read_latency_bins (group_id, week, bin, count)
+        SELECT group_id, week, bin, count FROM {source}.read_latency_bins
+        WHERE shard_of(group_id) = ?
+        ON CONFLICT (group_id, week, bin) DO UPDATE SET count = count + excluded.count
+    ''', (target_index,))
+    return moved
@@ -0,0 +1,199 @@
+# encoding:utf-8
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import namedtuple
+
+from .locking import LeaderLock, is_busy_error
+
+# 一条待写入的已读，read_time为 '%Y-%m-%d %H:%M:%S' 格式，notice_id为已读时群内开启中的通知
+ReadEvent = namedtuple("ReadEvent", ["group_id", "student_name", "nickname", "read_time", "notice_id"])
+
+# 追加后最多经过多少秒执行一次fsync，期间的多次追加合并为一次
+SPILL_FSYNC_INTERVAL = 0.2
+
+_JOURNAL_NAME = re.compile(r"^reads-(\d+)\.jsonl(\.replay)?$")
+
+# 重放时因数据库忙以外的原因无法应用的已读移到这个文件，不再重放，等待人工处理
+QUARANTINE_NAME = "quarantine.jsonl"
+
+
+class SpillJournal:
+    """数据库暂时无法写入时保存已读的追加日志，每个进程一个文件
+    
+    文件为每行一条ReadEvent的JSON，写入后立即flush，fsync按SPILL_FSYNC_INTERVAL合并。
+    重放时先把日志改名为 .replay 再逐条应用，期间的新追加写入新的日志文件；数据库忙导致
+    应用失败时把未应用的部分写回 .replay，下次从那里继续，因此apply必须是幂等的。其他异常
+    （如约束或表结构错误）重试也不会成功，这条已读连同错误信息移到隔离文件，继续重放后面的
+    已读，避免一条坏数据挡住之后所有的重放。进程持有自己日志的文件锁，其他进程能拿到该锁
+    说明日志的进程已经退出，由拿到锁的进程接手重放。
+    """
+    
+    def __init__(self, directory, fsync_interval=SPILL_FSYNC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync_interval = fsync_interval
+        self.path = os.path.join(directory, f"reads-{os.getpid()}.jsonl")
+        self.quarantine_path = os.path.join(directory, QUARANTINE_NAME)
+        self.owner_lock = LeaderLock(self.path + ".lock")
+        self.owner_lock.acquire()
+        self._remove_stale_locks()
+        self.lock = threading.Lock()
+        self.replay_lock = threading.Lock()
+        self.file = None
+        self.last_sync = 0
+        self.sync_timer = None
+        self.pending = 0
+        # 本进程重放时移到隔离文件的条数
+        self.quarantined = 0
+    
+    def _remove_stale_locks(self):
+        """删除已退出且没有留下日志的进程的锁文件"""
+        pending = {pid for pid, _ in self._journals()}
+        for path in glob.glob(os.path.join(glob.escape(self.directory), "reads-*.jsonl.lock")):
+            match = _JOURNAL_NAME.match(os.path.basename(path)[:-len(".lock")])
+            if not match or path == self.owner_lock.path or int(match.group(1)) in pending:
+                continue
+            lock = LeaderLock(path)
+            if lock.acquire():
+                lock.release()
+                os.remove(path)
+    
+    def append(self, event):
+        line = json.dumps(event._asdict(), ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.file is None:
+                self.file = open(self.path, "a", encoding="utf-8")
+            self.file.write(line)
+            self.file.flush()
+            self.pending += 1
+            if time.monotonic() - self.last_sync >= self.fsync_interval:
+                self._sync()
+            elif self.sync_timer is None:
+                self.sync_timer = threading.Timer(self.fsync_interval, self._sync_later)
+                self.sync_timer.daemon = True
+                self.sync_timer.start()
+    
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.last_sync = time.monotonic()
+    
+    def _sync_later(self):
+        with self.lock:
+            self.sync_timer = None
+            if self.file is not None:
+                self._sync()
+    
+    def has_pending(self):
+        """目录中是否有待重放的日志（包括已退出进程留下的）"""
+        return bool(self._journals())
+    
+    def _journals(self):
+        journals = []
+        for path in glob.glob(os.path.join(glob.escape(self.directory), "reads-*.jsonl*")):
+            match = _JOURNAL_NAME.match(os.path.basename(path))
+            if match and os.path.getsize(path):
+                journals.append((int(match.group(1)), path))
+        return sorted(journals)
+    
+    def quarantined_events(self):
+        """隔离文件中的已读条数，包括其他进程隔离的"""
+        if not os.path.exists(self.quarantine_path):
+            return 0
+        with open(self.quarantine_path, "r", encoding="utf-8") as f:
+            return sum(1 for _ in f)
+    
+    def _quarantine(self, line, error):
+        """把无法应用的一行连同错误信息追加到隔离文件"""
+        record = {"event": json.loads(line), "error": f"{type(error).__name__}: {error}",
+                  "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        with open(self.quarantine_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.quarantined += 1
+    
+    def replay(self, apply):
+        """把所有待重放的日志逐条交给apply，返回应用的条数
+        
+        数据库忙时停止并保留未应用的部分，其他异常的已读移到隔离文件后继续。
+        """
+        with self.replay_lock:
+            applied = 0
+            own_pid = os.getpid()
+            for pid in sorted({pid for pid, _ in self._journals()}):
+                if pid == own_pid:
+                    applied += self._replay_own(apply)
+                else:
+                    applied += self._replay_orphan(pid, apply)
+            return applied
+    
+    def _replay_own(self, apply):
+        replay_path = self.path + ".replay"
+        applied = 0
+        # 上次未完成的部分先重放
+        if os.path.exists(replay_path):
+            applied += _replay_file(replay_path, apply, self._quarantine)
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+            if not os.path.exists(self.path):
+                self.pending = 0
+                return applied
+            os.replace(self.path, replay_path)
+            self.pending = 0
+        return applied + _replay_file(replay_path, apply, self._quarantine)
+    
+    def _replay_orphan(self, pid, apply):
+        """重放已退出进程留下的日志，进程仍在运行时跳过"""
+        base = os.path.join(self.directory, f"reads-{pid}.jsonl")
+        owner_lock = LeaderLock(base + ".lock")
+        if not owner_lock.acquire():
+            return 0
+        try:
+            applied = 0
+            for path in (base + ".replay", base):
+                if os.path.exists(path):
+                    applied += _replay_file(path, apply, self._quarantine)
+            return applied
+        finally:
+            owner_lock.release()
+            os.remove(base + ".lock")
+
+
+def _replay_file(path, apply, quarantine):
+    """逐行应用日志文件，处理完后删除文件
+    
+    数据库忙时把剩余行原子写回后重新抛出异常；其他异常交给quarantine(line, error)后继续下一行。
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.readlines()
+    applied = 0
+    for index, line in enumerate(lines):
+        try:
+            event = ReadEvent(**json.loads(line))
+        except (ValueError, TypeError):
+            # 进程崩溃时可能留下写了一半的最后一行
+            continue
+        try:
+            apply(event)
+        except Exception as e:
+            if not is_busy_error(e):
+                quarantine(line, e)
+                continue
+            temp_path = path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.writelines(lines[index:])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            raise
+        applied += 1
+    os.remove(path)
+    return applied
@@ -0,0 +1,25 @@
+# encoding:utf-8
+"""pytest插件：不导入插件包的__init__.py，在没有chatgpt-on-wechat框架的环境中也能运行测试
+
+插件目录本身是一个包，__init__.py会导入依赖框架的插件主模块；测试只覆盖不依赖框架的模块。
+这里把插件目录注册为donotlazy包，并按普通目录收集，pytest不会再导入__init__.py。
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+if "donotlazy" not in sys.modules:
+    package = types.ModuleType("donotlazy")
+    package.__path__ = [str(PLUGIN_DIR)]
+    sys.modules["donotlazy"] = package
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_collect_directory(path, parent):
+    if path == PLUGIN_DIR:
+        return pytest.Dir.from_parent(parent, path=path)
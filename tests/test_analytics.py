@@ -0,0 +1,106 @@
+# encoding:utf-8
+
+import random
+import sqlite3
+import threading
+
+from donotlazy.analytics import ZERO_BIN, QuantileSketch, apply_bin_deltas, bin_deltas, load_sketches
+
+
+def create_bins_table(path):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE read_latency_bins (
+            group_id TEXT,
+            week TEXT,
+            bin INTEGER,
+            count INTEGER,
+            PRIMARY KEY (group_id, week, bin)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.commit()
+    conn.close()
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(20000)]
+    sketch = QuantileSketch(0.01)
+    for value in values:
+        sketch.add(value)
+    
+    values.sort()
+    for q in (0.01, 0.25, 0.5, 0.75, 0.9, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * exact * (1 + 1e-9)
+
+
+def test_merge_matches_single_sketch():
+    rng = random.Random(11)
+    first, second, combined = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for i in range(5000):
+        value = rng.expovariate(1 / 30)
+        (first if i % 3 else second).add(value)
+        combined.add(value)
+    
+    merged = first.copy().merge(second)
+    assert merged.count == combined.count
+    assert merged.bins == combined.bins
+    for q in (0.1, 0.5, 0.9):
+        assert merged.quantile(q) == combined.quantile(q)
+
+
+def test_zero_values_round_trip_through_bins():
+    sketch = QuantileSketch()
+    for value in (0, 0.001, 5, 5, 120):
+        sketch.add(value)
+    
+    assert (ZERO_BIN, 2) in sketch.to_bins()
+    restored = QuantileSketch()
+    for index, bin_count in sketch.to_bins():
+        restored.add_to_bin(index, bin_count)
+    assert restored.count == 5
+    assert restored.quantile(0) == 0.0
+    assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+def test_concurrent_writers_do_not_lose_samples(tmp_path):
+    path = str(tmp_path / "bins.db")
+    create_bins_table(path)
+    writers, batches = 4, 50
+    
+    def write(worker):
+        conn = sqlite3.connect(path, timeout=30)
+        for batch in range(batches):
+            samples = [("g1", "2026-W42", (worker * batches + batch) % 90 + 0.5), ("g1", "2026-W42", 0)]
+            apply_bin_deltas(conn.cursor(), bin_deltas(samples))
+            conn.commit()
+        conn.close()
+    
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    conn = sqlite3.connect(path)
+    sketch = load_sketches(conn.cursor())[("g1", "2026-W42")]
+    assert sketch.count == writers * batches * 2
+    assert sketch.zero_count == writers * batches
+
+
+def test_removing_samples_deletes_empty_bins(tmp_path):
+    path = str(tmp_path / "bins.db")
+    create_bins_table(path)
+    conn = sqlite3.connect(path)
+    samples = [("g1", "2026-W42", 3), ("g2", "2026-W42", 40)]
+    apply_bin_deltas(conn.cursor(), bin_deltas(samples))
+    apply_bin_deltas(conn.cursor(), bin_deltas(samples[:1], -1))
+    # 撤销从未加入的样本时计数保持为0
+    apply_bin_deltas(conn.cursor(), bin_deltas([("g3", "2026-W42", 1)], -1))
+    conn.commit()
+    
+    assert conn.execute("SELECT group_id FROM read_latency_bins").fetchall() == [("g2",)]
+    assert list(load_sketches(conn.cursor(), "g2")) == [("g2", "2026-W42")]
+    assert load_sketches(conn.cursor(), "g1") == {}
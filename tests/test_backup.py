@@ -0,0 +1,59 @@
+# encoding:utf-8
+
+import sqlite3
+import threading
+
+from donotlazy.backup import backup_database, check_integrity, list_backups, rotate_backups
+
+
+def create_database(path, rows=2000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE read_records (id INTEGER PRIMARY KEY, student_name TEXT, note TEXT)")
+    conn.executemany("INSERT INTO read_records (student_name, note) VALUES (?, ?)",
+                     [(f"同学{i}", "x" * 200) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def test_backup_completes_while_another_connection_writes(tmp_path):
+    # 路径中的?、#、%需要在URI中转义
+    directory = tmp_path / "data?#%"
+    directory.mkdir()
+    db_path = directory / "read_records.db"
+    create_database(db_path)
+
+    stop = threading.Event()
+
+    def write():
+        conn = sqlite3.connect(db_path)
+        while not stop.is_set():
+            conn.execute("INSERT INTO read_records (student_name) VALUES ('新同学')")
+            conn.commit()
+        conn.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        result = backup_database(str(db_path), str(directory / "backups"), "read_records", keep=3)
+    finally:
+        stop.set()
+        writer.join()
+
+    assert check_integrity(result.path) is None
+    conn = sqlite3.connect(result.path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert conn.execute("SELECT COUNT(*) FROM read_records").fetchone()[0] >= 2000
+    conn.close()
+    assert list_backups(str(directory / "backups"), "read_records") == [result.path]
+
+
+def test_rotate_keeps_latest_snapshots(tmp_path):
+    for stamp in ("20250301-080000", "20250302-080000", "20250303-080000"):
+        (tmp_path / f"read_records-{stamp}.db").write_bytes(b"")
+    (tmp_path / "shard-20250301-080000.db").write_bytes(b"")
+    rotate_backups(str(tmp_path), "read_records", keep=2)
+    assert [path.rsplit("-", 2)[-2] for path in list_backups(str(tmp_path), "read_records")] == ["20250302",
+                                                                                                  "20250303"]
+    assert (tmp_path / "shard-20250301-080000.db").exists()
+
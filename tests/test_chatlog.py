@@ -0,0 +1,50 @@
+# encoding:utf-8
+
+import json
+from datetime import datetime
+
+from donotlazy.chatlog import ChatLogEntry, ChatLogReader
+
+
+def test_text_format_markers_and_invalid_lines(tmp_path):
+    path = tmp_path / "chat.txt"
+    path.write_text("\ufeff2025-03-01 08:00:00\tg1\t班主任\t通知：明天带水彩笔\r\n"
+                    "\n"
+                    "2025-03-01 08:05:00\tg1\t张三妈妈\t[图片]\n"
+                    "2025-03-01 08:06:00\tg1\t李四爸爸\t收到\t谢谢\n"
+                    "2025-03-01\tg1\t王五\t已读\n"
+                    "2025-03-01 08:07:00\tg1\t只有三列\n"
+                    "2025-03-01 08:08:00\t\t赵六\t已读\n", encoding="utf-8")
+    reader = ChatLogReader(str(path))
+    entries = list(reader)
+    assert entries == [
+        ChatLogEntry("2025-03-01 08:00:00", "g1", None, "班主任", None, "通知：明天带水彩笔", 1),
+        ChatLogEntry("2025-03-01 08:05:00", "g1", None, "张三妈妈", None, "[图片]", 3),
+        # 内容中的制表符保留在内容里
+        ChatLogEntry("2025-03-01 08:06:00", "g1", None, "李四爸爸", None, "收到\t谢谢", 1),
+    ]
+    assert reader.lines == 6
+    assert reader.invalid == 3
+
+
+def test_jsonl_format_with_timestamps_and_optional_fields(tmp_path):
+    timestamp = 1740787200
+    lines = [
+        {"time": "2025-03-01 08:00:00", "group_id": 123, "group_name": "三班家长群",
+         "sender": "班主任", "sender_id": "wxid_t", "content": " 通知 ", "msg_type": "1"},
+        {"time": timestamp, "group_id": "g1", "sender": "张三妈妈", "content": None, "msg_type": 43},
+        {"time": "2025-03-01 08:00:00", "group_id": "g1", "content": "缺少发送者"},
+        {"time": "昨天", "group_id": "g1", "sender": "李四", "content": "已读"},
+    ]
+    path = tmp_path / "chat.JSONL"
+    path.write_text("\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n{坏行\n",
+                    encoding="utf-8")
+    reader = ChatLogReader(str(path))
+    entries = list(reader)
+    assert entries == [
+        ChatLogEntry("2025-03-01 08:00:00", "123", "三班家长群", "班主任", "wxid_t", "通知", 1),
+        ChatLogEntry(datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S'),
+                     "g1", None, "张三妈妈", None, "", 43),
+    ]
+    assert reader.lines == 5
+    assert reader.invalid == 3
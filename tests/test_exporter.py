@@ -0,0 +1,66 @@
+# encoding:utf-8
+
+import io
+import json
+import sqlite3
+
+from donotlazy.exporter import EXPORT_COLUMNS, iter_read_records, load_group_names, write_csv, write_jsonl
+
+
+def create_records():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript('''
+        CREATE TABLE message_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, group_id TEXT, other_user_nickname TEXT
+        );
+        CREATE TABLE read_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id TEXT, student_name TEXT, student_id TEXT, nickname TEXT,
+            read_time TEXT, create_date TEXT
+        );
+        INSERT INTO message_records (group_id, other_user_nickname) VALUES
+            ('g1', '三班旧群名'), ('g1', '三班家长群'), ('g1', NULL), ('g2', '四班家长群');
+    ''')
+    conn.executemany('''
+        INSERT INTO read_records (group_id, student_name, student_id, nickname, read_time, create_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        ("g1", "李四", "1002", "李四妈妈", "2025-03-02 08:00:00", "2025-03-02"),
+        ("g1", "张三", None, None, "2025-03-01 09:00:00", "2025-03-01"),
+        ("g2", "王五", None, "王五爸爸", "2025-03-01 08:00:00", "2025-03-01"),
+        ("g3", "赵六", "1004", "赵六", "2025-03-01 07:00:00", "2025-03-01"),
+        ("g1", "张三", "1001", "张三", "2025-04-01 08:00:00", "2025-04-01"),
+    ])
+    return conn
+
+
+def test_group_names_use_latest_non_empty_nickname():
+    assert load_group_names(create_records()) == {"g1": "三班家长群", "g2": "四班家长群"}
+
+
+def test_records_are_ordered_by_date_then_id_and_filled_from_roster():
+    rows = list(iter_read_records(create_records(), "2025-03-01", "2025-03-31",
+                                  roster={"张三": "1001"}, batch_size=2))
+    assert rows == [
+        ("2025-03-01", "2025-03-01 09:00:00", "g1", "三班家长群", "张三", "1001", "张三", True),
+        ("2025-03-01", "2025-03-01 08:00:00", "g2", "四班家长群", "王五", "", "王五爸爸", False),
+        ("2025-03-01", "2025-03-01 07:00:00", "g3", "", "赵六", "1004", "赵六", True),
+        ("2025-03-02", "2025-03-02 08:00:00", "g1", "三班家长群", "李四", "1002", "李四妈妈", True),
+    ]
+
+
+def test_group_filter_and_writers():
+    rows = list(iter_read_records(create_records(), "2025-03-01", "2025-04-30", group_ids=["g1"]))
+    assert [(row[0], row[4]) for row in rows] == [("2025-03-01", "张三"), ("2025-03-02", "李四"),
+                                                  ("2025-04-01", "张三")]
+
+    f = io.StringIO()
+    assert write_csv(rows, f) == 3
+    lines = f.getvalue().splitlines()
+    assert lines[0] == ",".join(EXPORT_COLUMNS)
+    assert lines[1] == "2025-03-01,2025-03-01 09:00:00,g1,三班家长群,张三,,张三,False"
+
+    f = io.StringIO()
+    assert write_jsonl(rows, f) == 3
+    first = json.loads(f.getvalue().splitlines()[0])
+    assert first["student_name"] == "张三" and first["in_roster"] is False
@@ -0,0 +1,107 @@
+# encoding:utf-8
+
+import http.client
+import json
+from types import SimpleNamespace
+
+import pytest
+
+# HTTP接口的日志使用框架的logger，没有chatgpt-on-wechat框架时跳过
+pytest.importorskip("common.log")
+
+from donotlazy.http_api import ApiError, StatsApi, start_server  # noqa: E402
+
+
+class FakePlugin:
+    """提供StatsApi所需数据方法的插件替身，记录每个数据方法被查询的次数"""
+
+    def __init__(self):
+        self.data_version = 1
+        self.students = SimpleNamespace(version=1)
+        self.reads = {"g1": ["张三"]}
+        self.calls = 0
+
+    def current_data_version(self):
+        return self.data_version
+
+    def group_read_status(self, group_id, date):
+        self.calls += 1
+        return {"group_id": group_id, "date": date, "read": self.reads.get(group_id, [])}
+
+    def daily_summary(self, date):
+        self.calls += 1
+        return {"date": date, "groups": len(self.reads)}
+
+    def metrics(self):
+        return {"calls": self.calls}
+
+
+def test_responses_are_cached_until_a_version_changes():
+    plugin = FakePlugin()
+    api = StatsApi(plugin)
+    first = api.respond("/api/groups/g1/reads", {"date": "2025-03-01"})
+    assert api.respond("/api/groups/g1/reads", {"date": "2025-03-01"}) is first
+    assert plugin.calls == 1
+
+    # 版本变化但内容未变，重新查询后ETag不变
+    plugin.data_version = 2
+    again = api.respond("/api/groups/g1/reads", {"date": "2025-03-01"})
+    assert plugin.calls == 2 and again.etag == first.etag
+
+    plugin.reads["g1"].append("李四")
+    plugin.students.version = 2
+    changed = api.respond("/api/groups/g1/reads", {"date": "2025-03-01"})
+    assert changed.etag != first.etag
+    assert json.loads(changed.body)["read"] == ["张三", "李四"]
+
+
+def test_unknown_paths_and_bad_dates_raise_api_errors():
+    api = StatsApi(FakePlugin())
+    with pytest.raises(ApiError) as e:
+        api.respond("/api/unknown", {})
+    assert e.value.status == 404
+    with pytest.raises(ApiError) as e:
+        api.respond("/api/summary", {"date": "2025/03/01"})
+    assert e.value.status == 400
+
+
+@pytest.fixture
+def server():
+    plugin = FakePlugin()
+    server = start_server(StatsApi(plugin), "127.0.0.1", 0)
+    yield plugin, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request("GET", path, headers=headers or {})
+    response = conn.getresponse()
+    result = response.status, response.getheader("ETag"), response.read()
+    conn.close()
+    return result
+
+
+def test_if_none_match_returns_304_until_content_changes(server):
+    plugin, port = server
+    status, etag, body = get(port, "/api/groups/g1/reads?date=2025-03-01")
+    assert status == 200 and etag
+    assert json.loads(body)["read"] == ["张三"]
+
+    status, same, body = get(port, "/api/groups/g1/reads?date=2025-03-01", {"If-None-Match": f'"other", {etag}'})
+    assert (status, same, body) == (304, etag, b"")
+
+    plugin.reads["g1"].append("李四")
+    plugin.data_version += 1
+    status, changed, body = get(port, "/api/groups/g1/reads?date=2025-03-01", {"If-None-Match": etag})
+    assert status == 200 and changed != etag
+    assert json.loads(body)["read"] == ["张三", "李四"]
+
+
+def test_errors_are_returned_as_json(server):
+    _, port = server
+    status, etag, body = get(port, "/api/summary?date=bad")
+    assert status == 400 and etag is None
+    assert "error" in json.loads(body)
+    assert get(port, "/api/nothing")[0] == 404
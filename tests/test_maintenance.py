@@ -0,0 +1,61 @@
+# encoding:utf-8
+
+import sqlite3
+
+from donotlazy.maintenance import (AUTO_VACUUM_INCREMENTAL, delete_expired_records, delete_unreferenced_contents,
+                                   enable_incremental_vacuum, freelist_count, incremental_vacuum, optimize)
+
+
+def create_database(path, rows=500):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.executescript('''
+        CREATE TABLE read_records (id INTEGER PRIMARY KEY, create_date TEXT, note TEXT);
+        CREATE TABLE read_watermarks (group_id TEXT, create_date TEXT);
+        CREATE TABLE message_records (id INTEGER PRIMARY KEY, create_date TEXT, content_hash TEXT);
+        CREATE TABLE message_contents (hash TEXT PRIMARY KEY, content TEXT);
+    ''')
+    conn.executemany("INSERT INTO read_records (create_date, note) VALUES (?, ?)",
+                     [("2025-01-01" if i % 2 else "2025-03-01", "x" * 500) for i in range(rows)])
+    return conn
+
+
+def test_enable_incremental_vacuum_converts_once(tmp_path):
+    conn = create_database(tmp_path / "test.db")
+    assert enable_incremental_vacuum(conn) is True
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+    assert enable_incremental_vacuum(conn) is False
+
+
+def test_incremental_vacuum_reclaims_at_most_the_requested_pages(tmp_path):
+    conn = create_database(tmp_path / "test.db")
+    enable_incremental_vacuum(conn)
+    assert incremental_vacuum(conn, 10) == 0
+    conn.execute("DELETE FROM read_records")
+    free = freelist_count(conn)
+    assert free > 10
+    assert incremental_vacuum(conn, 10) == 10
+    assert freelist_count(conn) == free - 10
+    assert incremental_vacuum(conn, free) == free - 10
+    assert freelist_count(conn) == 0
+
+
+def test_optimize_analyzes_first_then_uses_pragma_optimize(tmp_path):
+    conn = create_database(tmp_path / "test.db")
+    optimize(conn)
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    optimize(conn)
+
+
+def test_delete_expired_records_and_unreferenced_contents(tmp_path):
+    conn = create_database(tmp_path / "test.db", rows=4)
+    conn.executemany("INSERT INTO read_watermarks VALUES ('g1', ?)", [("2025-01-01",), ("2025-03-01",)])
+    conn.executemany("INSERT INTO message_records (create_date, content_hash) VALUES (?, ?)",
+                     [("2025-01-01", "old"), ("2025-01-02", "shared"), ("2025-03-01", "shared"),
+                      ("2025-03-01", None)])
+    conn.executemany("INSERT INTO message_contents VALUES (?, '')", [("old",), ("shared",), ("orphan",)])
+    cursor = conn.cursor()
+    assert delete_expired_records(cursor, "2025-02-01") == 2
+    delete_unreferenced_contents(cursor)
+    assert conn.execute("SELECT COUNT(*) FROM read_records").fetchone()[0] == 2
+    assert conn.execute("SELECT create_date FROM read_watermarks").fetchall() == [("2025-03-01",)]
+    assert conn.execute("SELECT hash FROM message_contents").fetchall() == [("shared",)]
@@ -0,0 +1,77 @@
+# encoding:utf-8
+
+import io
+import json
+import sqlite3
+
+from donotlazy.exporter import MESSAGE_COLUMNS, iter_messages, write_csv, write_jsonl
+from donotlazy.message_store import content_hash, decode_content, encode_content
+
+LONG = "请各位家长今晚督促孩子完成口算练习并签字。" * 20
+
+
+def test_encode_compresses_only_above_threshold():
+    assert encode_content("已读", 16) == "已读"
+    assert encode_content(LONG, 0) == LONG
+    stored = encode_content(LONG, 16)
+    assert isinstance(stored, bytes) and len(stored) < len(LONG.encode("utf-8"))
+    assert decode_content(stored) == LONG
+    assert decode_content("已读") == "已读"
+    assert decode_content(None) is None
+
+
+def test_content_hash_is_stable_sha1():
+    assert content_hash("已读") == content_hash("已读")
+    assert content_hash("已读") != content_hash("已读 ")
+    assert len(content_hash("")) == 40
+
+
+def create_messages(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.executescript('''
+        CREATE TABLE message_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            group_id TEXT, message_content TEXT, create_time TEXT, create_date TEXT,
+            other_user_nickname TEXT, content_hash TEXT, content_size INTEGER
+        );
+        CREATE TABLE message_contents (hash TEXT PRIMARY KEY, content) WITHOUT ROWID;
+    ''')
+    for group_id, content, storage in rows:
+        digest = content_hash(content)
+        stored = encode_content(content, 16)
+        if storage == "dedup":
+            conn.execute("INSERT OR IGNORE INTO message_contents VALUES (?, ?)", (digest, stored))
+        conn.execute('''
+            INSERT INTO message_records
+            (group_id, message_content, create_time, create_date, other_user_nickname, content_hash, content_size)
+            VALUES (?, ?, '2025-03-01 08:00:00', '2025-03-01', '三班家长群', ?, ?)
+        ''', (group_id, stored if storage == "full" else None, digest, len(content.encode("utf-8"))))
+    # 旧版本的记录只有原文，没有哈希
+    conn.execute('''
+        INSERT INTO message_records (group_id, message_content, create_time, create_date)
+        VALUES ('g1', '旧消息', '2025-03-02 08:00:00', '2025-03-02')
+    ''')
+    return conn
+
+
+def test_iter_messages_restores_deduplicated_and_compressed_content():
+    conn = create_messages([("g1", LONG, "full"), ("g1", LONG, "dedup"), ("g2", "已读", "dedup"),
+                            ("g2", "不保存的内容", "metadata")])
+    rows = list(iter_messages(conn, "2025-03-01", "2025-03-31", batch_size=2))
+    assert [row[4] for row in rows] == [LONG, LONG, "已读", None, "旧消息"]
+    assert rows[3][5] == content_hash("不保存的内容")
+    assert rows[0][3] == "三班家长群" and rows[4][3] == ""
+
+    only_g2 = list(iter_messages(conn, "2025-03-01", "2025-03-01", ["g2"]))
+    assert [row[4] for row in only_g2] == ["已读", None]
+
+
+def test_message_rows_use_message_columns():
+    conn = create_messages([("g1", "已读", "dedup")])
+    rows = list(iter_messages(conn, "2025-03-01", "2025-03-01"))
+    f = io.StringIO()
+    assert write_csv(rows, f, MESSAGE_COLUMNS) == 1
+    assert f.getvalue().splitlines()[0] == ",".join(MESSAGE_COLUMNS)
+    f = io.StringIO()
+    write_jsonl(rows, f, MESSAGE_COLUMNS)
+    assert json.loads(f.getvalue())["content"] == "已读"
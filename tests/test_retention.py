@@ -0,0 +1,116 @@
+# encoding:utf-8
+
+import sqlite3
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from donotlazy.locking import LeaderLock, is_busy_error
+from donotlazy.maintenance import delete_expired_records, delete_unreferenced_contents
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+HOLD_LEADER_LOCK = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from locking import LeaderLock
+lock = LeaderLock(sys.argv[2])
+print(lock.acquire(), flush=True)
+sys.stdin.read()
+'''
+
+HOLD_WRITE_LOCK = '''
+import sqlite3, sys
+conn = sqlite3.connect(sys.argv[1], isolation_level=None)
+conn.execute("BEGIN IMMEDIATE")
+print("locked", flush=True)
+sys.stdin.read()
+conn.rollback()
+'''
+
+
+def start_holder(script, *args):
+    """在另一个进程中执行script，持有锁直到关闭标准输入，返回进程和它输出的第一行"""
+    process = subprocess.Popen([sys.executable, "-c", script, *map(str, args)],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    return process, process.stdout.readline().strip()
+
+
+def stop_holder(process):
+    process.stdin.close()
+    process.wait(timeout=10)
+
+
+def create_group_tables(path):
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        PRAGMA journal_mode = WAL;
+        CREATE TABLE read_records (id INTEGER PRIMARY KEY, group_id TEXT, student_name TEXT, create_date TEXT);
+        CREATE TABLE read_watermarks (requester TEXT, group_id TEXT, create_date TEXT, last_id INTEGER);
+        CREATE TABLE message_records (id INTEGER PRIMARY KEY, group_id TEXT, create_date TEXT, content_hash TEXT);
+        CREATE TABLE message_contents (hash TEXT PRIMARY KEY, content BLOB);
+        INSERT INTO read_records (group_id, student_name, create_date) VALUES
+            ('g1', '张三', '2025-01-01'), ('g1', '李四', '2025-03-01');
+        INSERT INTO read_watermarks VALUES ('u1', 'g1', '2025-01-01', 1), ('u1', 'g1', '2025-03-01', 2);
+        INSERT INTO message_records (group_id, create_date, content_hash) VALUES
+            ('g1', '2025-01-01', 'old'), ('g1', '2025-01-01', 'shared'), ('g1', '2025-03-01', 'shared');
+        INSERT INTO message_contents VALUES ('old', x'00'), ('shared', x'01');
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def run_retention(path, timeout):
+    conn = sqlite3.connect(path, timeout=timeout)
+    try:
+        cursor = conn.cursor()
+        removed = delete_expired_records(cursor, "2025-02-01")
+        if removed:
+            delete_unreferenced_contents(cursor)
+        conn.commit()
+        return removed
+    finally:
+        conn.close()
+
+
+def test_only_one_process_is_leader_until_it_exits(tmp_path):
+    path = tmp_path / "read_records.db.leader"
+    holder, acquired = start_holder(HOLD_LEADER_LOCK, PLUGIN_DIR, path)
+    try:
+        assert acquired == "True"
+        assert not LeaderLock(str(path)).acquire()
+    finally:
+        stop_holder(holder)
+
+    lock = LeaderLock(str(path))
+    assert lock.acquire()
+    # 接替后其他进程无法再成为主进程
+    holder, acquired = start_holder(HOLD_LEADER_LOCK, PLUGIN_DIR, path)
+    stop_holder(holder)
+    assert acquired == "False"
+    lock.release()
+
+
+def test_retention_gives_up_while_another_process_writes(tmp_path):
+    path = tmp_path / "shard.db"
+    create_group_tables(path)
+    holder, _ = start_holder(HOLD_WRITE_LOCK, path)
+    try:
+        start = time.monotonic()
+        with pytest.raises(sqlite3.OperationalError) as error:
+            run_retention(path, timeout=0.2)
+        assert is_busy_error(error.value)
+        assert time.monotonic() - start < 2
+    finally:
+        stop_holder(holder)
+
+    # 下一轮不受影响，过期数据和不再引用的内容一起删除
+    assert run_retention(path, timeout=0.2) == 2
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT student_name FROM read_records").fetchall() == [("李四",)]
+    assert conn.execute("SELECT create_date FROM read_watermarks").fetchall() == [("2025-03-01",)]
+    assert conn.execute("SELECT hash FROM message_contents").fetchall() == [("shared",)]
+    conn.close()
@@ -0,0 +1,63 @@
+# encoding:utf-8
+
+from donotlazy.roster import Roster, build_name_index, normalize_name, resolve_name
+
+
+def resolver(names, aliases=None):
+    students = {name: str(number) for number, name in enumerate(names, 1)}
+    index, conflicts = build_name_index(students, aliases)
+    return (lambda nickname: resolve_name(nickname, students, index)), conflicts
+
+
+def test_normalize_folds_width_case_and_strips_symbols():
+    assert normalize_name("Ｔｏｍ　张 三😀！") == "tom张三"
+    assert normalize_name("张三❤️") == "张三"
+    assert normalize_name("") == ""
+    assert normalize_name(None) == ""
+
+
+def test_resolves_exact_normalized_and_parent_suffixes():
+    resolve, _ = resolver(["张三", "李四"])
+    assert resolve("张三") == "张三"
+    assert resolve(" 张三 ") == "张三"
+    assert resolve("张三妈妈") == "张三"
+    assert resolve("张三 的爸爸🌸") == "张三"
+    assert resolve("王五妈妈") is None
+    assert resolve("") is None
+
+
+def test_single_character_suffix_only_when_unambiguous():
+    resolve, _ = resolver(["张三", "陈一", "陈一博"])
+    assert resolve("张三妈") == "张三"
+    # "陈一爸"也可能是陈一博的家长，不做猜测
+    assert resolve("陈一爸") is None
+    assert resolve("陈一博爸") == "陈一博"
+    # 以"妈"结尾的学生姓名不会被截断成其他学生
+    resolve, _ = resolver(["李小", "李小妈"])
+    assert resolve("李小妈") == "李小妈"
+
+
+def test_conflicting_keys_are_excluded_and_aliases_win():
+    resolve, conflicts = resolver(["张三", "张 三"], aliases={"三三妈": "张三"})
+    assert conflicts == {"张三"}
+    assert resolve("张三") == "张三"
+    assert resolve("张三妈妈") is None
+    assert resolve("三三妈") == "张三"
+
+
+def test_roster_orders_by_numeric_id():
+    roster = Roster({"乙": "10", "甲": "2", "丙": "A1"})
+    assert roster.order == ("甲", "乙", "丙")
+    assert roster.positions["乙"] == 1
+    assert "甲" in roster and len(roster) == 3
+    assert roster.names_by_id["10"] == "乙"
+    updated = roster.replace({"丁": "1"})
+    assert updated.version == roster.version + 1
+    assert list(updated) == ["丁"]
+
+
+def test_names_by_id_follows_renames_and_numeric_ids():
+    roster = Roster({"张三": 1, "李四": "2"})
+    assert roster.names_by_id == {"1": "张三", "2": "李四"}
+    # 名单中改名后同一学号对应新的姓名
+    assert roster.replace({"张珊": 1, "李四": "2"}).names_by_id["1"] == "张珊"
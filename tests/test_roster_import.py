@@ -0,0 +1,105 @@
+# encoding:utf-8
+
+import zipfile
+
+import pytest
+
+from donotlazy.roster_import import RosterImport, RosterImportError, iter_rows
+
+_NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+_R_NS = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+
+def write_xlsx(path, sheet_rows, shared_strings=(), sheet_target="worksheets/data.xml"):
+    """用标准库写一个最小的XLSX：工作表路径通过workbook关系文件解析，单元格为XML片段"""
+    rows = "".join(f'<row r="{i}">{cells}</row>' for i, cells in enumerate(sheet_rows, 1))
+    strings = "".join(f"<si><t>{text}</t></si>" for text in shared_strings)
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("xl/workbook.xml",
+                         f'<workbook {_NS} {_R_NS}><sheets><sheet name="名单" sheetId="1" r:id="rId1"/></sheets></workbook>')
+        archive.writestr("xl/_rels/workbook.xml.rels",
+                         '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                         f'<Relationship Id="rId1" Target="{sheet_target}"/></Relationships>')
+        archive.writestr("xl/sharedStrings.xml", f"<sst {_NS}>{strings}</sst>")
+        archive.writestr(f"xl/{sheet_target}", f"<worksheet {_NS}><sheetData>{rows}</sheetData></worksheet>")
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-8-sig", "gbk"])
+def test_csv_encodings(tmp_path, encoding):
+    path = tmp_path / "名单.csv"
+    path.write_text("学号,姓名\n1001,张三\n1002,李四\n", encoding=encoding)
+    result = RosterImport().run(iter_rows(str(path)))
+    assert result.students == {"张三": "1001", "李四": "1002"}
+    assert result.conflicts == []
+
+
+def test_xlsx_shared_inline_and_numeric_cells(tmp_path):
+    path = tmp_path / "名单.xlsx"
+    write_xlsx(path, [
+        '<c r="A1" t="s"><v>0</v></c><c r="B1" t="s"><v>1</v></c>',
+        '<c r="A2" t="s"><v>2</v></c><c r="B2"><v>1001.0</v></c>',
+        # 空单元格不写入XML，列号来自单元格引用
+        '<c r="A3" t="inlineStr"><is><t>李四</t></is></c><c r="C3"><v>7</v></c>',
+        '<c r="A4" t="inlineStr"><is><t>王五</t></is></c><c r="B4" t="n"><v>1003</v></c>',
+    ], shared_strings=["姓名", "学号", "张三"])
+    assert list(iter_rows(str(path))) == [["姓名", "学号"], ["张三", "1001"], ["李四", "", "7"], ["王五", "1003"]]
+    result = RosterImport().run(iter_rows(str(path)))
+    assert result.students == {"张三": "1001", "王五": "1003"}
+    assert result.skipped == 1
+
+
+def test_invalid_xlsx_and_unsupported_extension(tmp_path):
+    path = tmp_path / "名单.xlsx"
+    path.write_text("不是压缩包", encoding="utf-8")
+    with pytest.raises(RosterImportError):
+        list(iter_rows(str(path)))
+    with pytest.raises(RosterImportError):
+        iter_rows(str(tmp_path / "名单.xls"))
+
+
+def test_header_aliases_and_missing_columns():
+    rows = [[], [" 学生 姓名 ", "Student_ID"], ["张三", "1001"]]
+    assert RosterImport().run(rows).students == {"张三": "1001"}
+    with pytest.raises(RosterImportError):
+        RosterImport().run([["姓名", "电话"], ["张三", "138"]])
+    with pytest.raises(RosterImportError):
+        RosterImport().run([["", " "]])
+
+
+def test_conflicts_and_duplicates_are_reported():
+    rows = [
+        ["姓名", "学号"],
+        ["张三", "1001"],
+        ["张三", "1001"],
+        ["张三", "1009"],
+        ["李四", "1001"],
+        ["王五", "1002"],
+    ]
+    result = RosterImport().run(rows)
+    assert result.students == {"张三": "1001", "王五": "1002"}
+    assert result.duplicates == 1
+    assert result.conflicts == [
+        "第4行：张三 的学号 1009 与之前的 1001 不同",
+        "第5行：学号 1001 同时属于 张三 和 李四",
+    ]
+
+
+def test_class_column_filters_other_classes():
+    rows = [
+        ["姓名", "学号", "班级"],
+        ["张三", "1001", "三年级3班"],
+        ["李四", "1002", "三年级13班"],
+        ["王五", "1003", "3班"],
+        ["赵六", "1004", ""],
+    ]
+    result = RosterImport(class_name="3班").run(rows)
+    assert result.students == {"张三": "1001", "王五": "1003", "赵六": "1004"}
+    assert result.other_class == 1
+    assert result.classes == {"张三": "三年级3班", "王五": "3班"}
+
+
+def test_progress_callback():
+    seen = []
+    rows = [["姓名", "学号"]] + [[f"同学{i}", str(i)] for i in range(5)]
+    RosterImport(progress=seen.append, progress_every=2).run(rows)
+    assert seen == [2, 4]
@@ -0,0 +1,37 @@
+# encoding:utf-8
+
+from donotlazy.settings import DEFAULT_CONFIG, build_settings, invalid_options, with_whitelist
+
+
+def test_invalid_message_storage_falls_back_to_default():
+    config = {"message_storage": "dedupe"}
+    assert invalid_options(config) == [("message_storage", "dedupe", ("full", "metadata", "dedup"))]
+    assert build_settings(config).message_storage == DEFAULT_CONFIG["message_storage"]
+
+
+def test_valid_options_are_kept():
+    for mode in ("full", "metadata", "dedup"):
+        assert invalid_options({"message_storage": mode}) == []
+        assert build_settings({"message_storage": mode}).message_storage == mode
+    assert invalid_options(None) == []
+
+
+def test_defaults_unknown_keys_and_member_sets():
+    settings = build_settings({"white_group_list": ["g1", "g2", "g1"], "teacher_list": ["王老师"],
+                               "maintenance_hours": [3, 2], "unknown": 1})
+    assert settings.max_record_days == DEFAULT_CONFIG["max_record_days"]
+    assert settings.white_group_list == ("g1", "g2")
+    assert settings.white_group_set == frozenset({"g1", "g2"})
+    assert settings.teacher_set == frozenset({"王老师"})
+    assert settings.maintenance_hours == frozenset({2, 3})
+    assert not hasattr(settings, "unknown")
+    assert build_settings({"white_group_list": None}).white_group_list == ()
+
+
+def test_with_whitelist_returns_new_snapshot():
+    settings = build_settings({"white_group_list": ["g1"]})
+    updated = with_whitelist(settings, ["g2", "g3", "g2"])
+    assert updated.white_group_list == ("g2", "g3")
+    assert updated.white_group_set == frozenset({"g2", "g3"})
+    assert settings.white_group_list == ("g1",)
+    assert updated.read_keyword == settings.read_keyword
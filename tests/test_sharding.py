@@ -0,0 +1,175 @@
+# encoding:utf-8
+
+import os
+import shutil
+import sqlite3
+
+from donotlazy.sharding import move_groups, shard_index, shard_paths
+
+GROUPS = [f"group-{index}" for index in range(12)]
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS read_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_id TEXT, student_name TEXT, read_time TEXT, create_date TEXT, student_id TEXT, nickname TEXT,
+        UNIQUE(group_id, student_name, create_date)
+    );
+    CREATE TABLE IF NOT EXISTS message_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_id TEXT, message_content TEXT, create_time TEXT, create_date TEXT,
+        other_user_nickname TEXT, content_hash TEXT, content_size INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS message_contents (hash TEXT PRIMARY KEY, content) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS notice_reads (
+        notice_id INTEGER, student_name TEXT, student_id TEXT, group_id TEXT, nickname TEXT, read_time TEXT,
+        PRIMARY KEY (notice_id, student_name)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS read_latency_bins (
+        group_id TEXT, week TEXT, bin INTEGER, count INTEGER,
+        PRIMARY KEY (group_id, week, bin)
+    ) WITHOUT ROWID;
+'''
+
+QUERIES = {
+    "read_records": "SELECT group_id, student_name, read_time, create_date, student_id, nickname FROM read_records",
+    "message_records": "SELECT group_id, message_content, create_time, create_date, content_hash FROM message_records",
+    "message_contents": "SELECT hash, content FROM message_contents",
+    "notice_reads": "SELECT notice_id, student_name, group_id, read_time FROM notice_reads",
+    "read_latency_bins": "SELECT group_id, week, bin, count FROM read_latency_bins",
+}
+
+
+def create(path, populate=False):
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    if populate:
+        for number, group_id in enumerate(GROUPS):
+            for day in ("2025-03-01", "2025-03-02"):
+                conn.execute("INSERT INTO read_records (group_id, student_name, read_time, create_date, student_id, nickname) "
+                             "VALUES (?, '张三', ?, ?, '1', '张三妈妈')", (group_id, f"{day} 08:00:00", day))
+            conn.execute("INSERT INTO message_records (group_id, message_content, create_time, create_date, content_hash) "
+                         "VALUES (?, NULL, '2025-03-01 08:00:00', '2025-03-01', ?)", (group_id, f"hash-{group_id}"))
+            conn.execute("INSERT INTO message_contents VALUES (?, ?)", (f"hash-{group_id}", f"通知{number}"))
+            conn.execute("INSERT INTO notice_reads VALUES (?, '张三', '1', ?, '张三妈妈', '2025-03-01 08:05:00')",
+                         (number, group_id))
+            conn.execute("INSERT INTO read_latency_bins VALUES (?, '2025-W09', 7, ?)", (group_id, number + 1))
+    conn.commit()
+    conn.close()
+
+
+def contents(paths):
+    """所有文件中各表的行，按表名分组"""
+    rows = {table: [] for table in QUERIES}
+    for path in paths:
+        conn = sqlite3.connect(path)
+        for table, query in QUERIES.items():
+            rows[table].extend(conn.execute(query).fetchall())
+        conn.close()
+    return {table: sorted(table_rows) for table, table_rows in rows.items()}
+
+
+def groups_in(path):
+    conn = sqlite3.connect(path)
+    groups = {row[0] for table in ("read_records", "message_records", "notice_reads", "read_latency_bins")
+              for row in conn.execute(f"SELECT DISTINCT group_id FROM {table}")}
+    conn.close()
+    return groups
+
+
+def move(source, target, index, count):
+    """与插件相同：以新分片为主数据库、附加原文件，在一个事务中移动"""
+    conn = sqlite3.connect(target)
+    conn.execute("ATTACH DATABASE ? AS source", (source,))
+    moved = move_groups(conn, "source", "main", index, count, os.path.basename(source))
+    conn.commit()
+    conn.close()
+    return moved
+
+
+def finish(paths):
+    for path in paths:
+        conn = sqlite3.connect(path)
+        conn.execute("DROP TABLE IF EXISTS shard_moves")
+        conn.close()
+
+
+def rebalance(sources, targets):
+    """与插件启动时的迁移相同：每个 (原文件, 新分片) 在一个事务中移动，全部完成后清除迁移记录"""
+    for path in targets:
+        create(path)
+    for source in sources:
+        for index, target in enumerate(targets):
+            if target != source:
+                move(source, target, index, len(targets))
+    finish(targets)
+
+
+def test_rebalance_out_and_back_keeps_every_row(tmp_path):
+    main = str(tmp_path / "read_records.db")
+    create(main, populate=True)
+    original = contents([main])
+    
+    shards = shard_paths(str(tmp_path), 4)
+    rebalance([main], shards)
+    assert contents([main])["read_records"] == []
+    assert contents(shards)["read_records"] == original["read_records"]
+    assert contents(shards)["notice_reads"] == original["notice_reads"]
+    assert contents(shards)["read_latency_bins"] == original["read_latency_bins"]
+    for index, path in enumerate(shards):
+        assert groups_in(path) == {group_id for group_id in GROUPS if shard_index(group_id, 4) == index}
+    
+    # 分片数减少：4 -> 2 -> 1
+    fewer = shard_paths(str(tmp_path), 2)
+    rebalance(shards, fewer)
+    assert contents(fewer)["read_records"] == original["read_records"]
+    rebalance(fewer, [main])
+    restored = contents([main])
+    for table in ("read_records", "message_records", "notice_reads", "read_latency_bins"):
+        assert restored[table] == original[table], table
+    assert restored["message_contents"] == original["message_contents"]
+    assert all(not groups_in(path) for path in shards + fewer)
+    # 消息内容随消息记录一起移动，原文件中不会留下无法访问的内容
+    assert contents(shards + fewer)["message_contents"] == []
+
+
+def test_retry_after_target_committed_does_not_duplicate(tmp_path):
+    main = str(tmp_path / "read_records.db")
+    create(main, populate=True)
+    original = contents([main])
+    shards = shard_paths(str(tmp_path), 2)
+    for path in shards:
+        create(path)
+    
+    # 模拟新分片已提交、原文件未提交时退出：迁移后恢复原文件
+    saved = str(tmp_path / "saved.db")
+    shutil.copy(main, saved)
+    move(main, shards[0], 0, 2)
+    shutil.copy(saved, main)
+    
+    rebalance([main], shards)
+    assert contents(shards) == original
+    assert contents([main])["message_records"] == []
+
+
+def test_existing_rows_in_target_are_kept_and_sketch_bins_merged(tmp_path):
+    main = str(tmp_path / "read_records.db")
+    create(main, populate=True)
+    group_id = GROUPS[0]
+    shards = shard_paths(str(tmp_path), 2)
+    target = shards[shard_index(group_id, 2)]
+    create(target)
+    # 目标分片中已有同一个群的部分数据，例如旧版本留在主数据库中的草图与分片中新的草图
+    conn = sqlite3.connect(target)
+    conn.execute("INSERT INTO read_records (group_id, student_name, read_time, create_date, student_id, nickname) "
+                 "VALUES (?, '张三', '2025-03-01 08:00:00', '2025-03-01', '1', '张三妈妈')", (group_id,))
+    conn.execute("INSERT INTO notice_reads VALUES (0, '张三', '1', ?, '张三妈妈', '2025-03-01 08:05:00')", (group_id,))
+    conn.execute("INSERT INTO read_latency_bins VALUES (?, '2025-W09', 7, 10)", (group_id,))
+    conn.commit()
+    conn.close()
+    
+    rebalance([main], shards)
+    conn = sqlite3.connect(target)
+    assert conn.execute("SELECT COUNT(*) FROM read_records WHERE group_id = ?", (group_id,)).fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM notice_reads WHERE group_id = ?", (group_id,)).fetchone()[0] == 1
+    assert conn.execute("SELECT count FROM read_latency_bins WHERE group_id = ?", (group_id,)).fetchone()[0] == 11
+    conn.close()
@@ -0,0 +1,86 @@
+# encoding:utf-8
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from donotlazy.spill import ReadEvent, SpillJournal
+
+
+def read(name, group_id="g1"):
+    return ReadEvent(group_id, name, name, "2025-03-01 08:00:00", None)
+
+
+def write_orphan(directory, pid, events):
+    """模拟已退出进程留下的日志"""
+    with open(os.path.join(directory, f"reads-{pid}.jsonl"), "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event._asdict(), ensure_ascii=False) + "\n")
+
+
+def failing_once(name, error):
+    """第一次应用到name时抛出error，应用成功的已读按顺序记录到applied"""
+    applied = []
+    errors = [error]
+
+    def apply(event):
+        if event.student_name == name and errors:
+            raise errors.pop()
+        applied.append(event.student_name)
+
+    return apply, applied
+
+
+def test_replays_orphans_then_own_journal_in_order(tmp_path):
+    journal = SpillJournal(str(tmp_path))
+    write_orphan(str(tmp_path), 0, [read("甲"), read("乙")])
+    for name in ("丙", "丁"):
+        journal.append(read(name))
+
+    applied = []
+    assert journal.replay(lambda event: applied.append(event.student_name)) == 4
+    assert applied == ["甲", "乙", "丙", "丁"]
+    assert not journal.has_pending()
+    assert journal.pending == 0
+
+
+def test_busy_error_keeps_the_tail_and_resumes_in_order(tmp_path):
+    journal = SpillJournal(str(tmp_path))
+    for name in ("甲", "乙", "丙"):
+        journal.append(read(name))
+    apply, applied = failing_once("乙", sqlite3.OperationalError("database is locked"))
+
+    with pytest.raises(sqlite3.OperationalError):
+        journal.replay(apply)
+    assert applied == ["甲"]
+    assert journal.has_pending()
+
+    # 重放失败后追加的已读排在未完成的部分之后
+    journal.append(read("丁"))
+    assert journal.replay(apply) == 3
+    assert applied == ["甲", "乙", "丙", "丁"]
+    assert not journal.has_pending()
+    assert journal.quarantined_events() == 0
+
+
+def test_other_errors_are_quarantined_and_replay_continues(tmp_path):
+    journal = SpillJournal(str(tmp_path))
+    for name in ("甲", "乙", "丙"):
+        journal.append(read(name))
+    apply, applied = failing_once("乙", sqlite3.IntegrityError("NOT NULL constraint failed: read_records.group_id"))
+
+    assert journal.replay(apply) == 2
+    assert applied == ["甲", "丙"]
+    assert not journal.has_pending()
+    assert journal.quarantined == 1
+    assert journal.quarantined_events() == 1
+    with open(journal.quarantine_path, encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert ReadEvent(**record["event"]) == read("乙")
+    assert record["error"].startswith("IntegrityError")
+
+    # 隔离的已读不会再被重放
+    assert journal.replay(apply) == 0
+    assert applied == ["甲", "丙"]
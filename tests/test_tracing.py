@@ -0,0 +1,50 @@
+# encoding:utf-8
+
+import sqlite3
+
+import pytest
+
+# 慢语句日志使用框架的logger，没有chatgpt-on-wechat框架时跳过
+pytest.importorskip("common.log")
+
+from donotlazy.tracing import StatementTracer, TracedConnection, explain_query_plan  # noqa: E402
+
+
+def connect(threshold_ms=0, top_n=20):
+    conn = sqlite3.connect(":memory:", factory=TracedConnection)
+    conn.tracer = StatementTracer(threshold_ms, top_n)
+    conn.execute("CREATE TABLE read_records (id INTEGER PRIMARY KEY, group_id TEXT, create_date TEXT)")
+    conn.tracer.reset()
+    return conn
+
+
+def test_statements_are_merged_ignoring_whitespace_and_keep_plans():
+    conn = connect()
+    conn.executemany("INSERT INTO read_records (group_id, create_date) VALUES (?, ?)",
+                     (("g1", "2025-03-01") for _ in range(3)))
+    conn.execute("SELECT COUNT(*) FROM read_records WHERE group_id = ?", ("g1",)).fetchone()
+    conn.cursor().execute("SELECT  COUNT(*)\n  FROM read_records WHERE group_id = ?", ("g2",)).fetchone()
+    top = dict(conn.tracer.top())
+    select = top["SELECT COUNT(*) FROM read_records WHERE group_id = ?"]
+    assert select["count"] == 2
+    assert select["total_ms"] >= select["max_ms"]
+    assert "SCAN read_records" in select["plan"]
+    assert top["INSERT INTO read_records (group_id, create_date) VALUES (?, ?)"]["count"] == 1
+
+
+def test_fast_statements_are_not_recorded_and_top_is_bounded():
+    conn = connect(threshold_ms=10_000)
+    conn.execute("SELECT 1")
+    assert conn.tracer.top() == []
+
+    tracer = StatementTracer(0, top_n=2)
+    for elapsed_ms in range(1, 8):
+        tracer.record(conn, f"SELECT {elapsed_ms}", (), float(elapsed_ms))
+    assert [statement for statement, _ in tracer.top()] == ["SELECT 7", "SELECT 6"]
+    assert len(tracer.slow_statements) <= 4
+
+
+def test_explain_query_plan_only_for_data_statements():
+    conn = connect()
+    assert explain_query_plan(conn, "PRAGMA optimize", ()) == ""
+    assert explain_query_plan(conn, "SELECT * FROM missing", ()).startswith("（无法获取查询计划")
@@ -0,0 +1,103 @@
+# encoding:utf-8
+
+import sqlite3
+import threading
+import time
+
+from common.log import logger
+
+
+class StatementTracer:
+    """记录执行时间超过阈值的SQL语句，保留最慢的top_n条及其查询计划
+    
+    同一条SQL（忽略空白差异）合并统计次数、总耗时和最大耗时。SELECT语句的耗时为执行到
+    返回第一行为止的时间，聚合查询的主要开销都在这一步。
+    """
+    
+    def __init__(self, threshold_ms, top_n=20):
+        self.threshold_ms = threshold_ms
+        self.top_n = top_n
+        self.lock = threading.Lock()
+        self.slow_statements = {}
+    
+    def record(self, conn, sql, params, elapsed_ms):
+        if elapsed_ms < self.threshold_ms:
+            return
+        statement = " ".join(sql.split())
+        plan = explain_query_plan(conn, sql, params)
+        # 每条慢语句只输出一行WARNING，查询计划较长，只在DEBUG日志中输出，没有查询计划的语句不输出
+        logger.warning(f"[donotlazy] 慢语句 {elapsed_ms:.1f}ms：{statement}")
+        if plan:
+            logger.debug(f"[donotlazy] 慢语句查询计划：{statement}\n{plan}")
+        with self.lock:
+            entry = self.slow_statements.get(statement)
+            if entry is None:
+                entry = self.slow_statements[statement] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "plan": plan}
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            if elapsed_ms >= entry["max_ms"]:
+                entry["max_ms"] = elapsed_ms
+                entry["plan"] = plan
+            # 超出两倍容量时只保留最慢的top_n条，避免每次记录都排序
+            if len(self.slow_statements) > self.top_n * 2:
+                self.slow_statements = dict(self._slowest(self.top_n))
+    
+    def _slowest(self, n):
+        return sorted(self.slow_statements.items(), key=lambda item: item[1]["max_ms"], reverse=True)[:n]
+    
+    def top(self, n=None):
+        """按最大耗时从高到低返回 [(语句, 统计)]"""
+        with self.lock:
+            return [(statement, dict(entry)) for statement, entry in self._slowest(n or self.top_n)]
+    
+    def reset(self):
+        with self.lock:
+            self.slow_statements = {}
+
+
+def explain_query_plan(conn, sql, params):
+    """返回语句的查询计划文本，无法获取时返回空字符串"""
+    if not sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")):
+        return ""
+    try:
+        cursor = sqlite3.Cursor(conn)
+        sqlite3.Cursor.execute(cursor, "EXPLAIN QUERY PLAN " + sql, params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+    except sqlite3.Error as e:
+        return f"（无法获取查询计划：{e}）"
+
+
+class TracedCursor(sqlite3.Cursor):
+    """记录每条语句执行耗时的游标"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.tracer.record(self.connection, sql, parameters, (time.perf_counter() - started) * 1000)
+    
+    def executemany(self, sql, seq_of_parameters):
+        # 参数可能是生成器，先转为列表以便用第一组参数获取查询计划
+        seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            first = seq_of_parameters[0] if seq_of_parameters else ()
+            self.connection.tracer.record(self.connection, sql, first, (time.perf_counter() - started) * 1000)
+
+
+class TracedConnection(sqlite3.Connection):
+    """游标和快捷执行方法都使用TracedCursor的连接，使用前需设置tracer属性"""
+    
+    tracer = None
+    
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)